@@ -1,5 +1,12 @@
-﻿import threading
+﻿from __future__ import annotations
+
+import os
+import queue
+import sys
+import threading
+import time
 import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
 from tkinter import filedialog, messagebox, ttk
 from pathlib import Path
 
@@ -10,18 +17,39 @@ class App(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("codexOfflineVideo - RealTalk")
-        self.geometry("820x640")
+        self.geometry("820x910")
         self.resizable(True, True)
 
-        self.pipeline = AvatarPipeline()
+        # Config loading and the heavy pipeline imports run off the UI thread so the window shows at once.
+        self._pipeline_future: Future = Future()
+        threading.Thread(target=self._load_pipeline, daemon=True).start()
 
         self.avatar_path = tk.StringVar()
         self.voice_path = tk.StringVar()
         self.ref_video_path = tk.StringVar()
         self.background_path = tk.StringVar()
+        self.slides_path = tk.StringVar()
+        self.second_avatar_path = tk.StringVar()
+        self.second_voice_path = tk.StringVar()
         self.preset_choice = tk.StringVar(value="News Anchor")
 
+        # Jobs run one at a time on the executor; worker threads only post to the event queue
+        # and every Tk call happens in _pump_events on the main loop.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        self.events: queue.Queue = queue.Queue()
+        self._job_count = 0
+        self._active_jobs = 0
+
+        # TTS and renderer warm-up starts once an avatar and a voice are picked (core.prewarm),
+        # debounced because typing a path fires on every keystroke
+        self.prewarmer = None
+        self._prewarm_after = None
+        for var in (self.avatar_path, self.voice_path, self.preset_choice):
+            var.trace_add("write", lambda *_: self._schedule_prewarm())
+
         self._build_ui()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(100, self._pump_events)
 
     def _build_ui(self):
         pad = 8
@@ -51,6 +79,7 @@ class App(tk.Tk):
             "Coach",
             "Podcast Close-up",
             "CEO Keynote",
+            "Two Presenters",
             "None (Raw)",
         )
         preset_menu.grid(row=6, column=1, sticky="e", padx=(0, pad))
@@ -59,23 +88,59 @@ class App(tk.Tk):
         ttk.Entry(frm, textvariable=self.background_path, width=80).grid(row=8, column=0, sticky="we")
         ttk.Button(frm, text="Browse", command=self._pick_background).grid(row=8, column=1, padx=pad)
 
-        ttk.Label(frm, text="Script").grid(row=9, column=0, sticky="w", pady=(pad, 0))
+        ttk.Label(frm, text="Slides (Optional, JSON timeline)").grid(row=9, column=0, sticky="w", pady=(pad, 0))
+        ttk.Entry(frm, textvariable=self.slides_path, width=80).grid(row=10, column=0, sticky="we")
+        ttk.Button(frm, text="Browse", command=self._pick_slides).grid(row=10, column=1, padx=pad)
+
+        ttk.Label(frm, text="Second Presenter Avatar (Optional, dialogue: tag lines 'Name: ...')").grid(
+            row=11, column=0, sticky="w", pady=(pad, 0)
+        )
+        ttk.Entry(frm, textvariable=self.second_avatar_path, width=80).grid(row=12, column=0, sticky="we")
+        ttk.Button(frm, text="Browse", command=self._pick_second_avatar).grid(row=12, column=1, padx=pad)
+
+        ttk.Label(frm, text="Second Presenter Voice (Optional)").grid(row=13, column=0, sticky="w", pady=(pad, 0))
+        ttk.Entry(frm, textvariable=self.second_voice_path, width=80).grid(row=14, column=0, sticky="we")
+        ttk.Button(frm, text="Browse", command=self._pick_second_voice).grid(row=14, column=1, padx=pad)
+
+        ttk.Label(frm, text="Script").grid(row=15, column=0, sticky="w", pady=(pad, 0))
         self.script_box = tk.Text(frm, height=8, wrap=tk.WORD)
-        self.script_box.grid(row=10, column=0, columnspan=2, sticky="nsew")
+        self.script_box.grid(row=16, column=0, columnspan=2, sticky="nsew")
 
         self.generate_btn = ttk.Button(frm, text="GENERATE VIDEO", command=self._on_generate)
-        self.generate_btn.grid(row=11, column=0, sticky="w", pady=(pad, 0))
+        self.generate_btn.grid(row=17, column=0, sticky="w", pady=(pad, 0))
 
         self.status = tk.StringVar(value="Idle")
-        ttk.Label(frm, textvariable=self.status).grid(row=11, column=1, sticky="e", padx=(0, pad))
+        ttk.Label(frm, textvariable=self.status).grid(row=17, column=1, sticky="e", padx=(0, pad))
 
-        ttk.Label(frm, text="Log").grid(row=12, column=0, sticky="w", pady=(pad, 0))
-        self.log_box = tk.Text(frm, height=10, wrap=tk.WORD, state=tk.DISABLED)
-        self.log_box.grid(row=13, column=0, columnspan=2, sticky="nsew")
+        ttk.Label(frm, text="Jobs").grid(row=18, column=0, sticky="w", pady=(pad, 0))
+        self.jobs = ttk.Treeview(frm, columns=("stage", "progress", "fps", "eta"), height=4)
+        self.jobs.heading("#0", text="Job")
+        self.jobs.heading("stage", text="Stage")
+        self.jobs.heading("progress", text="Frames")
+        self.jobs.heading("fps", text="FPS")
+        self.jobs.heading("eta", text="ETA")
+        self.jobs.column("#0", width=200)
+        for col in ("stage", "progress", "fps", "eta"):
+            self.jobs.column(col, width=110, anchor="center")
+        self.jobs.grid(row=19, column=0, columnspan=2, sticky="nsew")
+
+        ttk.Label(frm, text="Log").grid(row=20, column=0, sticky="w", pady=(pad, 0))
+        self.log_box = tk.Text(frm, height=8, wrap=tk.WORD, state=tk.DISABLED)
+        self.log_box.grid(row=21, column=0, columnspan=2, sticky="nsew")
 
         frm.columnconfigure(0, weight=1)
-        frm.rowconfigure(10, weight=1)
-        frm.rowconfigure(13, weight=1)
+        frm.rowconfigure(16, weight=1)
+        frm.rowconfigure(21, weight=1)
+
+    def _load_pipeline(self):
+        try:
+            self._pipeline_future.set_result(AvatarPipeline())
+        except Exception as exc:
+            self._pipeline_future.set_exception(exc)
+
+    @property
+    def pipeline(self) -> AvatarPipeline:
+        return self._pipeline_future.result()
 
     def _pick_voice(self):
         path = filedialog.askopenfilename(filetypes=[("Audio", "*.wav;*.mp3")])
@@ -97,6 +162,45 @@ class App(tk.Tk):
         if path:
             self.background_path.set(path)
 
+    def _pick_slides(self):
+        path = filedialog.askopenfilename(filetypes=[("Slide timeline", "*.json")])
+        if path:
+            self.slides_path.set(path)
+
+    def _pick_second_avatar(self):
+        path = filedialog.askopenfilename(filetypes=[("Image", "*.jpg;*.jpeg;*.png")])
+        if path:
+            self.second_avatar_path.set(path)
+
+    def _pick_second_voice(self):
+        path = filedialog.askopenfilename(filetypes=[("Audio", "*.wav;*.mp3")])
+        if path:
+            self.second_voice_path.set(path)
+
+    def _schedule_prewarm(self):
+        if self._prewarm_after is not None:
+            self.after_cancel(self._prewarm_after)
+        self._prewarm_after = self.after(500, self._start_prewarm)
+
+    def _start_prewarm(self):
+        self._prewarm_after = None
+        if not self._pipeline_future.done():
+            self._schedule_prewarm()
+            return
+        if self._pipeline_future.exception() is not None:
+            return
+        avatar, voice = self.avatar_path.get(), self.voice_path.get()
+        if self.prewarmer is None:
+            from core.prewarm import Prewarmer, prewarm_enabled
+
+            if not (avatar and voice) or not prewarm_enabled(self.pipeline.config):
+                return
+            self.prewarmer = Prewarmer(self.pipeline, log=lambda msg: self.events.put(("log", "", msg)))
+        # A changed or cleared selection cancels and evicts what was prepared for the old one
+        self.prewarmer.update(
+            Path(avatar) if avatar else None, Path(voice) if voice else None, self._preset_key()
+        )
+
     def _log(self, msg: str):
         self.log_box.configure(state=tk.NORMAL)
         self.log_box.insert(tk.END, msg + "\n")
@@ -115,32 +219,92 @@ class App(tk.Tk):
             messagebox.showerror("Missing Script", "Please enter a script.")
             return
 
-        self.generate_btn.configure(state=tk.DISABLED)
-        self.status.set("Generating...")
-        self._log("Starting generation...")
-
-        def work():
-            try:
-                preset_key = self._preset_key()
-                inputs = PipelineInputs(
-                    avatar_image=Path(self.avatar_path.get()),
-                    script_text=script,
-                    voice_sample=Path(self.voice_path.get()),
-                    reference_video=Path(self.ref_video_path.get()) if self.ref_video_path.get() else None,
-                    preset_name=preset_key,
-                    background_image=Path(self.background_path.get()) if self.background_path.get() else None,
-                )
-                outputs = self.pipeline.run(inputs)
-                self._log(f"Done: {outputs.video_path}")
-                self.status.set("Complete")
-            except Exception as exc:
-                self._log(f"Error: {exc}")
-                self.status.set("Error")
-                messagebox.showerror("Generation Failed", str(exc))
-            finally:
-                self.generate_btn.configure(state=tk.NORMAL)
-
-        threading.Thread(target=work, daemon=True).start()
+        # Read every Tk variable here, on the main thread, before the job leaves it
+        preset_key = self._preset_key()
+        inputs = PipelineInputs(
+            avatar_image=Path(self.avatar_path.get()),
+            script_text=script,
+            voice_sample=Path(self.voice_path.get()),
+            reference_video=Path(self.ref_video_path.get()) if self.ref_video_path.get() else None,
+            preset_name=preset_key,
+            background_image=Path(self.background_path.get()) if self.background_path.get() else None,
+            slides=Path(self.slides_path.get()) if self.slides_path.get() else None,
+            second_avatar_image=Path(self.second_avatar_path.get()) if self.second_avatar_path.get() else None,
+            second_voice_sample=Path(self.second_voice_path.get()) if self.second_voice_path.get() else None,
+        )
+
+        self._job_count += 1
+        key = f"job{self._job_count}"
+        self.jobs.insert("", tk.END, iid=key, text=f"#{self._job_count} {self.preset_choice.get()}",
+                         values=("queued", "", "", ""))
+        self._active_jobs += 1
+        self._update_status()
+        self._log(f"Queued job #{self._job_count}")
+        self.executor.submit(self._run_job, key, inputs)
+
+    def _run_job(self, key: str, inputs: PipelineInputs):
+        # Runs on the executor thread: no Tk calls here, only queue posts
+        self.events.put(("started", key, None))
+        try:
+            outputs = self.pipeline.run(inputs, progress=lambda event: self.events.put(("progress", key, event)))
+            self.events.put(("done", key, outputs.video_path))
+        except Exception as exc:
+            self.events.put(("error", key, str(exc)))
+
+    def _pump_events(self):
+        try:
+            while True:
+                kind, key, payload = self.events.get_nowait()
+                self._handle_event(kind, key, payload)
+        except queue.Empty:
+            pass
+        self.after(100, self._pump_events)
+
+    def _handle_event(self, kind: str, key: str, payload):
+        if kind == "started":
+            self.jobs.set(key, "stage", "starting")
+            self._log(f"{self.jobs.item(key, 'text')}: started")
+        elif kind == "progress":
+            self.jobs.set(key, "stage", f"{payload.stage} ({payload.state})")
+            if payload.frames_total:
+                self.jobs.set(key, "progress", f"{payload.frames_done}/{payload.frames_total}")
+            self.jobs.set(key, "fps", f"{payload.fps:.1f}" if payload.fps else "")
+            self.jobs.set(key, "eta", _format_eta(payload.eta_seconds))
+            if payload.state == "failed":
+                self._log(f"{self.jobs.item(key, 'text')}: {payload.stage} failed: {payload.error}")
+            elif payload.state == "retry":
+                self._log(f"{self.jobs.item(key, 'text')}: re-rendering {payload.stage} ({payload.error})")
+            elif payload.state == "warning":
+                self._log(f"{self.jobs.item(key, 'text')}: warning: {payload.stage} {payload.error}")
+        elif kind == "done":
+            self.jobs.item(key, values=("complete", self.jobs.set(key, "progress"), "", ""))
+            self._log(f"Done: {payload}")
+            self._finish_job()
+        elif kind == "log":
+            self._log(payload)
+        elif kind == "error":
+            self.jobs.set(key, "stage", "error")
+            self.jobs.set(key, "eta", "")
+            self._log(f"Error: {payload}")
+            self._finish_job()
+            messagebox.showerror("Generation Failed", payload)
+
+    def _on_close(self):
+        # Queued jobs are dropped; a job already rendering finishes before the process exits
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.prewarmer is not None:
+            self.prewarmer.shutdown()
+        self.destroy()
+
+    def _finish_job(self):
+        self._active_jobs -= 1
+        self._update_status()
+
+    def _update_status(self):
+        if self._active_jobs:
+            self.status.set(f"{self._active_jobs} job(s) queued or running")
+        else:
+            self.status.set("Idle")
 
     def _preset_key(self) -> str:
         mapping = {
@@ -150,11 +314,30 @@ class App(tk.Tk):
             "Coach": "coach",
             "Podcast Close-up": "podcast_closeup",
             "CEO Keynote": "ceo_keynote",
+            "Two Presenters": "two_presenters",
             "None (Raw)": "none",
         }
         return mapping.get(self.preset_choice.get(), "news_anchor")
 
 
+def _format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return ""
+    minutes, secs = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{secs:02d}"
+
+
+def _report_window_ready(app: App, started: float) -> None:
+    # Used by scripts/bench_startup.py: print time-to-idle and which heavy modules were loaded, then exit.
+    app.update_idletasks()
+    heavy = [m for m in ("numpy", "PIL", "cv2", "soundfile", "pydub", "TTS", "torch") if m in sys.modules]
+    print(f"WINDOW_READY {time.perf_counter() - started:.4f} {','.join(heavy)}", flush=True)
+    app.destroy()
+
+
 if __name__ == "__main__":
+    started = time.perf_counter()
     app = App()
+    if os.environ.get("CODEXOFFLINEVIDEO_STARTUP_BENCH", "0") == "1":
+        app.after_idle(_report_window_ready, app, started)
     app.mainloop()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+
+def file_digest(path: str | Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ArtifactStore:
+    # Artifacts are addressed as "<sha256><suffix>"; the suffix is kept because
+    # ffmpeg and the compositor pick behaviour from file extensions.
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, artifact_id: str) -> Path:
+        _check_id(artifact_id)
+        return self.root / artifact_id[:2] / artifact_id
+
+    def has(self, artifact_id: str) -> bool:
+        return self.path_for(artifact_id).exists()
+
+    def put(self, path: str | Path) -> str:
+        path = Path(path)
+        artifact_id = file_digest(path) + path.suffix.lower()
+        target = self.path_for(artifact_id)
+        if target.exists():
+            # Stored again: refresh its last use for workspace.trim_stores
+            os.utime(target)
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(target.name + f".{os.getpid()}.tmp")
+            # Not copy2: the stored copy's mtime is when it was stored, for workspace.trim_stores
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        return artifact_id
+
+    def put_stream(self, artifact_id: str, stream, length: int) -> Path:
+        target = self.path_for(artifact_id)
+        if target.exists():
+            _drain(stream, length)
+            os.utime(target)
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        fd, tmp_name = tempfile.mkstemp(dir=str(target.parent), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    block = stream.read(min(1 << 20, remaining))
+                    if not block:
+                        break
+                    h.update(block)
+                    f.write(block)
+                    remaining -= len(block)
+            if not artifact_id.startswith(h.hexdigest()):
+                raise ValueError(f"Artifact content does not match its id: {artifact_id}")
+            os.replace(tmp_name, target)
+        finally:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+        return target
+
+    def ids(self) -> Iterator[str]:
+        for p in self.root.glob("*/*"):
+            if p.is_file() and not p.name.endswith(".tmp"):
+                yield p.name
+
+    def export(self, artifact_id: str, out_path: str | Path) -> Path:
+        out_path = Path(out_path)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(self.path_for(artifact_id), out_path)
+        return out_path
+
+
+def _check_id(artifact_id: str) -> None:
+    digest = artifact_id.split(".", 1)[0]
+    bad_digest = len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest)
+    if bad_digest or "/" in artifact_id or "\\" in artifact_id:
+        raise ValueError(f"Invalid artifact id: {artifact_id}")
+
+
+def _drain(stream, length: int) -> None:
+    remaining = length
+    while remaining > 0:
+        block = stream.read(min(1 << 20, remaining))
+        if not block:
+            break
+        remaining -= len(block)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+
+from .audio_utils import resample_audio
+from .governor import governor
+
+WHISPER_SAMPLE_RATE = 16000
+RUNNER_PATH = Path(__file__).with_name("echomimic_runner.py")
+
+
+def compute_audio_features(
+    echomimic_dir: str | Path,
+    weights_dir: str | Path,
+    audio_path: str | Path,
+    out_path: str | Path,
+    fps: int = 24,
+    device: str = "cuda",
+) -> Path:
+    echomimic_dir = Path(echomimic_dir).resolve()
+    weights_dir = Path(weights_dir).resolve()
+    out_path = Path(out_path).resolve()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    model_path = weights_dir / "audio_processor" / "whisper_tiny.pt"
+    if not model_path.exists():
+        raise FileNotFoundError(f"Whisper audio model not found: {model_path}")
+
+    resampled = resample_audio(
+        audio_path,
+        out_path.with_name(out_path.stem + "_16k.wav"),
+        sample_rate=WHISPER_SAMPLE_RATE,
+    )
+    cmd = [
+        "python",
+        str(RUNNER_PATH),
+        "--extract-features",
+        str(out_path),
+        "--audio",
+        str(resampled.resolve()),
+        "--audio-model",
+        str(model_path),
+        "--fps",
+        str(fps),
+        "--device",
+        device,
+    ]
+    governor().run("features", cmd, cwd=str(echomimic_dir), check=True)
+    resampled.unlink(missing_ok=True)
+    return out_path
+
+
+def slice_audio_features(
+    features_path: str | Path,
+    start_frame: int,
+    frame_count: int,
+    out_path: str | Path,
+) -> Path:
+    # Windows near the slice edges were built from the neighbouring chunk's audio,
+    # so only the frame range is cut here; short tails repeat the last frame.
+    features = np.load(str(features_path), mmap_mode="r")
+    start = max(0, min(int(start_frame), len(features) - 1))
+    window = np.asarray(features[start : start + frame_count])
+    if len(window) < frame_count:
+        pad = np.repeat(window[-1:], frame_count - len(window), axis=0)
+        window = np.concatenate([window, pad], axis=0)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(out_path, window)
+    return out_path
@@ -26,3 +26,16 @@ def split_audio(
         chunks.append(out_path)
 
     return chunks
+
+
+def resample_audio(
+    audio_path: str | Path,
+    out_path: str | Path,
+    sample_rate: int = 16000,
+) -> Path:
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    audio = AudioSegment.from_file(audio_path)
+    audio = audio.set_channels(1).set_frame_rate(sample_rate)
+    audio.export(out_path, format="wav")
+    return out_path
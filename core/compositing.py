@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
-import subprocess
 
+from .governor import governor
 from .presets import Preset
+from .progressive import FRAGMENTED_MP4_FLAGS
 
 
 def compose_video(
@@ -17,6 +19,16 @@ def compose_video(
     preset_speed: str = "veryfast",
     crf: int = 23,
     subtitle_ass: str | Path | None = None,
+    audio_path: str | Path | None = None,
+    renditions: list[dict] | None = None,
+    start_seconds: float = 0.0,
+    fragmented: bool = False,
+    content_track: str | Path | None = None,
+    second_avatar_video_path: str | Path | None = None,
+    face_box: tuple[float, float, float, float] | None = None,
+    second_face_box: tuple[float, float, float, float] | None = None,
+    rate_control: dict | None = None,
+    avatar_size: tuple[int, int] | None = None,
 ) -> Path:
     background_path = Path(background_path)
     avatar_video_path = Path(avatar_video_path)
@@ -30,39 +42,345 @@ def compose_video(
     width, height = preset.resolution
     av_w, av_h = preset.avatar_box
     av_x, av_y = preset.avatar_pos
+    # avatar_size is the render size; clips rendered at the box size are overlaid as they are
+    fit_avatar = "null" if avatar_size is not None and tuple(avatar_size) == (av_w, av_h) else f"scale={av_w}:{av_h}"
 
     filter_complex = (
         f"[0:v]scale={width}:{height}[bg];"
-        f"[1:v]scale={av_w}:{av_h}[av];"
+        f"[1:v]{fit_avatar}[av];"
         f"[bg][av]overlay={av_x}:{av_y}:format=auto[ov]"
     )
-    if subtitle_ass:
+    # Optional inputs follow the background and avatar: [audio], [content track], [second avatar]
+    if preset.content_box is None:
+        content_track = None
+    if preset.second_avatar_pos is None:
+        second_avatar_video_path = None
+    next_input = 3 if audio_path else 2
+    if content_track:
+        # One sparse slide stream (see slides.build_slide_stream); overlay holds each frame until the next
+        ct_x, ct_y, _ct_w, _ct_h = preset.content_box
+        filter_complex = filter_complex[: -len("[ov]")] + (
+            f"[base];[{next_input}:v]format=rgba[ct];[base][ct]overlay={ct_x}:{ct_y}:format=auto[ov]"
+        )
+        next_input += 1
+    if second_avatar_video_path:
+        # Dialogue layout: the second presenter shares the avatar box size
+        av2_x, av2_y = preset.second_avatar_pos
+        filter_complex = filter_complex[: -len("[ov]")] + (
+            f"[duo];[{next_input}:v]{fit_avatar}[av2];[duo][av2]overlay={av2_x}:{av2_y}:format=auto[ov]"
+        )
+    if subtitle_ass and start_seconds:
+        # A segment of a longer video: shift onto the script's timeline for the captions, then back
+        subtitle_ass = Path(subtitle_ass)
+        filter_complex += (
+            f";[ov]setpts=PTS+{start_seconds:.3f}/TB,subtitles={subtitle_ass.name},"
+            "setpts=PTS-STARTPTS,format=yuv420p[v]"
+        )
+    elif subtitle_ass:
         subtitle_ass = Path(subtitle_ass)
         filter_complex += f";[ov]subtitles={subtitle_ass.name},format=yuv420p[v]"
     else:
         filter_complex += ";[ov]format=yuv420p[v]"
 
+    # Face-ROI rate control: the encoder spends bits on the faces and saves them on the static
+    # frame around them. Regions travel as frame side data, so they go on after the last filter.
+    rate_control = rate_control or {}
+    face_regions = []
+    if rate_control.get("face_roi"):
+        boxes = [(face_box, preset.avatar_pos)]
+        if second_avatar_video_path:
+            boxes.append((second_face_box, preset.second_avatar_pos))
+        face_regions = [
+            map_face_box(box, pos, preset.avatar_box, (width, height), float(rate_control.get("padding", 0.15)))
+            for box, pos in boxes
+        ]
+        roi = _roi_filters(face_regions, (width, height), rate_control)
+        filter_complex = filter_complex[: -len("[v]")] + f",{roi}[v]"
+
+    # Rendition ladder: the composite is decoded and built once, then split into scaled encodes
+    ladder = plan_ladder(renditions or [], out_path, (width, height), encoder, preset_speed, crf)
+    if ladder:
+        filter_complex = filter_complex[: -len("[v]")] + f",split={len(ladder) + 1}[v]" + "".join(
+            f"[l{i}]" for i in range(len(ladder))
+        )
+        for i, rung in enumerate(ladder):
+            filter_complex += f";[l{i}]scale={rung['width']}:{rung['height']}:flags=bicubic"
+            if face_regions:
+                # scale keeps the side data but not its coordinates; replace it with scaled regions
+                factor = rung["width"] / width
+                scaled = [tuple(round(v * factor) for v in region) for region in face_regions]
+                filter_complex += "," + _roi_filters(scaled, (rung["width"], rung["height"]), rate_control, clear=True)
+            filter_complex += f"[r{i}]"
+
     cmd = [ffmpeg_path, "-y"]
     if bg_is_image:
         cmd += ["-loop", "1", "-i", str(background_path)]
     else:
         cmd += ["-i", str(background_path)]
     cmd += ["-i", str(avatar_video_path)]
+    # Lossless intermediates carry no audio; take it from the TTS track instead
+    audio_map = "1:a?"
+    if audio_path:
+        cmd += ["-i", str(Path(audio_path).resolve())]
+        audio_map = "2:a"
+    if content_track:
+        cmd += ["-i", str(Path(content_track).resolve())]
+    if second_avatar_video_path:
+        cmd += ["-i", str(Path(second_avatar_video_path).resolve())]
+
+    cmd += ["-filter_complex", filter_complex]
+    outputs = [("[v]", encoder, preset_speed, crf, out_path)]
+    outputs += [(f"[r{i}]", r["encoder"], r["preset"], r["crf"], r["path"]) for i, r in enumerate(ladder)]
+    for label, out_encoder, out_speed, out_crf, path in outputs:
+        # Output options are per file, so each rendition repeats rate, mapping and duration
+        cmd += [
+            "-r",
+            str(preset.fps),
+            "-map",
+            label,
+            "-map",
+            audio_map,
+            *_video_codec_args(out_encoder, out_speed, out_crf, preset.fps, rate_control),
+            "-shortest",
+        ]
+        if duration_seconds:
+            cmd += ["-t", f"{duration_seconds:.3f}"]
+        if fragmented:
+            cmd += FRAGMENTED_MP4_FLAGS
+        cmd += [str(path)]
+
+    governor().run("compose", cmd, check=True, cwd=str(out_path.parent))
+    if ladder:
+        write_rendition_manifest(out_path, ladder, (width, height), encoder, crf, preset.fps)
+    return out_path
+
+
+def map_face_box(
+    face_box: tuple[float, float, float, float] | None,
+    avatar_pos: tuple[int, int],
+    avatar_box: tuple[int, int],
+    resolution: tuple[int, int],
+    padding: float = 0.15,
+) -> tuple[int, int, int, int]:
+    # Normalized face box in the avatar image -> (x, y, w, h) in composite pixels, padded by a
+    # fraction of the face size on each side (hair, chin, head motion) and clamped to the frame
+    from .image_utils import DEFAULT_FACE_BOX
+
+    fx, fy, fw, fh = face_box or DEFAULT_FACE_BOX
+    av_x, av_y = avatar_pos
+    av_w, av_h = avatar_box
+    x0 = av_x + (fx - fw * padding) * av_w
+    y0 = av_y + (fy - fh * padding) * av_h
+    x1 = av_x + (fx + fw * (1 + padding)) * av_w
+    y1 = av_y + (fy + fh * (1 + padding)) * av_h
+    width, height = resolution
+    x0, y0 = max(0, int(x0)), max(0, int(y0))
+    x1, y1 = min(width, int(round(x1))), min(height, int(round(y1)))
+    return x0, y0, max(1, x1 - x0), max(1, y1 - y0)
+
+
+def _roi_filters(
+    regions: list[tuple[int, int, int, int]], resolution: tuple[int, int], rate_control: dict, clear: bool = False
+) -> str:
+    # The encoder applies the first region that covers a block, so faces come before the
+    # full-frame background offset. qoffset runs -1 (best) .. 1 (worst).
+    face_q = float(rate_control.get("qoffset", -0.3))
+    background_q = float(rate_control.get("background_qoffset", 0.3))
+    filters = [f"addroi={x}:{y}:{w}:{h}:qoffset={face_q:g}" for x, y, w, h in regions]
+    if background_q:
+        filters.append(f"addroi=0:0:{resolution[0]}:{resolution[1]}:qoffset={background_q:g}")
+    if clear:
+        filters[0] += ":clear=1"
+    return ",".join(filters)
+
+
+def mux_subtitles(
+    video_path: str | Path,
+    out_path: str | Path,
+    tracks: list[tuple[str | Path, str]],
+    ffmpeg_path: str = "ffmpeg",
+) -> Path:
+    # Soft captions: picture and sound are stream-copied and each (subtitle file, language)
+    # becomes a mov_text track, so changing captions never re-encodes. Existing subtitle tracks
+    # are replaced. Written next to out_path and moved in, so out_path may be video_path.
+    video_path = Path(video_path).resolve()
+    out_path = Path(out_path).resolve()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.stem + ".mux" + out_path.suffix)
+    cmd = [ffmpeg_path, "-y", "-i", str(video_path)]
+    for path, _language in tracks:
+        cmd += ["-i", str(Path(path).resolve())]
+    cmd += ["-map", "0:v", "-map", "0:a?"]
+    for i in range(len(tracks)):
+        cmd += ["-map", f"{i + 1}:s"]
+    cmd += ["-c:v", "copy", "-c:a", "copy", "-c:s", "mov_text"]
+    for i, (_path, language) in enumerate(tracks):
+        cmd += [f"-metadata:s:s:{i}", f"language={language}"]
+    cmd += ["-movflags", "+faststart", str(tmp)]
+    governor().run("mux", cmd, check=True)
+    tmp.replace(out_path)
+    return out_path
+
+
+def rendition_path(out_path: str | Path, name: str) -> Path:
+    out_path = Path(out_path)
+    return out_path.with_name(f"{out_path.stem}_{name}{out_path.suffix}")
+
+
+def rendition_manifest_path(out_path: str | Path) -> Path:
+    out_path = Path(out_path)
+    return out_path.with_name(f"{out_path.stem}_renditions.json")
+
+
+def write_rendition_manifest(
+    out_path: str | Path,
+    ladder: list[dict],
+    resolution: tuple[int, int],
+    encoder: str,
+    crf: int,
+    fps: int,
+) -> Path:
+    out_path = Path(out_path)
+    entries = [
+        {
+            "name": "source",
+            "path": out_path,
+            "width": resolution[0],
+            "height": resolution[1],
+            "encoder": encoder,
+            "crf": crf,
+        }
+    ]
+    entries += [{key: rung[key] for key in ("name", "path", "width", "height", "encoder", "crf")} for rung in ladder]
+    manifest = {
+        "fps": fps,
+        "renditions": [
+            {**entry, "path": Path(entry["path"]).name, "bytes": Path(entry["path"]).stat().st_size}
+            for entry in entries
+        ],
+    }
+    manifest_path = rendition_manifest_path(out_path)
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest_path
+
+
+def plan_ladder(
+    renditions: list[dict],
+    out_path: str | Path,
+    resolution: tuple[int, int],
+    encoder: str,
+    preset_speed: str,
+    crf: int,
+) -> list[dict]:
+    # Each rung keeps the composite's aspect ratio; settings not given fall back to the main encode.
+    # Rungs at or above the composite's own height would only upscale, so they are skipped.
+    width, height = resolution
+    ladder = []
+    for rendition in renditions:
+        rung_height = int(rendition["height"])
+        if rung_height >= height:
+            continue
+        rung_height -= rung_height % 2
+        name = rendition.get("name") or f"{rung_height}p"
+        ladder.append(
+            {
+                "name": name,
+                "path": rendition_path(out_path, name),
+                "width": int(round(width * rung_height / height / 2)) * 2,
+                "height": rung_height,
+                "encoder": rendition.get("encoder", encoder),
+                "preset": rendition.get("preset", preset_speed),
+                "crf": int(rendition.get("crf", crf)),
+            }
+        )
+    return ladder
+
+
+def encode_video(
+    video_path: str | Path,
+    out_path: str | Path,
+    audio_path: str | Path | None = None,
+    ffmpeg_path: str = "ffmpeg",
+    encoder: str = "libx264",
+    preset_speed: str = "veryfast",
+    crf: int = 23,
+    fragmented: bool = False,
+) -> Path:
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [ffmpeg_path, "-y", "-i", str(video_path)]
+    if audio_path:
+        cmd += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a"]
+    cmd += [*_video_codec_args(encoder, preset_speed, crf), "-shortest"]
+    if fragmented:
+        cmd += FRAGMENTED_MP4_FLAGS
+    cmd += [str(out_path)]
+    governor().run("encode", cmd, check=True)
+    return out_path
+
+
+def interpolate_video(
+    video_path: str | Path,
+    out_path: str | Path,
+    fps: int,
+    frame_count: int,
+    method: str = "blend",
+    ffmpeg_path: str = "ffmpeg",
+) -> Path:
+    # Raise a low-fps render to the output rate on CPU. "blend" cross-fades neighbouring frames
+    # (framerate filter); "mci" is motion-compensated (minterpolate), slower but sharper on motion.
+    if method == "blend":
+        interp = f"framerate=fps={fps}"
+    elif method == "mci":
+        interp = f"minterpolate=fps={fps}:mi_mode=mci:mc_mode=aobmc:me_mode=bidir:vsbmc=1"
+    else:
+        raise ValueError(f"Unknown interpolation method: {method}")
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    # Timestamps start at 0 on both sides, so frame j lands at j/fps like the audio expects;
+    # the last frame is cloned so the clip always reaches exactly frame_count frames.
+    cmd = [
+        ffmpeg_path,
+        "-y",
+        "-i",
+        str(video_path),
+        "-an",
+        "-vf",
+        f"{interp},tpad=stop_mode=clone:stop_duration=1",
+        "-frames:v",
+        str(frame_count),
+        "-c:v",
+        "ffv1",
+        "-level",
+        "3",
+        "-g",
+        "1",
+        "-f",
+        "nut",
+        str(out_path),
+    ]
+    governor().run("interpolate", cmd, check=True)
+    return out_path
+
+
+def _video_codec_args(
+    encoder: str, preset_speed: str, crf: int, fps: int | None = None, rate_control: dict | None = None
+) -> list[str]:
+    rate_control = rate_control or {}
     quality_flag = "-crf"
     extra_rc = []
     if "nvenc" in encoder:
         quality_flag = "-cq"
         extra_rc = ["-rc", "vbr"]
-
-    cmd += [
-        "-filter_complex",
-        filter_complex,
-        "-r",
-        str(preset.fps),
-        "-map",
-        "[v]",
-        "-map",
-        "1:a?",
+        if rate_control.get("face_roi") or rate_control.get("static_background"):
+            # NVENC ignores ROI side data; its adaptive quantization is the nearest equivalent,
+            # spatial for the detailed face, temporal for the background that doesn't change
+            extra_rc += ["-spatial-aq", "1", "-temporal-aq", "1", "-rc-lookahead", "20"]
+    if rate_control.get("static_background") and fps:
+        # Keyframes re-send the whole unchanged frame; space them out on a static background
+        extra_rc += ["-g", str(int(fps * float(rate_control.get("keyframe_seconds", 10))))]
+    return [
         "-c:v",
         encoder,
         "-preset",
@@ -72,11 +390,4 @@ def compose_video(
         str(crf),
         "-pix_fmt",
         "yuv420p",
-        "-shortest",
     ]
-    if duration_seconds:
-        cmd += ["-t", f"{duration_seconds:.3f}"]
-    cmd += [str(out_path)]
-
-    subprocess.run(cmd, check=True, cwd=str(out_path.parent))
-    return out_path
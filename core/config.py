@@ -10,6 +10,7 @@ DEFAULT_CONFIG = {
     "image_size": 512,
     "tts": {
         "enable": True,
+        "backend": "xtts",
         "model_name": "tts_models/multilingual/multi-dataset/xtts_v2",
         "language": "en",
     },
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+# "Name: line"; untagged lines continue the previous speaker's turn. Names are letters with
+# spaces, dots, apostrophes or hyphens (no digits), so "Step 1: budget" is never a speaker.
+_TAG = re.compile(r"^\s*([^\W\d_](?:[^\W\d_]|[ .'\-]){0,31}?)\s*:\s*(.+)$")
+
+
+@dataclass
+class DialogueLine:
+    speaker: int  # 0 = first presenter, 1 = second, in order of first appearance
+    text: str
+
+
+@dataclass
+class SpeakerSpan:
+    speaker: int
+    start: float  # seconds on the mixed track
+    end: float
+
+
+def parse_dialogue(script_text: str) -> tuple[list[str], list[DialogueLine]]:
+    names: list[str] = []
+    lines: list[DialogueLine] = []
+    for raw in script_text.splitlines():
+        if not raw.strip():
+            continue
+        match = _TAG.match(raw)
+        known = [n.lower() for n in names]
+        if match and len(names) == 2 and match.group(1).strip().lower() not in known:
+            # Both speakers are known: "Note: bring laptops." is part of the current turn
+            match = None
+        if match:
+            name, text = match.group(1).strip(), match.group(2).strip()
+            if name.lower() not in known:
+                names.append(name)
+            speaker = [n.lower() for n in names].index(name.lower())
+            lines.append(DialogueLine(speaker=speaker, text=text))
+        elif lines:
+            lines[-1].text += " " + raw.strip()
+        else:
+            raise ValueError("Dialogue scripts must start with a speaker tag, e.g. 'Anna: Hello'")
+    if not lines:
+        raise ValueError("Dialogue script is empty")
+    return names, lines
+
+
+def mix_lines(
+    lines: list[DialogueLine],
+    line_wavs: list[Path],
+    out_path: str | Path,
+    gap_seconds: float = 0.3,
+) -> list[SpeakerSpan]:
+    # Lines are laid end to end with a short pause between turns; the spans say who speaks when
+    pieces = []
+    spans = []
+    sample_rate = None
+    cursor = 0
+    for line, wav in zip(lines, line_wavs):
+        data, rate = sf.read(str(wav), dtype="float32", always_2d=True)
+        if sample_rate is None:
+            sample_rate = rate
+        elif rate != sample_rate:
+            raise ValueError(f"Dialogue lines must share a sample rate: {wav} is {rate} Hz, expected {sample_rate}")
+        if pieces:
+            gap = np.zeros((int(gap_seconds * sample_rate), data.shape[1]), dtype=np.float32)
+            pieces.append(gap)
+            cursor += len(gap)
+        spans.append(SpeakerSpan(line.speaker, cursor / sample_rate, (cursor + len(data)) / sample_rate))
+        pieces.append(data)
+        cursor += len(data)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    channels = min(p.shape[1] for p in pieces)
+    sf.write(str(out_path), np.concatenate([p[:, :channels] for p in pieces]), sample_rate)
+    return spans
+
+
+def speaker_mask(spans: list[SpeakerSpan], speaker: int, fps: int, total_frames: int) -> np.ndarray:
+    mask = np.zeros(total_frames, dtype=bool)
+    for span in spans:
+        if span.speaker == speaker:
+            mask[int(span.start * fps) : int(np.ceil(span.end * fps))] = True
+    return mask
+
+
+def save_spans(spans: list[SpeakerSpan], path: str | Path) -> Path:
+    path = Path(path)
+    path.write_text(json.dumps([asdict(s) for s in spans], indent=2), encoding="utf-8")
+    return path
+
+
+def load_spans(path: str | Path) -> list[SpeakerSpan]:
+    return [SpeakerSpan(**s) for s in json.loads(Path(path).read_text(encoding="utf-8"))]
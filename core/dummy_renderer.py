@@ -6,7 +6,7 @@ from pathlib import Path
 
 from PIL import Image, ImageDraw, ImageFont
 
-import subprocess
+from .governor import governor
 
 
 def generate_dummy_audio(out_wav: str | Path, duration_seconds: float = 4.0, freq_hz: float = 440.0) -> Path:
@@ -29,11 +29,14 @@ def generate_dummy_audio(out_wav: str | Path, duration_seconds: float = 4.0, fre
     return out_wav
 
 
-def generate_dummy_image(out_path: str | Path, size: int = 512, label: str = "RealTalk Demo") -> Path:
+def generate_dummy_image(
+    out_path: str | Path, size: int | tuple[int, int] = 512, label: str = "RealTalk Demo"
+) -> Path:
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    img = Image.new("RGB", (size, size), (20, 24, 33))
+    width, height = (size, size) if isinstance(size, int) else size
+    img = Image.new("RGB", (width, height), (20, 24, 33))
     draw = ImageDraw.Draw(img)
 
     # Use default font for portability
@@ -41,8 +44,8 @@ def generate_dummy_image(out_path: str | Path, size: int = 512, label: str = "Re
     bbox = draw.textbbox((0, 0), text)
     text_w = bbox[2] - bbox[0]
     text_h = bbox[3] - bbox[1]
-    x = (size - text_w) // 2
-    y = (size - text_h) // 2
+    x = (width - text_w) // 2
+    y = (height - text_h) // 2
     draw.text((x, y), text, fill=(220, 230, 255))
 
     img.save(out_path)
@@ -77,5 +80,5 @@ def generate_dummy_video(
         str(out_path),
     ]
 
-    subprocess.run(cmd, check=True)
+    governor().run("dummy", cmd, check=True)
     return out_path
@@ -1,17 +1,21 @@
 ﻿from __future__ import annotations
 
 import os
-import subprocess
 from pathlib import Path
 import tempfile
 import shutil
 
+import numpy as np
 import soundfile as sf
 
+from .audio_features import RUNNER_PATH, slice_audio_features
+from .governor import governor
+
 
 def _has_audio_stream(video_path: Path) -> bool:
     try:
-        result = subprocess.run(
+        result = governor().run(
+            "probe",
             [
                 "ffprobe",
                 "-v",
@@ -54,6 +58,7 @@ def _write_config(
     image_path: Path,
     audio_path: Path,
     config_path: Path,
+    pose_dir: Path | None = None,
 ) -> None:
     inference_cfg = echomimic_dir / "configs" / "inference" / "inference_v2.yaml"
     config_text = f"""pretrained_base_model_path: \"{(weights_dir / 'sd-image-variations-diffusers').as_posix()}/\"
@@ -71,18 +76,41 @@ weight_dtype: 'fp16'
 test_cases:
   \"{image_path.as_posix()}\": 
     - \"{audio_path.as_posix()}\"
+"""
+    if pose_dir is not None:
+        config_text += f"""    - \"{pose_dir.as_posix()}\"
 """
     config_path.write_text(config_text, encoding="utf-8")
 
 
+def expected_frames(audio_path: str | Path, fps: int) -> int:
+    # Number of frames run_echomimic asks for: the audio's length, capped for quick test renders
+    frames = max(12, int(sf.info(str(audio_path)).duration * fps))
+    max_frames_env = os.environ.get("CODEXOFFLINEVIDEO_ECHOMIMIC_MAX_FRAMES")
+    if max_frames_env:
+        try:
+            frames = min(frames, int(max_frames_env))
+        except ValueError:
+            pass
+    return frames
+
+
 def run_echomimic(
     echomimic_dir: str | Path,
     weights_dir: str | Path,
     image_path: str | Path,
     audio_path: str | Path,
     out_path: str | Path,
-    ref_video: str | Path | None = None,
+    pose_frames: str | Path | None = None,
     config_name: str = "configs/infer_audio2vid.yaml",
+    fps: int = 24,
+    audio_features: str | Path | None = None,
+    feature_offset: int = 0,
+    scratch_dir: str | Path | None = None,
+    lossless: bool = False,
+    ffmpeg_path: str = "ffmpeg",
+    size: tuple[int, int] | None = None,
+    seed: int | None = None,
 ) -> Path:
     echomimic_dir = Path(echomimic_dir).resolve()
     weights_dir = Path(weights_dir).resolve()
@@ -95,7 +123,9 @@ def run_echomimic(
     if not weights_dir.exists():
         raise FileNotFoundError(f"EchoMimic weights not found: {weights_dir}")
 
-    script_path = echomimic_dir / "infer_audio2vid.py"
+    # Motion cloning drives EchoMimic's pose-conditioned entry point
+    script_name = "infer_audio2vid_pose.py" if pose_frames else "infer_audio2vid.py"
+    script_path = echomimic_dir / script_name
     if not script_path.exists():
         raise FileNotFoundError(f"EchoMimic script not found: {script_path}")
 
@@ -103,68 +133,89 @@ def run_echomimic(
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     # Build a temp config for the current inputs (EchoMimic CLI reads test_cases from config)
-    tmp_dir = Path(tempfile.mkdtemp(prefix="echomimic_", dir=str(out_path.parent)))
-    config_file = tmp_dir / "config.yaml"
-    _write_config(echomimic_dir, weights_dir, image_path, audio_path, config_file)
-
-    # Derive number of frames from audio length (default FPS 24)
-    fps = 24
-    duration_sec = sf.info(str(audio_path)).duration
-    frames = max(12, int(duration_sec * fps))
-    max_frames_env = os.environ.get("CODEXOFFLINEVIDEO_ECHOMIMIC_MAX_FRAMES")
-    if max_frames_env:
-        try:
-            frames = min(frames, int(max_frames_env))
-        except ValueError:
-            pass
-
-    # Snapshot existing EchoMimic outputs so we can find the new file
-    echomimic_output_dir = echomimic_dir / "output"
-    existing = set()
-    if echomimic_output_dir.exists():
-        existing = {p.resolve() for p in echomimic_output_dir.rglob("*.mp4")}
-
-    cmd = [
-        "python",
-        str(script_path),
-        "--config",
-        str(config_file),
-        "-W",
-        "512",
-        "-H",
-        "512",
-        "-L",
-        str(frames),
-        "--fps",
-        str(fps),
-        "--device",
-        "cuda",
-    ]
-
-    steps_env = os.environ.get("CODEXOFFLINEVIDEO_ECHOMIMIC_STEPS")
-    if steps_env:
-        cmd.extend(["--steps", steps_env])
-
-    env = os.environ.copy()
-    subprocess.run(cmd, cwd=str(echomimic_dir), check=True, env=env)
-
-    # Find newest mp4 produced by EchoMimic
-    new_files = []
-    if echomimic_output_dir.exists():
-        for p in echomimic_output_dir.rglob("*.mp4"):
-            rp = p.resolve()
-            if rp not in existing:
-                new_files.append(rp)
-
-    if not new_files:
-        # Fallback: take latest file by mtime
-        new_files = sorted(
-            [p.resolve() for p in echomimic_output_dir.rglob("*.mp4")],
-            key=lambda p: p.stat().st_mtime,
-            reverse=True,
-        )
-
-    newest = _pick_best_output(new_files)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(newest, out_path)
-    return out_path
+    scratch_dir = Path(scratch_dir).resolve() if scratch_dir else out_path.parent
+    scratch_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix="echomimic_", dir=str(scratch_dir)))
+    try:
+        frames = expected_frames(audio_path, fps)
+
+        # Render at the prepared avatar's own size (see AvatarPipeline._avatar_size); EchoMimic
+        # would otherwise resize it to 512x512 and compose would scale it back to the preset box
+        if size is None:
+            from PIL import Image
+
+            with Image.open(image_path) as img:
+                size = img.size
+        width, height = size
+
+        pose_dir = None
+        if pose_frames:
+            from .motion import write_pose_dir
+
+            poses = np.load(str(pose_frames))
+            if len(poses) < frames:
+                poses = poses[np.arange(frames) % len(poses)]
+            pose_dir = write_pose_dir(poses[:frames], tmp_dir / "pose", width, height)
+
+        config_file = tmp_dir / "config.yaml"
+        _write_config(echomimic_dir, weights_dir, image_path, audio_path, config_file, pose_dir)
+
+        script_args = [
+            "--config",
+            str(config_file),
+            "-W",
+            str(width),
+            "-H",
+            str(height),
+            "-L",
+            str(frames),
+            "--fps",
+            str(fps),
+            "--device",
+            "cuda",
+        ]
+
+        if seed is not None:
+            script_args.extend(["--seed", str(seed)])
+
+        steps_env = os.environ.get("CODEXOFFLINEVIDEO_ECHOMIMIC_STEPS")
+        if steps_env:
+            script_args.extend(["--steps", steps_env])
+
+        runner_args = []
+        if audio_features:
+            # Serve this chunk's slice of the whole-track whisper features instead of re-extracting
+            features_slice = slice_audio_features(audio_features, feature_offset, frames, tmp_dir / "features.npy")
+            runner_args += ["--audio-features", str(features_slice)]
+        if lossless:
+            runner_args += ["--lossless", "--ffmpeg", ffmpeg_path]
+
+        # EchoMimic writes to "output/" under its cwd; a per-run cwd keeps concurrent renders
+        # (multi-GPU governor, server slots, multi-capacity farm workers) out of each other's files
+        run_dir = tmp_dir / "run"
+        run_dir.mkdir()
+        cmd = [
+            "python",
+            str(RUNNER_PATH),
+            "--script",
+            str(script_path),
+            "--echomimic-dir",
+            str(echomimic_dir),
+            *runner_args,
+            "--",
+            *script_args,
+        ]
+
+        env = os.environ.copy()
+        bundled_ffmpeg = echomimic_dir / "ffmpeg-4.4-amd64-static"
+        if "FFMPEG_PATH" not in env and bundled_ffmpeg.is_dir():
+            # The scripts fall back to this checkout-relative ffmpeg, which the run cwd would hide
+            env["FFMPEG_PATH"] = str(bundled_ffmpeg)
+        governor().run("echomimic", cmd, cwd=str(run_dir), check=True, env=env)
+
+        newest = _pick_best_output([p.resolve() for p in run_dir.rglob("*.mp4")])
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(newest, out_path)
+        return out_path
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import argparse
+import runpy
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Launched by core.echomimic with the EchoMimic checkout on sys.path (--echomimic-dir,
+# else the cwd), so that EchoMimic's `src` package is importable and can be patched
+# before the inference script runs. Renders run with a per-run cwd, so the script's
+# relative "output/" directory belongs to that run alone.
+
+
+class PrecomputedAudioFeatures:
+    # Stands in for EchoMimic's Audio2Feature, serving per-frame whisper windows from disk.
+    def __init__(self, frames: np.ndarray):
+        self.frames = frames
+
+    def audio2feat(self, audio_path):
+        return self.frames
+
+    def feature2chunks(self, feature_array, fps, *args, **kwargs):
+        return np.asarray(feature_array, dtype=np.float32)
+
+
+def extract_features(model_path: str, audio_path: str, out_path: str, fps: int, device: str) -> None:
+    from src.models.whisper.audio2feature import load_audio_model
+
+    processor = load_audio_model(model_path=model_path, device=device)
+    feature = processor.audio2feat(audio_path)
+    chunks = processor.feature2chunks(feature_array=feature, fps=fps)
+    np.save(out_path, np.stack([np.asarray(c) for c in chunks]).astype(np.float16))
+
+
+def install_audio_features(features_path: str) -> None:
+    import src.models.whisper.audio2feature as audio2feature
+
+    frames = np.load(features_path)
+
+    def load_audio_model(*args, **kwargs):
+        return PrecomputedAudioFeatures(frames)
+
+    audio2feature.load_audio_model = load_audio_model
+
+
+def install_lossless_output(ffmpeg_path: str) -> None:
+    # Replace EchoMimic's lossy MP4 writer with an FFV1/NUT frame pipe, and skip its
+    # moviepy "_withaudio" re-encode; the pipeline muxes the TTS audio at compose time.
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    import src.utils.util as util
+
+    from core.frame_pipe import FrameWriter
+
+    def save_videos_grid(videos, path, rescale=False, n_rows=6, fps=8, **kwargs):
+        clip = videos[0]
+        _channels, length, height, width = clip.shape
+        with FrameWriter(path, width, height, fps, ffmpeg_path=ffmpeg_path) as writer:
+            for i in range(length):
+                frame = clip[:, i]
+                if rescale:
+                    frame = (frame + 1.0) / 2.0
+                frame = (frame.clamp(0, 1) * 255).to("cpu").byte().permute(1, 2, 0).numpy()
+                writer.write(frame)
+
+    util.save_videos_grid = save_videos_grid
+
+    try:
+        from moviepy.video.VideoClip import VideoClip
+    except Exception:
+        return
+
+    def write_videofile(self, *args, **kwargs):
+        return None
+
+    VideoClip.write_videofile = write_videofile
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    passthrough: list[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, passthrough = argv[:split], argv[split + 1 :]
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--script", default="infer_audio2vid.py")
+    parser.add_argument("--audio-features")
+    parser.add_argument("--extract-features")
+    parser.add_argument("--audio")
+    parser.add_argument("--audio-model")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--lossless", action="store_true")
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--echomimic-dir")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(Path(args.echomimic_dir) if args.echomimic_dir else Path.cwd()))
+
+    if args.extract_features:
+        extract_features(args.audio_model, args.audio, args.extract_features, args.fps, args.device)
+        return
+
+    if args.audio_features:
+        install_audio_features(args.audio_features)
+    if args.lossless:
+        install_lossless_output(args.ffmpeg)
+
+    script = str(Path(args.script).resolve())
+    sys.argv = [script, *passthrough]
+    runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,554 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict
+
+from .artifacts import ArtifactStore
+from .governor import configure_governor
+
+# Coordinator/worker protocol (JSON over HTTP):
+#   GET  /status                 -> {"worker_id", "capacity", "running", "artifacts"}
+#   GET  /artifacts/<id>         -> artifact bytes (404 if missing)
+#   PUT  /artifacts/<id>         <- artifact bytes, verified against the id
+#   POST /tasks                  <- {"task_id", "kind", "params", "inputs"} (503 when full)
+#   GET  /tasks/<task_id>        -> {"state", "outputs", "error"}
+#   DELETE /tasks/<task_id>      -> forgets a finished task once its outputs are fetched
+
+TaskHandler = Callable[[dict, Dict[str, Path], Path, dict], Dict[str, Path]]
+
+
+def _render_chunk(params: dict, inputs: Dict[str, Path], work_dir: Path, config: dict) -> Dict[str, Path]:
+    from .dummy_renderer import generate_dummy_video
+    from .echomimic import run_echomimic
+
+    from .frame_pipe import LOSSLESS_SUFFIX
+
+    lossless = bool(params.get("lossless", False))
+    out_path = work_dir / ("chunk" + (LOSSLESS_SUFFIX if lossless else ".mp4"))
+    if os.environ.get("CODEXOFFLINEVIDEO_DUMMY", "0") == "1":
+        generate_dummy_video(
+            image_path=inputs["image"],
+            audio_path=inputs["audio"],
+            out_path=out_path,
+            ffmpeg_path=config.get("ffmpeg_path", "ffmpeg"),
+        )
+    else:
+        run_echomimic(
+            echomimic_dir=config["echo_mimic_dir"],
+            weights_dir=config["echo_mimic_weights"],
+            image_path=inputs["image"],
+            audio_path=inputs["audio"],
+            out_path=out_path,
+            fps=int(params.get("fps", 24)),
+            pose_frames=inputs.get("pose_frames"),
+            audio_features=inputs.get("audio_features"),
+            feature_offset=int(params.get("feature_offset", 0)),
+            seed=params.get("seed"),
+            scratch_dir=work_dir,
+            lossless=lossless,
+            ffmpeg_path=config.get("ffmpeg_path", "ffmpeg"),
+        )
+    return {"video": out_path}
+
+
+def _compose_segment(params: dict, inputs: Dict[str, Path], work_dir: Path, config: dict) -> Dict[str, Path]:
+    import shutil
+
+    from .compositing import compose_video, plan_ladder
+    from .presets import get_preset
+
+    preset = get_preset(params["preset"])
+    if preset is None:
+        raise ValueError(f"Unknown preset: {params['preset']}")
+    subtitle_ass = None
+    if "subtitle_ass" in inputs:
+        # compose_video references subtitles relative to the output directory
+        subtitle_ass = work_dir / "speech.ass"
+        shutil.copy2(inputs["subtitle_ass"], subtitle_ass)
+    out_path = work_dir / "composed.mp4"
+    compose_video(
+        background_path=inputs["background"],
+        avatar_video_path=inputs["avatar_video"],
+        out_path=out_path,
+        preset=preset,
+        ffmpeg_path=config.get("ffmpeg_path", "ffmpeg"),
+        duration_seconds=params.get("duration_seconds"),
+        encoder=params.get("encoder", "libx264"),
+        preset_speed=params.get("preset_speed", "veryfast"),
+        crf=int(params.get("crf", 23)),
+        subtitle_ass=subtitle_ass,
+        audio_path=inputs.get("audio"),
+        renditions=params.get("renditions"),
+        content_track=inputs.get("content_track"),
+        second_avatar_video_path=inputs.get("second_avatar_video"),
+        face_box=params.get("face_box"),
+        second_face_box=params.get("second_face_box"),
+        rate_control=params.get("rate_control"),
+        avatar_size=params.get("avatar_size"),
+    )
+    outputs = {"video": out_path}
+    ladder = plan_ladder(
+        params.get("renditions") or [],
+        out_path,
+        preset.resolution,
+        params.get("encoder", "libx264"),
+        params.get("preset_speed", "veryfast"),
+        int(params.get("crf", 23)),
+    )
+    for rung in ladder:
+        outputs[f"rendition_{rung['name']}"] = rung["path"]
+    return outputs
+
+
+TASK_HANDLERS: Dict[str, TaskHandler] = {
+    "render_chunk": _render_chunk,
+    "compose_segment": _compose_segment,
+}
+
+
+class FarmWorker:
+    def __init__(
+        self,
+        store_dir: str | Path,
+        config: dict,
+        capacity: int = 1,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        worker_id: str | None = None,
+    ):
+        self.store = ArtifactStore(store_dir)
+        self.work_root = Path(store_dir) / "work"
+        self.config = config
+        configure_governor(config)
+        self.capacity = max(1, int(capacity))
+        self.worker_id = worker_id or f"{host}:{port}"
+        self.tasks: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), _make_worker_handler(self))
+        self.server.daemon_threads = True
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def running(self) -> int:
+        with self._lock:
+            return sum(1 for t in self.tasks.values() if t["state"] == "running")
+
+    def status(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "capacity": self.capacity,
+            "running": self.running(),
+            "artifacts": sorted(self.store.ids()),
+        }
+
+    def accept(self, task: dict) -> bool:
+        with self._lock:
+            if task["task_id"] in self.tasks:
+                return True
+            running = sum(1 for t in self.tasks.values() if t["state"] == "running")
+            if running >= self.capacity:
+                return False
+            self.tasks[task["task_id"]] = {"state": "running", "outputs": {}, "error": None}
+        threading.Thread(target=self._execute, args=(task,), daemon=True).start()
+        return True
+
+    def _execute(self, task: dict) -> None:
+        task_id = task["task_id"]
+        try:
+            handler = TASK_HANDLERS[task["kind"]]
+            inputs = {name: self.store.path_for(aid) for name, aid in task.get("inputs", {}).items()}
+            missing = [aid for aid, p in zip(task.get("inputs", {}).values(), inputs.values()) if not p.exists()]
+            if missing:
+                raise FileNotFoundError(f"Missing input artifacts: {missing}")
+            for path in inputs.values():
+                # Inputs the coordinator found already here were not uploaded again; mark them used
+                os.utime(path)
+            work_dir = self.work_root / task_id
+            work_dir.mkdir(parents=True, exist_ok=True)
+            outputs = handler(task.get("params", {}), inputs, work_dir, self.config)
+            output_ids = {name: self.store.put(path) for name, path in outputs.items()}
+            result = {"state": "done", "outputs": output_ids, "error": None}
+        except Exception as exc:
+            traceback.print_exc()
+            result = {"state": "failed", "outputs": {}, "error": str(exc)}
+        finally:
+            # Outputs now live in the store; the scratch of the run is not needed again
+            shutil.rmtree(self.work_root / task_id, ignore_errors=True)
+        with self._lock:
+            self.tasks[task_id] = result
+        self._trim_store()
+
+    def _trim_store(self) -> None:
+        # Between tasks the store keeps to workspace.cache_max_gb / cache_max_age_days, least
+        # recently used first. Inputs uploaded for a task that is about to start are younger
+        # than min_idle_minutes and stay.
+        from .workspace import trim_stores
+
+        if self.running():
+            return
+        ws_cfg = self.config.get("workspace", {})
+        max_gb = ws_cfg.get("cache_max_gb")
+        max_age_days = ws_cfg.get("cache_max_age_days")
+        trim_stores(
+            [self.store.root],
+            max_total_bytes=int(float(max_gb) * 1024**3) if max_gb else None,
+            max_age_seconds=float(max_age_days) * 86400 if max_age_days else None,
+            min_idle_seconds=float(ws_cfg.get("min_idle_minutes", 60)) * 60,
+        )
+
+    def forget(self, task_id: str) -> bool:
+        # The coordinator has fetched the result; running tasks stay until they finish
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None or task["state"] == "running":
+                return False
+            del self.tasks[task_id]
+        return True
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def start(self) -> "FarmWorker":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def shutdown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _make_worker_handler(worker: FarmWorker):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._send_json(200, worker.status())
+            elif self.path.startswith("/artifacts/"):
+                try:
+                    path = worker.store.path_for(self.path[len("/artifacts/") :])
+                except ValueError as exc:
+                    self._send_json(400, {"error": str(exc)})
+                    return
+                if not path.exists():
+                    self._send_json(404, {"error": "not found"})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(path.stat().st_size))
+                self.end_headers()
+                with path.open("rb") as f:
+                    while block := f.read(1 << 20):
+                        self.wfile.write(block)
+            elif self.path.startswith("/tasks/"):
+                with worker._lock:
+                    task = worker.tasks.get(self.path[len("/tasks/") :])
+                if task is None:
+                    self._send_json(404, {"error": "unknown task"})
+                else:
+                    self._send_json(200, task)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_PUT(self):
+            if not self.path.startswith("/artifacts/"):
+                self._send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                worker.store.put_stream(self.path[len("/artifacts/") :], self.rfile, length)
+            except ValueError as exc:
+                self._send_json(400, {"error": str(exc)})
+                return
+            self._send_json(201, {"ok": True})
+
+        def do_DELETE(self):
+            if not self.path.startswith("/tasks/"):
+                self._send_json(404, {"error": "not found"})
+            elif worker.forget(self.path[len("/tasks/") :]):
+                self._send_json(200, {"ok": True})
+            else:
+                self._send_json(409, {"error": "unknown or still running"})
+
+        def do_POST(self):
+            if self.path != "/tasks":
+                self._send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            task = json.loads(self.rfile.read(length) or b"{}")
+            if task.get("kind") not in TASK_HANDLERS:
+                self._send_json(400, {"error": f"unknown task kind: {task.get('kind')}"})
+            elif worker.accept(task):
+                self._send_json(202, {"accepted": True})
+            else:
+                self._send_json(503, {"accepted": False})
+
+    return Handler
+
+
+@dataclass
+class FarmTask:
+    kind: str
+    inputs: Dict[str, Path]
+    outputs: Dict[str, Path]
+    params: dict = field(default_factory=dict)
+    task_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    state: str = "pending"
+    worker: str | None = None
+    attempts: int = 0
+    error: str | None = None
+    input_ids: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class WorkerState:
+    url: str
+    capacity: int = 0
+    running: int = 0
+    artifacts: set = field(default_factory=set)
+    last_seen: float = 0.0
+    assigned: int = 0
+
+
+class FarmCoordinator:
+    def __init__(
+        self,
+        worker_urls: list[str],
+        store_dir: str | Path,
+        heartbeat_seconds: float = 2.0,
+        timeout_seconds: float = 10.0,
+        max_attempts: int = 3,
+        poll_seconds: float = 0.5,
+    ):
+        if not worker_urls:
+            raise ValueError("Render farm needs at least one worker URL")
+        self.store = ArtifactStore(store_dir)
+        self.workers = {url.rstrip("/"): WorkerState(url=url.rstrip("/")) for url in worker_urls}
+        self.heartbeat_seconds = heartbeat_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread: threading.Thread | None = None
+
+    def start(self) -> "FarmCoordinator":
+        self._heartbeat_once()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat_thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_seconds):
+            self._heartbeat_once()
+
+    def _heartbeat_once(self) -> None:
+        for state in list(self.workers.values()):
+            try:
+                status = _get_json(f"{state.url}/status", timeout=self.heartbeat_seconds)
+            except OSError:
+                continue
+            with self._lock:
+                state.capacity = int(status.get("capacity", 1))
+                state.running = int(status.get("running", 0))
+                state.artifacts = set(status.get("artifacts", []))
+                state.last_seen = time.monotonic()
+
+    def _alive(self, state: WorkerState) -> bool:
+        return bool(state.last_seen) and time.monotonic() - state.last_seen < self.timeout_seconds
+
+    def _pick_worker(self, task: FarmTask) -> WorkerState | None:
+        # Highest score wins: bytes of inputs already on the worker, then spare capacity.
+        best = None
+        best_score = None
+        with self._lock:
+            for state in self.workers.values():
+                if not self._alive(state):
+                    continue
+                free = state.capacity - max(state.running, state.assigned)
+                if free <= 0:
+                    continue
+                local_bytes = sum(
+                    self.store.path_for(aid).stat().st_size
+                    for aid in task.input_ids.values()
+                    if aid in state.artifacts
+                )
+                score = (local_bytes, free)
+                if best_score is None or score > best_score:
+                    best, best_score = state, score
+        return best
+
+    def _dispatch(self, task: FarmTask, state: WorkerState) -> bool:
+        try:
+            for aid in task.input_ids.values():
+                if aid not in state.artifacts:
+                    _put_file(f"{state.url}/artifacts/{aid}", self.store.path_for(aid))
+                    state.artifacts.add(aid)
+            payload = {
+                "task_id": task.task_id,
+                "kind": task.kind,
+                "params": task.params,
+                "inputs": task.input_ids,
+            }
+            accepted = _post_json(f"{state.url}/tasks", payload, timeout=self.timeout_seconds)
+        except urllib.error.HTTPError as exc:
+            # Only 503 is back-pressure (_post_json returns False for it); any other refusal is
+            # the task's fault and counts towards max_attempts like a failed run
+            task.attempts += 1
+            self._requeue(task, f"worker {state.url} rejected the task: HTTP {exc.code} {exc.reason}")
+            return False
+        except OSError:
+            return False
+        if not accepted:
+            return False
+        with self._lock:
+            state.assigned += 1
+        task.state = "running"
+        task.worker = state.url
+        task.attempts += 1
+        return True
+
+    def _release(self, task: FarmTask) -> None:
+        state = self.workers.get(task.worker or "")
+        if state is not None:
+            with self._lock:
+                state.assigned = max(0, state.assigned - 1)
+
+    def _requeue(self, task: FarmTask, error: str) -> None:
+        self._release(task)
+        task.error = error
+        if task.attempts >= self.max_attempts:
+            raise RuntimeError(f"Farm task {task.kind} {task.task_id} failed after {task.attempts} attempts: {error}")
+        task.state = "pending"
+        task.worker = None
+
+    def _poll(self, task: FarmTask) -> None:
+        state = self.workers[task.worker]
+        try:
+            status = _get_json(f"{state.url}/tasks/{task.task_id}", timeout=self.timeout_seconds)
+        except urllib.error.HTTPError as exc:
+            if exc.code == 404:
+                self._requeue(task, "worker lost the task")
+            return
+        except OSError:
+            if not self._alive(state):
+                self._requeue(task, f"worker {state.url} stopped responding")
+            return
+        if status["state"] == "done":
+            for name, aid in status["outputs"].items():
+                target = self.store.path_for(aid)
+                if not target.exists():
+                    _download(f"{state.url}/artifacts/{aid}", self.store, aid)
+                if name in task.outputs:
+                    self.store.export(aid, task.outputs[name])
+            self._release(task)
+            task.state = "done"
+            _delete(f"{state.url}/tasks/{task.task_id}", timeout=self.timeout_seconds)
+        elif status["state"] == "failed":
+            self._requeue(task, status.get("error") or "unknown error")
+        elif not self._alive(state):
+            self._requeue(task, f"worker {state.url} stopped responding")
+
+    def run(self, tasks: list[FarmTask], on_done: Callable[[FarmTask], None] | None = None) -> list[FarmTask]:
+        # on_done is called from this loop as each task's outputs land, in completion order, so
+        # callers can use early chunks while later ones are still rendering
+        for task in tasks:
+            task.input_ids = {name: self.store.put(path) for name, path in task.inputs.items()}
+
+        stalled_since = None
+        while True:
+            pending = [t for t in tasks if t.state == "pending"]
+            running = [t for t in tasks if t.state == "running"]
+            if not pending and not running:
+                return tasks
+            for task in pending:
+                state = self._pick_worker(task)
+                if state is None:
+                    break
+                self._dispatch(task, state)
+            for task in running:
+                self._poll(task)
+                if task.state == "done" and on_done is not None:
+                    on_done(task)
+
+            if pending and not running and not any(self._alive(s) for s in self.workers.values()):
+                stalled_since = stalled_since or time.monotonic()
+                if time.monotonic() - stalled_since > self.timeout_seconds:
+                    raise RuntimeError("No render farm workers are reachable")
+            else:
+                stalled_since = None
+            time.sleep(self.poll_seconds)
+
+
+def _get_json(url: str, timeout: float) -> dict:
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+def _post_json(url: str, payload: dict, timeout: float) -> bool:
+    req = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status == 202
+    except urllib.error.HTTPError as exc:
+        if exc.code == 503:
+            return False
+        raise
+
+
+def _delete(url: str, timeout: float) -> None:
+    # Best effort: a worker that misses this only keeps a small task record
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="DELETE"), timeout=timeout) as resp:
+            resp.read()
+    except OSError:
+        pass
+
+
+def _put_file(url: str, path: Path) -> None:
+    size = path.stat().st_size
+    with path.open("rb") as f:
+        req = urllib.request.Request(
+            url,
+            data=f,
+            headers={"Content-Length": str(size), "Content-Type": "application/octet-stream"},
+            method="PUT",
+        )
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+
+
+def _download(url: str, store: ArtifactStore, artifact_id: str) -> None:
+    with urllib.request.urlopen(url) as resp:
+        store.put_stream(artifact_id, resp, int(resp.headers.get("Content-Length", 0)))
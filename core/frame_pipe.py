@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import queue
+import subprocess
+import threading
+from pathlib import Path
+
+import numpy as np
+
+LOSSLESS_SUFFIX = ".nut"
+
+
+class FrameWriter:
+    # Streams raw RGB frames into ffmpeg's stdin. The queue is bounded, so a producer
+    # that outruns the encoder blocks in write() instead of buffering the whole clip.
+    def __init__(
+        self,
+        out_path: str | Path,
+        width: int,
+        height: int,
+        fps: float,
+        ffmpeg_path: str = "ffmpeg",
+        codec: str = "ffv1",
+        container: str = "nut",
+        queue_size: int = 8,
+    ):
+        self.out_path = Path(out_path)
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+        self.width = width
+        self.height = height
+        cmd = [
+            ffmpeg_path,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(fps),
+            "-i",
+            "-",
+            "-an",
+            "-c:v",
+            codec,
+        ]
+        if codec == "ffv1":
+            cmd += ["-level", "3", "-g", "1", "-slices", "4"]
+        cmd += ["-f", container, str(self.out_path)]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+
+    def _pump(self) -> None:
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._proc.stdin.write(frame.tobytes())
+            except BaseException as exc:
+                self._error = exc
+
+    def write(self, frame: np.ndarray) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Frame pipe to ffmpeg failed: {self._error}")
+        if frame.shape != (self.height, self.width, 3):
+            raise ValueError(f"Expected frame of shape {(self.height, self.width, 3)}, got {frame.shape}")
+        self._queue.put(np.ascontiguousarray(frame, dtype=np.uint8))
+
+    def close(self) -> Path:
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        returncode = self._proc.wait()
+        if self._error is not None or returncode != 0:
+            raise RuntimeError(f"ffmpeg frame pipe exited with {returncode}: {self._error}")
+        return self.out_path
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._queue.put(None)
+            self._thread.join()
+            self._proc.kill()
+            self._proc.wait()
+
+
+def read_frames(path: str | Path, width: int, height: int, ffmpeg_path: str = "ffmpeg"):
+    # Yields RGB frames decoded (and scaled, if needed) to width x height
+    cmd = [
+        ffmpeg_path,
+        "-loglevel",
+        "error",
+        "-i",
+        str(path),
+        "-vf",
+        f"scale={width}:{height}",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "-",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    frame_bytes = width * height * 3
+    try:
+        while True:
+            data = proc.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
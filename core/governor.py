@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Iterator
+
+_GOVERNOR = None
+_GOVERNOR_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class StageBudget:
+    gpu: bool = False  # holds a GPU lease; the process only sees its leased device
+    cores: int | None = None  # pinned to this many cores taken from the shared pool; None = unpinned
+    nice: int = 0  # POSIX nice increment; on Windows >0 is below-normal and >=10 idle priority
+    ram_gb: float = 0.0  # reserved against the governor's RAM budget while running
+
+
+# Diffusion owns the GPU; ffmpeg work is pinned to a few cores at lower priority so a compose
+# never starves EchoMimic's data loading or the GUI.
+DEFAULT_BUDGETS = {
+    "echomimic": StageBudget(gpu=True, ram_gb=6.0),
+    "features": StageBudget(gpu=True, ram_gb=3.0),
+    "compose": StageBudget(cores=4, nice=5, ram_gb=1.0),
+    "encode": StageBudget(cores=4, nice=5, ram_gb=0.5),
+    "interpolate": StageBudget(cores=4, nice=5, ram_gb=1.0),
+    "dummy": StageBudget(cores=2, nice=5, ram_gb=0.5),
+    "concat": StageBudget(cores=1, nice=5),
+    "mux": StageBudget(cores=1, nice=5),
+    "quality": StageBudget(cores=1, nice=5),
+    "probe": StageBudget(),
+    # In-process stages take a lease for admission only: the model stays on the device it was
+    # loaded on and the process is not re-pinned, but renders and encodes wait while they run
+    "tts": StageBudget(gpu=True, ram_gb=2.0),
+    "tts_cpu": StageBudget(cores=2, ram_gb=2.0),
+    "face": StageBudget(cores=1, ram_gb=0.5),
+}
+
+
+@dataclass
+class Lease:
+    stage: str
+    budget: StageBudget
+    gpu: str | None = None
+    cores: list[int] = field(default_factory=list)
+
+    def env(self, env: dict | None = None) -> dict | None:
+        if self.gpu is None:
+            return env
+        env = dict(os.environ if env is None else env)
+        env["CUDA_VISIBLE_DEVICES"] = self.gpu
+        return env
+
+    def apply_to(self, pid: int) -> None:
+        # Applied right after the spawn: preexec_fn isn't safe with the GUI's and server's threads,
+        # and the child has barely started by the time this runs.
+        if not self.cores and not self.budget.nice:
+            return
+        if sys.platform != "win32":
+            try:
+                if self.cores and hasattr(os, "sched_setaffinity"):
+                    os.sched_setaffinity(pid, self.cores)
+                if self.budget.nice:
+                    os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, pid) + self.budget.nice)
+            except OSError:
+                pass
+            return
+        try:
+            import psutil
+        except Exception:  # pragma: no cover
+            return
+        try:
+            proc = psutil.Process(pid)
+            if self.cores:
+                proc.cpu_affinity(self.cores)
+            if self.budget.nice:
+                proc.nice(psutil.IDLE_PRIORITY_CLASS if self.budget.nice >= 10 else psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        except (psutil.Error, OSError):
+            pass
+
+
+class ResourceGovernor:
+    # Process-wide admission for subprocess stages. A launch waits until its GPU lease, cores
+    # and RAM reservation all fit, so concurrent jobs queue instead of thrashing. Admission is
+    # first-fit: a render queued for the GPU never blocks a compose that fits on the CPU.
+    def __init__(
+        self,
+        gpus: list[str] | None = None,
+        ram_budget_gb: float | None = None,
+        cpus: list[int] | None = None,
+        budgets: dict[str, StageBudget] | None = None,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.gpus = list(gpus if gpus is not None else ["0"])
+        self.ram_budget_gb = ram_budget_gb
+        self.cpus = list(cpus if cpus is not None else _usable_cpus())
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+        self._cond = threading.Condition()
+        self._free_gpus = list(self.gpus)
+        self._free_cpus = list(self.cpus)
+        self._ram_used = 0.0
+        self._waiting = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ResourceGovernor":
+        cfg = config.get("governor", {})
+        budgets = {}
+        for stage, values in cfg.get("stages", {}).items():
+            budgets[stage] = replace(DEFAULT_BUDGETS.get(stage, StageBudget()), **values)
+        ram_budget = cfg.get("ram_budget_gb")
+        if ram_budget is None:
+            ram_budget = _default_ram_budget_gb()
+        return cls(
+            # Device ids as CUDA sees them; defaults to whatever the launcher already made visible
+            gpus=[str(g) for g in cfg.get("gpus") or os.environ.get("CUDA_VISIBLE_DEVICES", "0").split(",") if str(g)],
+            ram_budget_gb=float(ram_budget) if ram_budget else None,
+            budgets=budgets,
+            enabled=bool(cfg.get("enabled", True)),
+        )
+
+    def budget(self, stage: str) -> StageBudget:
+        budget = self.budgets.get(stage, StageBudget())
+        # A request larger than the machine runs alone rather than waiting forever
+        if budget.cores is not None:
+            budget = replace(budget, cores=max(1, min(budget.cores, len(self.cpus))))
+        if self.ram_budget_gb is not None and budget.ram_gb > self.ram_budget_gb:
+            budget = replace(budget, ram_gb=self.ram_budget_gb)
+        if budget.gpu and not self.gpus:
+            budget = replace(budget, gpu=False)
+        return budget
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "gpus_free": list(self._free_gpus),
+                "cpus_free": len(self._free_cpus),
+                "ram_used_gb": round(self._ram_used, 2),
+                "ram_budget_gb": self.ram_budget_gb,
+                "waiting": self._waiting,
+            }
+
+    @contextmanager
+    def lease(self, stage: str) -> Iterator[Lease]:
+        budget = self.budget(stage)
+        if not self.enabled or budget == StageBudget():
+            yield Lease(stage, budget if self.enabled else StageBudget())
+            return
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._fits(budget):
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            lease = Lease(stage, budget)
+            if budget.gpu:
+                lease.gpu = self._free_gpus.pop(0)
+            if budget.cores is not None:
+                lease.cores = self._free_cpus[: budget.cores]
+                del self._free_cpus[: budget.cores]
+            self._ram_used += budget.ram_gb
+        try:
+            yield lease
+        finally:
+            with self._cond:
+                if lease.gpu is not None:
+                    self._free_gpus.append(lease.gpu)
+                self._free_cpus.extend(lease.cores)
+                self._ram_used -= budget.ram_gb
+                self._cond.notify_all()
+
+    def run(self, stage: str, cmd: list[str], check: bool = False, **kwargs) -> subprocess.CompletedProcess:
+        # Drop-in for subprocess.run(cmd, check=..., capture_output=..., text=..., cwd=..., env=..., timeout=...)
+        timeout = kwargs.pop("timeout", None)
+        if kwargs.pop("capture_output", False):
+            kwargs["stdout"] = subprocess.PIPE
+            kwargs["stderr"] = subprocess.PIPE
+        with self.lease(stage) as lease:
+            proc = self._spawn(lease, cmd, kwargs)
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except BaseException:
+                proc.kill()
+                proc.wait()
+                raise
+        if check and proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    def _spawn(self, lease: Lease, cmd: list[str], kwargs: dict) -> subprocess.Popen:
+        kwargs["env"] = lease.env(kwargs.get("env"))
+        proc = subprocess.Popen(cmd, **kwargs)
+        lease.apply_to(proc.pid)
+        return proc
+
+    def _fits(self, budget: StageBudget) -> bool:
+        if budget.gpu and not self._free_gpus:
+            return False
+        if budget.cores is not None and len(self._free_cpus) < budget.cores:
+            return False
+        if self.ram_budget_gb is not None and self._ram_used + budget.ram_gb > self.ram_budget_gb + 1e-9:
+            return False
+        return True
+
+
+def configure_governor(config: dict) -> ResourceGovernor:
+    # First caller wins; later pipelines in the same process share the one governor
+    global _GOVERNOR
+    with _GOVERNOR_LOCK:
+        if _GOVERNOR is None:
+            _GOVERNOR = ResourceGovernor.from_config(config)
+        return _GOVERNOR
+
+
+def governor() -> ResourceGovernor:
+    global _GOVERNOR
+    with _GOVERNOR_LOCK:
+        if _GOVERNOR is None:
+            _GOVERNOR = ResourceGovernor()
+        return _GOVERNOR
+
+
+def _usable_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _default_ram_budget_gb() -> float | None:
+    # Leave a fifth of physical memory to the OS, the GUI and TTS
+    try:
+        import psutil
+    except Exception:  # pragma: no cover
+        return None
+    return psutil.virtual_memory().total / 1024**3 * 0.8
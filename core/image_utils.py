@@ -1,5 +1,6 @@
 ﻿from __future__ import annotations
 
+import json
 from pathlib import Path
 from typing import Tuple
 
@@ -11,6 +12,10 @@ try:
 except Exception:  # pragma: no cover
     cv2 = None
 
+# Normalized (x, y, w, h) face box when detection is unavailable or finds nothing: the crops
+# are head-and-shoulders framings, which puts the face in the upper middle
+DEFAULT_FACE_BOX = (0.3, 0.15, 0.4, 0.5)
+
 
 def load_image(path: str | Path) -> Image.Image:
     img = Image.open(path).convert("RGB")
@@ -18,43 +23,62 @@ def load_image(path: str | Path) -> Image.Image:
 
 
 def auto_crop_square(img: Image.Image, focus_y: float | None = None) -> Image.Image:
+    return auto_crop(img, 1.0, focus_y=focus_y)
+
+
+def auto_crop(img: Image.Image, aspect: float, focus_y: float | None = None) -> Image.Image:
+    # Largest centred crop of the given width/height ratio; focus_y moves it vertically
     width, height = img.size
-    size = min(width, height)
-    left = (width - size) // 2
+    crop_w, crop_h = min(width, int(round(height * aspect))), min(height, int(round(width / aspect)))
+    left = (width - crop_w) // 2
     if focus_y is None:
-        upper = (height - size) // 2
+        upper = (height - crop_h) // 2
     else:
         desired_center = int(height * max(0.0, min(1.0, focus_y)))
-        upper = desired_center - size // 2
-        upper = max(0, min(upper, height - size))
-    return img.crop((left, upper, left + size, upper + size))
+        upper = desired_center - crop_h // 2
+        upper = max(0, min(upper, height - crop_h))
+    return img.crop((left, upper, left + crop_w, upper + crop_h))
 
 
-def face_center_crop(img: Image.Image, focus_y: float | None = None) -> Image.Image:
-    if focus_y is not None:
-        return auto_crop_square(img, focus_y=focus_y)
+def detect_face(img: Image.Image) -> Tuple[int, int, int, int] | None:
+    # Largest frontal face as (x, y, w, h) in pixels
     if cv2 is None:
-        return auto_crop_square(img)
+        return None
+    from .governor import governor
 
     gray = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2GRAY)
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-    faces = face_cascade.detectMultiScale(gray, 1.1, 5)
+    with governor().lease("face"):
+        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        faces = face_cascade.detectMultiScale(gray, 1.1, 5)
     if len(faces) == 0:
-        return auto_crop_square(img)
+        return None
+    return tuple(int(v) for v in sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[0])
+
+
+def face_center_crop(img: Image.Image, focus_y: float | None = None, aspect: float = 1.0) -> Image.Image:
+    if focus_y is not None:
+        return auto_crop(img, aspect, focus_y=focus_y)
+    face = detect_face(img)
+    if face is None:
+        return auto_crop(img, aspect)
 
-    x, y, w, h = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[0]
+    x, y, w, h = face
     cx = x + w // 2
     cy = y + h // 2
+    # Twice the face in the shorter direction, stretched to the aspect in the other
     size = max(w, h) * 2
+    crop_w, crop_h = (int(size * aspect), size) if aspect >= 1 else (size, int(size / aspect))
+    scale = min(1.0, img.size[0] / crop_w, img.size[1] / crop_h)
+    crop_w, crop_h = int(crop_w * scale), int(crop_h * scale)
 
-    left = max(cx - size // 2, 0)
-    upper = max(cy - size // 2, 0)
-    right = min(left + size, img.size[0])
-    lower = min(upper + size, img.size[1])
+    left = max(cx - crop_w // 2, 0)
+    upper = max(cy - crop_h // 2, 0)
+    right = min(left + crop_w, img.size[0])
+    lower = min(upper + crop_h, img.size[1])
 
     # Re-center if we hit an edge
-    left = max(right - size, 0)
-    upper = max(lower - size, 0)
+    left = max(right - crop_w, 0)
+    upper = max(lower - crop_h, 0)
 
     return img.crop((left, upper, right, lower))
 
@@ -62,13 +86,33 @@ def face_center_crop(img: Image.Image, focus_y: float | None = None) -> Image.Im
 def prepare_avatar_image(
     path: str | Path,
     out_path: str | Path,
-    size: int = 512,
+    size: int | Tuple[int, int] = 512,
     focus_y: float | None = None,
 ) -> Path:
+    # size is the render size: a square side, or (width, height) matching the preset's avatar box
+    width, height = (size, size) if isinstance(size, int) else size
     img = load_image(path)
-    img = face_center_crop(img, focus_y=focus_y)
-    img = img.resize((size, size), Image.LANCZOS)
+    img = face_center_crop(img, focus_y=focus_y, aspect=width / height)
+    img = img.resize((width, height), Image.LANCZOS)
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     img.save(out_path)
+
+    # The face box in the prepared image drives face-ROI rate control at compose time
+    face = detect_face(img)
+    box = [round(v / d, 4) for v, d in zip(face, (width, height, width, height))] if face else list(DEFAULT_FACE_BOX)
+    face_box_path(out_path).write_text(json.dumps({"box": box, "detected": face is not None}), encoding="utf-8")
     return out_path
+
+
+def face_box_path(image_path: str | Path) -> Path:
+    image_path = Path(image_path)
+    return image_path.with_name(image_path.stem + ".face.json")
+
+
+def load_face_box(image_path: str | Path) -> Tuple[float, float, float, float]:
+    # Normalized (x, y, w, h); images prepared elsewhere (dummy renders) get the default framing
+    path = face_box_path(image_path)
+    if not path.exists():
+        return DEFAULT_FACE_BOX
+    return tuple(json.loads(path.read_text(encoding="utf-8"))["box"])
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict
+
+from .artifacts import file_digest
+
+# A job is "running" from its first save until the pipeline returns or raises; output GC
+# touches jobs in a terminal state, and running ones whose owner process is gone (see
+# workspace.collect_garbage).
+TERMINAL_STATUSES = ("done", "failed")
+
+
+def hash_inputs(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, Path):
+            part = file_digest(part) if part.is_file() else str(part)
+        h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class JobManifest:
+    # One JSON file per job, rewritten atomically after every stage transition. Stages of the
+    # graph run on worker threads, so transitions and saves are serialized.
+    def __init__(
+        self,
+        path: str | Path,
+        job_id: str,
+        inputs: dict,
+        stages: dict | None = None,
+        status: str = "running",
+        owner: dict | None = None,
+    ):
+        self.path = Path(path)
+        self.job_id = job_id
+        self.inputs = inputs
+        self.stages: Dict[str, dict] = stages or {}
+        self.status = status
+        # {"host", "pid"} of the process running the job, so GC can tell a crashed job from a live one
+        self.owner = owner
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str | Path) -> "JobManifest":
+        path = Path(path)
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            path,
+            data["job_id"],
+            data.get("inputs", {}),
+            data.get("stages", {}),
+            data.get("status", ""),
+            data.get("owner"),
+        )
+
+    def save(self) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            payload = {
+                "job_id": self.job_id,
+                "status": self.status,
+                "owner": self.owner,
+                "inputs": self.inputs,
+                "stages": self.stages,
+            }
+            tmp.write_text(json.dumps(payload, indent=2, default=str), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+    def is_complete(self, stage: str, inputs_hash: str) -> bool:
+        record = self.stages.get(stage)
+        if not record or record.get("state") != "done" or record.get("inputs_hash") != inputs_hash:
+            return False
+        for artifact in record.get("artifacts", {}).values():
+            path = Path(artifact["path"])
+            if not path.is_file() or path.stat().st_size != artifact["size"]:
+                return False
+        return True
+
+    def artifact(self, stage: str, name: str) -> Path | None:
+        record = self.stages.get(stage, {})
+        artifact = record.get("artifacts", {}).get(name)
+        return Path(artifact["path"]) if artifact else None
+
+    def start(self, stage: str, inputs_hash: str) -> None:
+        with self._lock:
+            self.stages[stage] = {"state": "running", "inputs_hash": inputs_hash, "artifacts": {}, "updated": _now()}
+            self.save()
+
+    def complete(self, stage: str, inputs_hash: str, artifacts: Dict[str, Path | None]) -> None:
+        record = {
+            "state": "done",
+            "inputs_hash": inputs_hash,
+            "artifacts": {
+                name: {"path": str(Path(p).resolve()), "size": Path(p).stat().st_size}
+                for name, p in artifacts.items()
+                if p is not None
+            },
+            "updated": _now(),
+        }
+        with self._lock:
+            self.stages[stage] = record
+            self.save()
+
+    def fail(self, stage: str, error: str) -> None:
+        with self._lock:
+            record = self.stages.setdefault(stage, {})
+            record.update({"state": "failed", "error": error, "updated": _now()})
+            self.save()
+
+    def set_status(self, status: str) -> None:
+        with self._lock:
+            self.status = status
+            if status == "running":
+                self.owner = {"host": socket.gethostname(), "pid": os.getpid()}
+            self.save()
+
+    def first_incomplete(self) -> str | None:
+        for stage, record in self.stages.items():
+            if record.get("state") != "done":
+                return stage
+        return None
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
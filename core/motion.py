@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import os
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from .artifacts import file_digest
+
+# OpenCV and MediaPipe are imported only when a reference video is analysed: run_echomimic
+# imports this module for write_pose_dir on every render, in every worker and server process.
+
+# Bumped whenever the cached landmark layout changes, so old cache entries are not reused
+MOTION_FORMAT = 2
+
+# FaceMesh indices of the 68-point (iBUG 300-W) layout that DWPose's face keypoints use:
+# jaw, brows, nose bridge and base, eyes, outer and inner lips, image-left to image-right.
+FACE68_FROM_MESH = (
+    162, 234, 93, 58, 172, 136, 149, 148, 152, 377, 378, 365, 397, 288, 323, 454, 389,
+    71, 63, 105, 66, 107, 336, 296, 334, 293, 301,
+    168, 197, 5, 4, 75, 97, 2, 326, 305,
+    33, 160, 158, 133, 153, 144, 362, 385, 387, 263, 373, 380,
+    61, 39, 37, 0, 267, 269, 291, 405, 314, 17, 84, 181,
+    78, 82, 13, 312, 308, 317, 14, 87,
+)
+
+
+def extract_motion(video_path: str | Path, cache_dir: str | Path) -> Path:
+    # Keyed by content hash, so a reference clip reused across jobs is decoded and analysed once.
+    video_path = Path(video_path)
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    out_path = cache_dir / f"{file_digest(video_path)}_v{MOTION_FORMAT}.npz"
+    if out_path.exists():
+        return out_path
+
+    landmarks, fps = _detect_landmarks(video_path)
+    normalized = _normalize_to_face_crop(landmarks)
+    tmp_path = out_path.with_name(out_path.stem + f".{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp_path, landmarks=normalized.astype(np.float16), fps=np.float32(fps))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def load_motion(motion_path: str | Path) -> tuple[np.ndarray, float]:
+    with np.load(str(motion_path)) as data:
+        return data["landmarks"].astype(np.float32), float(data["fps"])
+
+
+def slice_motion(
+    landmarks: np.ndarray,
+    source_fps: float,
+    start_seconds: float,
+    frame_count: int,
+    fps: int,
+    total_seconds: float,
+    mode: str = "loop",
+) -> np.ndarray:
+    n = len(landmarks)
+    t = start_seconds + np.arange(frame_count) / float(fps)
+    if mode == "stretch" and total_seconds > 0:
+        idx = np.floor(t / total_seconds * n).astype(np.int64)
+        idx = np.clip(idx, 0, n - 1)
+    else:
+        idx = np.round(t * source_fps).astype(np.int64) % n
+    return landmarks[idx]
+
+
+def write_pose_dir(pose_frames: np.ndarray, out_dir: str | Path, width: int, height: int) -> Path:
+    # infer_audio2vid_pose.py reads {i}.npy with np.load(allow_pickle=True).tolist() and draws
+    # each DWPose dict onto a canvas given by draw_pose_params = [h, w, row0, row1, col0, col1].
+    # Here the canvas is the whole render frame and keypoints are fractions of it, as DWPose
+    # emits them.
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Poses live in a face-centred square; a non-square render crop extends that square along
+    # its longer side (image_utils.face_center_crop), so the square sits centred in the frame
+    side = min(width, height)
+    offset = np.array([(width - side) / 2, (height - side) / 2], dtype=np.float32)
+    frame_size = np.array([width, height], dtype=np.float32)
+    for i, frame in enumerate(pose_frames):
+        face = (frame.astype(np.float32) * side + offset) / frame_size
+        np.save(out_dir / f"{i}.npy", _dwpose_dict(face, width, height), allow_pickle=True)
+    return out_dir
+
+
+def _dwpose_dict(face: np.ndarray, width: int, height: int) -> dict:
+    # Only the head is known from a face track: the face keypoints, plus the nose, eye and ear
+    # body keypoints derived from them. Everything else is marked missing (subset -1, zero
+    # coordinates), which DWPose's drawing code skips.
+    body = np.zeros((18, 2), dtype=np.float32)
+    subset = np.full((1, 18), -1.0, dtype=np.float32)
+    head = {0: face[30], 14: face[36:42].mean(axis=0), 15: face[42:48].mean(axis=0), 16: face[0], 17: face[16]}
+    for index, point in head.items():
+        body[index] = point
+        subset[0, index] = index
+    return {
+        "bodies": {"candidate": body, "subset": subset, "score": (subset >= 0).astype(np.float32)},
+        "hands": np.zeros((2, 21, 2), dtype=np.float32),
+        "hands_score": np.zeros((2, 21), dtype=np.float32),
+        "faces": face[None].astype(np.float32),
+        "faces_score": np.ones((1, len(face)), dtype=np.float32),
+        "draw_pose_params": [height, width, 0, height, 0, width],
+    }
+
+
+def _detect_landmarks(video_path: Path) -> tuple[np.ndarray, float]:
+    try:
+        import cv2
+    except Exception as exc:  # pragma: no cover
+        raise RuntimeError("OpenCV is required for motion cloning. Install with: pip install opencv-python") from exc
+    try:
+        import mediapipe as mp
+    except Exception as exc:  # pragma: no cover
+        # A face box (e.g. OpenCV's Haar cascade) carries no pose; the renderer needs landmarks
+        raise RuntimeError("MediaPipe is required for motion cloning. Install with: pip install mediapipe") from exc
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise FileNotFoundError(f"Could not open reference video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+
+    detector = mp.solutions.face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1)
+    detect = partial(_mediapipe_points, detector)
+
+    frames = []
+    last = None
+    try:
+        while True:
+            ok, bgr = cap.read()
+            if not ok:
+                break
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            points = detect(rgb)
+            if points is None:
+                points = last
+            if points is not None:
+                last = points
+            frames.append(points)
+    finally:
+        cap.release()
+
+    if last is None:
+        raise ValueError(f"No face found in reference video: {video_path}")
+    # Frames before the first detection reuse the first detected pose
+    first = next(p for p in frames if p is not None)
+    frames = [first if p is None else p for p in frames]
+    return np.stack(frames).astype(np.float32), float(fps)
+
+
+def _mediapipe_points(detector, rgb: np.ndarray) -> np.ndarray | None:
+    result = detector.process(rgb)
+    if not result.multi_face_landmarks:
+        return None
+    h, w = rgb.shape[:2]
+    lm = result.multi_face_landmarks[0].landmark
+    return np.array([[lm[i].x * w, lm[i].y * h] for i in FACE68_FROM_MESH], dtype=np.float32)
+
+
+def _normalize_to_face_crop(landmarks: np.ndarray) -> np.ndarray:
+    # Express points in the same face-centred square that image_utils.face_center_crop uses
+    # for the avatar, so the motion lines up with the prepared image.
+    mins = landmarks.min(axis=1)
+    maxs = landmarks.max(axis=1)
+    centre = np.median((mins + maxs) / 2, axis=0)
+    size = float(np.median((maxs - mins).max(axis=1))) * 2
+    origin = centre - size / 2
+    return (landmarks - origin) / max(size, 1e-6)
+
+
+def write_motion_slice(
+    motion_path: str | Path,
+    out_path: str | Path,
+    start_seconds: float,
+    duration_seconds: float,
+    fps: int,
+    total_seconds: float,
+    mode: str = "loop",
+) -> Path:
+    landmarks, source_fps = load_motion(motion_path)
+    frame_count = max(1, int(round(duration_seconds * fps)))
+    poses = slice_motion(landmarks, source_fps, start_seconds, frame_count, fps, total_seconds, mode)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(out_path, poses.astype(np.float16))
+    return out_path
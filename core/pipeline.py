@@ -1,23 +1,30 @@
 ﻿from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import asdict, dataclass, fields
+from functools import partial
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict
 
 import os
-import subprocess
+import shutil
 
-import soundfile as sf
-
-from .audio_utils import split_audio
 from .config import load_config
-from .compositing import compose_video
-from .dummy_renderer import generate_dummy_audio, generate_dummy_image, generate_dummy_video
-from .echomimic import run_echomimic
-from .image_utils import prepare_avatar_image
-from .presets import get_preset, render_background, resolve_preset_key
-from .speech_overlay import build_karaoke_ass
-from .tts import generate_tts
+from .governor import configure_governor, governor
+from .manifest import JobManifest, hash_inputs
+from .progress import JobProgress, ProgressCallback
+from .preflight import PreflightError, PreflightReport, run_preflight
+from .presets import get_preset, render_background, render_size, resolve_preset_key
+from .stage_graph import GraphExecutor, StageGraph
+from .workspace import JobWorkspace, collect_garbage_from_config, new_job_id, workspace_from_config
+
+if TYPE_CHECKING:
+    from .farm import FarmCoordinator
+    from .presets import Preset
+    from .progressive import HlsPublisher
+    from .silence import RenderPlan
+    from .slides import Slide
+    from .tts import TtsResult
+    from .tts_cache import PhraseCache
 
 
 @dataclass
@@ -28,6 +35,10 @@ class PipelineInputs:
     reference_video: Path | None = None
     preset_name: str | None = None
     background_image: Path | None = None
+    slides: Path | None = None
+    # Dialogue mode: a second presenter, with lines tagged "Name: ..." in the script
+    second_avatar_image: Path | None = None
+    second_voice_sample: Path | None = None
 
 
 @dataclass
@@ -39,87 +50,756 @@ class PipelineOutputs:
     composed_video_path: Path | None = None
 
 
+@dataclass
+class _RenderJob:
+    # One job's state as its stages fill it in; the stage builders below share it
+    inputs: PipelineInputs
+    workspace: JobWorkspace
+    manifest: JobManifest
+    progress: JobProgress
+    preset: Preset | None
+    prepared_image: Path
+    audio_path: Path
+    raw_video_path: Path | None
+    final_video_path: Path
+    composed_path: Path | None = None
+    # Lossless mode: EchoMimic streams frames into FFV1/NUT and the only lossy encode is the final one
+    lossless: bool = False
+    # Video-only intermediates get the TTS track muxed in at compose/encode time
+    separate_audio: bool = False
+    # Progressive mode composes and publishes each chunk as it renders; the final MP4 is a remux
+    progressive: bool = False
+    published: bool = False
+    # Dialogue mode: the second presenter's full-timeline clip
+    second_video_path: Path | None = None
+    silence_enabled: bool = False
+    # EchoMimic renders at fps; output_fps differs when interpolation fills in the rest
+    fps: int = 24
+    output_fps: int = 24
+    interpolate_method: str = "blend"
+    avatar_size: tuple[int, int] | None = None
+    total_seconds: float = 0.0
+    motion_path: Path | None = None
+    motion_mode: str = "loop"
+
+    @property
+    def motion_key(self) -> tuple[str, str] | None:
+        return (self.motion_path.stem, self.motion_mode) if self.motion_path else None
+
+
+@dataclass(frozen=True)
+class _Clip:
+    # One separately rendered chunk or voiced span; offset is its start frame on the full track
+    idx: int
+    audio: Path
+    video: Path
+    offset: int
+    inputs_hash: str
+    frames: int
+
+    @property
+    def name(self) -> str:
+        return f"render_{self.idx:03d}"
+
+
 class AvatarPipeline:
     def __init__(self, config_path: str | Path = "config.json"):
         self.config = load_config(config_path)
+        configure_governor(self.config)
 
-    def run(self, inputs: PipelineInputs) -> PipelineOutputs:
+    def run(
+        self,
+        inputs: PipelineInputs,
+        progress: ProgressCallback | None = None,
+        job_id: str | None = None,
+    ) -> PipelineOutputs:
         output_dir = Path(self.config["output_dir"])
         output_dir.mkdir(parents=True, exist_ok=True)
+        self._require_preflight(inputs)
+
+        job_id = job_id or new_job_id()
+        workspace = workspace_from_config(self.config, job_id)
+        manifest = JobManifest(workspace.path("job.json"), job_id, _inputs_to_dict(inputs))
+        manifest.save()
+        collect_garbage_from_config(self.config, keep=[job_id])
+        return self._execute(inputs, workspace, manifest, JobProgress(job_id, progress))
+
+    def resume(self, job_id: str, progress: ProgressCallback | None = None) -> PipelineOutputs:
+        workspace = workspace_from_config(self.config, job_id)
+        manifest_path = workspace.path("job.json")
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No manifest for job {job_id}: {manifest_path}")
+        manifest = JobManifest.load(manifest_path)
+        inputs = _inputs_from_dict(manifest.inputs)
+        self._require_preflight(inputs)
+        return self._execute(inputs, workspace, manifest, JobProgress(job_id, progress))
+
+    def preflight(self, inputs: PipelineInputs | None = None) -> PreflightReport:
+        preset_key = _resolve_preset_key(inputs.preset_name if inputs else None, self.config.get("preset"))
+        return run_preflight(self.config, inputs, preset_key=preset_key)
+
+    def _require_preflight(self, inputs: PipelineInputs) -> None:
+        # Missing weights, encoders or disk fail here instead of minutes into a render
+        if not self.config.get("preflight", {}).get("enabled", True):
+            return
+        report = self.preflight(inputs)
+        if not report.ok:
+            raise PreflightError(report)
+
+    def speculative_avatar(self, avatar_image: Path, preset_name: str | None = None) -> Path:
+        # Crops the avatar into the shared cache ahead of a job (see core.prewarm); the avatar
+        # stage then copies it instead of running face detection again.
+        preset = get_preset(_resolve_preset_key(preset_name, self.config.get("preset")))
+        avatar_size = self._avatar_size(preset)
+        focus_y = preset.crop_focus_y if preset else None
+        cached = self._avatar_cache_path(avatar_image, avatar_size, focus_y)
+        if not cached.exists():
+            from .image_utils import face_box_path, prepare_avatar_image
 
-        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        prepared_image = output_dir / f"avatar_{stamp}.png"
-        audio_path = output_dir / f"audio_{stamp}.wav"
-        raw_video_path = output_dir / f"raw_{stamp}.mp4"
-        final_video_path = output_dir / f"generated_{stamp}.mp4"
+            tmp = cached.with_name(cached.stem + f".{os.getpid()}.tmp.png")
+            prepare_avatar_image(avatar_image, tmp, size=avatar_size, focus_y=focus_y)
+            # The face box first: the crop's presence is what marks the cache entry complete
+            os.replace(face_box_path(tmp), face_box_path(cached))
+            os.replace(tmp, cached)
+        return cached
 
+    def speculative_voice(self, voice_sample: Path) -> None:
+        # Loads the TTS model and precomputes the voice conditioning for the next job
+        from .tts import get_backend
+
+        tts_cfg = self.config.get("tts", {})
+        if not tts_cfg.get("enable", True):
+            return
+        backend = get_backend(tts_cfg)
+        backend.load()
+        backend.prepare_voice(voice_sample)
+
+    def avatar_cache_path(self, avatar_image: Path, preset_name: str | None = None) -> Path:
+        preset = get_preset(_resolve_preset_key(preset_name, self.config.get("preset")))
+        focus_y = preset.crop_focus_y if preset else None
+        return self._avatar_cache_path(avatar_image, self._avatar_size(preset), focus_y)
+
+    def _avatar_size(self, preset: Preset | None, square: bool = False) -> tuple[int, int]:
+        # EchoMimic renders at the prepared image's size, so this is also the render size
+        image_size = int(self.config.get("image_size", 512))
+        render_cfg = self.config.get("render_size", {})
+        if square or not render_cfg.get("preset_aware", True):
+            return image_size, image_size
+        return render_size(preset, int(render_cfg.get("pixel_budget") or image_size**2), square=image_size)
+
+    def _avatar_cache_path(self, avatar_image: Path, size: tuple[int, int], focus_y: float | None) -> Path:
+        key = hash_inputs(Path(avatar_image), size, focus_y)
+        return Path(self.config["output_dir"]) / "cache" / "avatars" / f"{key[:32]}.png"
+
+    def _prepare_avatar(self, source: Path, out_path: Path, size: tuple[int, int], focus_y: float | None) -> Path:
+        from .image_utils import face_box_path, prepare_avatar_image
+
+        cached = self._avatar_cache_path(source, size, focus_y)
+        if cached.exists() and face_box_path(cached).exists():
+            shutil.copyfile(cached, out_path)
+            shutil.copyfile(face_box_path(cached), face_box_path(out_path))
+            return out_path
+        return prepare_avatar_image(source, out_path, size=size, focus_y=focus_y)
+
+    def _execute(
+        self,
+        inputs: PipelineInputs,
+        workspace: JobWorkspace,
+        manifest: JobManifest,
+        progress: JobProgress,
+    ) -> PipelineOutputs:
+        # The job-level status tells output GC which workspaces are still in use
+        manifest.set_status("running")
+        try:
+            outputs = self._run_graph(inputs, workspace, manifest, progress)
+        except BaseException:
+            manifest.set_status("failed")
+            raise
+        manifest.set_status("done")
+        return outputs
+
+    def _run_graph(
+        self,
+        inputs: PipelineInputs,
+        workspace: JobWorkspace,
+        manifest: JobManifest,
+        progress: JobProgress,
+    ) -> PipelineOutputs:
+        # numpy, PIL, cv2, soundfile and pydub load on the first job rather than at import,
+        # which keeps the GUI's cold start short; each stage builder imports what it uses.
+        stamp = workspace.job_id
+        job = _RenderJob(
+            inputs=inputs,
+            workspace=workspace,
+            manifest=manifest,
+            progress=progress,
+            preset=get_preset(_resolve_preset_key(inputs.preset_name, self.config.get("preset"))),
+            prepared_image=workspace.path(f"avatar_{stamp}.png"),
+            audio_path=workspace.path(f"audio_{stamp}.wav"),
+            raw_video_path=workspace.path(f"raw_{stamp}.mp4"),
+            final_video_path=workspace.path(f"generated_{stamp}.mp4"),
+        )
+
+        # The job is a graph of stages: independent ones (avatar crop, TTS, background) run side
+        # by side and each stage starts once everything it needs is done. Composite stages
+        # (render, output) record their own sub-stages in the manifest.
+        graph = StageGraph()
         if os.environ.get("CODEXOFFLINEVIDEO_DUMMY", "0") == "1":
-            duration = min(30.0, max(3.0, len(inputs.script_text) / 15))
-            dummy_image = generate_dummy_image(prepared_image, size=self.config.get("image_size", 512))
-            dummy_audio = generate_dummy_audio(audio_path, duration_seconds=duration)
+            render_stage, overlays = self._dummy_stages(graph, job)
+        elif inputs.second_avatar_image is not None:
+            render_stage, overlays = self._dialogue_stages(graph, job)
+        else:
+            render_stage, overlays = self._render_stages(graph, job)
+        graph.add("output", partial(self._output, job), needs=(render_stage,) + overlays)
+
+        max_parallel = int(self.config.get("graph", {}).get("max_parallel", 3))
+        executor = GraphExecutor(
+            lambda name, inputs_hash, fn: self._stage(manifest, progress, name, inputs_hash, fn),
+            max_workers=max_parallel,
+        )
+        try:
+            executor.run(graph)
+        finally:
+            graph.save(workspace.path("graph.json"))
+
+        if not self.config.get("workspace", {}).get("keep_scratch", False):
+            workspace.cleanup_scratch()
+
+        return PipelineOutputs(
+            audio_path=job.audio_path,
+            image_path=job.prepared_image,
+            video_path=job.final_video_path,
+            raw_video_path=job.raw_video_path,
+            composed_video_path=job.composed_path,
+        )
+
+    def _dummy_stages(self, graph: StageGraph, job: _RenderJob) -> tuple[str, tuple[str, ...]]:
+        # Placeholder image, tone and clip in one stage, for pipeline tests without EchoMimic
+        from .dummy_renderer import generate_dummy_audio, generate_dummy_image, generate_dummy_video
+
+        duration = min(30.0, max(3.0, len(job.inputs.script_text) / 15))
+
+        def dummy_render(upstream):
+            dummy_image = generate_dummy_image(job.prepared_image, size=self._avatar_size(job.preset))
+            dummy_audio = generate_dummy_audio(job.audio_path, duration_seconds=duration)
             generate_dummy_video(
                 image_path=dummy_image,
                 audio_path=dummy_audio,
-                out_path=raw_video_path,
+                out_path=job.raw_video_path,
                 ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
             )
+            return {"image": job.prepared_image, "audio": job.audio_path, "video": job.raw_video_path}
+
+        graph.add("dummy_render", dummy_render, inputs=lambda up: (job.inputs.script_text, duration))
+        overlays = self._overlay_stages(graph, job.preset, job.inputs, job.audio_path, job.workspace, "dummy_render")
+        return "dummy_render", overlays
+
+    def _dialogue_stages(self, graph: StageGraph, job: _RenderJob) -> tuple[str, tuple[str, ...]]:
+        job.preset = _dialogue_preset(job.preset)
+        job.separate_audio = True
+
+        def render_dialogue(upstream):
+            job.raw_video_path, job.second_video_path = self._render_dialogue(
+                job.inputs, job.workspace, job.manifest, job.progress, job.preset, job.prepared_image, job.audio_path
+            )
+            return {"video": job.raw_video_path, "second_video": job.second_video_path}
+
+        graph.add("dialogue", render_dialogue)
+        spans_path = job.workspace.path(f"spans_{job.workspace.job_id}.json")
+        overlays = self._overlay_stages(
+            graph, job.preset, job.inputs, job.audio_path, job.workspace, "dialogue", spans_path
+        )
+        return "dialogue", overlays
+
+    def _render_stages(self, graph: StageGraph, job: _RenderJob) -> tuple[str, tuple[str, ...]]:
+        # Single presenter: avatar crop and TTS side by side, then the EchoMimic render
+        from .frame_pipe import LOSSLESS_SUFFIX
+        from .image_utils import face_box_path
+        from .tts import get_backend
+
+        inputs, preset = job.inputs, job.preset
+        job.lossless = self.config.get("composition", {}).get("intermediate", "mp4") == "lossless"
+        job.progressive = bool(self.config.get("progressive", {}).get("enabled", False))
+        # Pauses are only filled in after every voiced span renders, which progressive output can't wait for
+        job.silence_enabled = bool(self.config.get("silence", {}).get("enabled", False)) and not job.progressive
+
+        # Interpolation mode: diffuse at render_fps and synthesize the in-between frames on CPU
+        job.output_fps = preset.fps if preset else 24
+        interp_cfg = self.config.get("interpolation", {})
+        job.fps = job.output_fps
+        if interp_cfg.get("enabled", False):
+            job.fps = min(job.output_fps, int(interp_cfg.get("render_fps", 12)))
+        job.interpolate_method = interp_cfg.get("method", "blend")
+
+        # Silence-aware and interpolated renders are rewritten into a lossless intermediate
+        job.separate_audio = job.lossless or job.silence_enabled or job.fps != job.output_fps
+        if job.lossless or job.silence_enabled:
+            job.raw_video_path = job.raw_video_path.with_suffix(LOSSLESS_SUFFIX)
+
+        # Prepare image. Pose-driven renders stay square: the DWPose canvases EchoMimic's pose
+        # script draws are only known to line up with the latents for square frames.
+        job.avatar_size = self._avatar_size(preset, square=inputs.reference_video is not None)
+        focus_y = preset.crop_focus_y if preset else None
+
+        def prepare_image(upstream):
+            self._prepare_avatar(inputs.avatar_image, job.prepared_image, job.avatar_size, focus_y)
+            return {"image": job.prepared_image, "face": face_box_path(job.prepared_image)}
+
+        graph.add("avatar", prepare_image, inputs=lambda up: (inputs.avatar_image, job.avatar_size, focus_y))
+
+        tts_cfg = self.config.get("tts", {})
+
+        def synthesize(upstream):
+            self._synthesize(inputs.script_text, inputs.voice_sample, job.audio_path)
+            return {"audio": job.audio_path}
+
+        graph.add(
+            "tts",
+            synthesize,
+            inputs=lambda up: (
+                inputs.script_text,
+                inputs.voice_sample,
+                get_backend(tts_cfg).model_id,
+                get_backend(tts_cfg).synthesis_params,
+                tts_cfg.get("language", "en"),
+            ),
+        )
+        overlays = self._overlay_stages(graph, preset, inputs, job.audio_path, job.workspace, "tts")
+
+        # Progressive segments are composed as they render, so they need the overlays up front
+        graph.add("render", partial(self._render, job), needs=("avatar", "tts") + (overlays if job.progressive else ()))
+        return "render", overlays
+
+    def _render(self, job: _RenderJob, upstream: dict) -> Dict[str, Path]:
+        import soundfile as sf
+
+        from .motion import extract_motion
+
+        chunk_cfg = self.config.get("chunking", {})
+        chunk_enabled = chunk_cfg.get("enabled", False)
+        chunk_seconds = int(chunk_cfg.get("chunk_seconds", 360))
+        env_chunk_seconds = os.environ.get("CODEXOFFLINEVIDEO_CHUNK_SECONDS")
+        if env_chunk_seconds:
+            try:
+                chunk_seconds = int(env_chunk_seconds)
+            except ValueError:
+                pass
+
+        job.total_seconds = float(sf.info(str(job.audio_path)).duration)
+        job.motion_mode = self.config.get("motion", {}).get("mode", "loop")
+        if job.inputs.reference_video:
+            job.motion_path = extract_motion(
+                job.inputs.reference_video, Path(self.config["output_dir"]) / "cache" / "motion"
+            )
+
+        if job.silence_enabled or ((chunk_enabled or job.progressive) and chunk_seconds > 0):
+            self._render_clips(job, upstream, chunk_seconds if chunk_enabled else 0, chunk_seconds)
         else:
-            # Prepare image
-            preset_key = _resolve_preset_key(inputs.preset_name, self.config.get("preset"))
-            preset = get_preset(preset_key)
-            prepare_avatar_image(
-                inputs.avatar_image,
-                prepared_image,
-                size=self.config.get("image_size", 512),
-                focus_y=preset.crop_focus_y if preset else None,
+            self._render_whole(job)
+
+        if job.fps != job.output_fps and not job.published:
+            self._interpolate(job)
+        return {"video": job.final_video_path if job.published else job.raw_video_path}
+
+    def _pose_frames(self, job: _RenderJob, name: str, clip_audio: Path, start_seconds: float) -> Path | None:
+        # Time-aligned slice of the cached reference motion for one clip
+        import soundfile as sf
+
+        from .motion import write_motion_slice
+
+        if job.motion_path is None:
+            return None
+        return write_motion_slice(
+            job.motion_path,
+            job.workspace.scratch_path(f"pose_{name}.npy"),
+            start_seconds=start_seconds,
+            duration_seconds=float(sf.info(str(clip_audio)).duration),
+            fps=job.fps,
+            total_seconds=job.total_seconds,
+            mode=job.motion_mode,
+        )
+
+    def _render_whole(self, job: _RenderJob) -> None:
+        from .echomimic import run_echomimic
+
+        def render_full():
+            pose_frames = self._pose_frames(job, "full", job.audio_path, 0.0)
+
+            def render(seed):
+                run_echomimic(
+                    echomimic_dir=self.config["echo_mimic_dir"],
+                    weights_dir=self.config["echo_mimic_weights"],
+                    image_path=job.prepared_image,
+                    audio_path=job.audio_path,
+                    out_path=job.raw_video_path,
+                    pose_frames=pose_frames,
+                    fps=job.fps,
+                    scratch_dir=job.workspace.scratch,
+                    lossless=job.lossless,
+                    ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
+                    seed=seed,
+                )
+
+            self._gated_render(
+                "render", render, job.raw_video_path, job.audio_path, job.fps, not job.lossless, job.progress
             )
+            return {"video": job.raw_video_path}
+
+        frames = int(job.total_seconds * job.fps)
+        job.progress.add_frames(frames)
+        self._stage(
+            job.manifest,
+            job.progress,
+            "render",
+            hash_inputs(job.prepared_image, job.audio_path, job.fps, job.motion_key, job.lossless),
+            render_full,
+            frames=frames,
+        )
 
-            # TTS
-            tts_cfg = self.config.get("tts", {})
-            if tts_cfg.get("enable", True):
-                generate_tts(
-                    text=inputs.script_text,
-                    speaker_wav=inputs.voice_sample,
-                    out_wav=audio_path,
-                    model_name=tts_cfg.get("model_name"),
-                    language=tts_cfg.get("language", "en"),
+    def _render_clips(self, job: _RenderJob, upstream: dict, max_clip_seconds: int, chunk_seconds: int) -> None:
+        # Each clip is rendered separately: fixed-length chunks, or with silence detection only
+        # the voiced spans (split at max_clip_seconds when chunking is on). Clips render on the
+        # farm or locally, then are published, concatenated or assembled with the idle loop.
+        import soundfile as sf
+
+        from .audio_features import compute_audio_features
+        from .frame_pipe import LOSSLESS_SUFFIX
+        from .progressive import HlsPublisher
+
+        stamp = job.workspace.job_id
+        chunk_cfg = self.config.get("chunking", {})
+        plan, chunk_audios, chunk_offsets = self._plan_clips(job, max_clip_seconds, chunk_seconds)
+
+        audio_features = None
+        if len(chunk_audios) > 1 and chunk_cfg.get("precompute_audio_features", True):
+
+            def extract_features():
+                features = compute_audio_features(
+                    echomimic_dir=self.config["echo_mimic_dir"],
+                    weights_dir=self.config["echo_mimic_weights"],
+                    audio_path=job.audio_path,
+                    out_path=job.workspace.path(f"features_{stamp}.npy"),
+                    fps=job.fps,
                 )
+                return {"features": features}
+
+            audio_features = self._stage(
+                job.manifest, job.progress, "features", hash_inputs(job.audio_path, job.fps), extract_features
+            )["features"]
+
+        chunk_suffix = LOSSLESS_SUFFIX if job.lossless else ".mp4"
+        clips = [
+            _Clip(
+                idx=idx,
+                audio=chunk_audio,
+                video=job.workspace.path(f"chunk_{stamp}_{idx:03d}{chunk_suffix}"),
+                offset=offset,
+                inputs_hash=hash_inputs(job.prepared_image, chunk_audio, job.fps, job.motion_key, offset, job.lossless),
+                frames=int(sf.info(str(chunk_audio)).duration * job.fps),
+            )
+            for idx, (chunk_audio, offset) in enumerate(zip(chunk_audios, chunk_offsets), start=1)
+        ]
+        job.progress.add_frames(sum(clip.frames for clip in clips))
+        todo = []
+        for clip in clips:
+            if job.manifest.is_complete(clip.name, clip.inputs_hash):
+                job.progress.stage(clip.name, "skipped", frames=clip.frames)
             else:
-                raise RuntimeError("TTS is disabled in config.json")
+                todo.append(clip)
 
-            chunk_cfg = self.config.get("chunking", {})
-            chunk_enabled = chunk_cfg.get("enabled", False)
-            chunk_seconds = int(chunk_cfg.get("chunk_seconds", 360))
-            env_chunk_seconds = os.environ.get("CODEXOFFLINEVIDEO_CHUNK_SECONDS")
-            if env_chunk_seconds:
-                try:
-                    chunk_seconds = int(env_chunk_seconds)
-                except ValueError:
-                    pass
-
-            if chunk_enabled and chunk_seconds > 0:
-                chunk_dir = output_dir / f"chunks_{stamp}"
-                chunk_audios = split_audio(audio_path, chunk_dir, chunk_seconds)
-                chunk_videos = []
-                for idx, chunk_audio in enumerate(chunk_audios, start=1):
-                    chunk_video = output_dir / f"chunk_{stamp}_{idx:03d}.mp4"
-                    run_echomimic(
-                        echomimic_dir=self.config["echo_mimic_dir"],
-                        weights_dir=self.config["echo_mimic_weights"],
-                        image_path=prepared_image,
-                        audio_path=chunk_audio,
-                        out_path=chunk_video,
-                        ref_video=inputs.reference_video,
+        hls = None
+        publish = None
+        if job.progressive:
+            hls = HlsPublisher(job.workspace.path("hls"), len(clips))
+            overlays = (None, None, [])
+            if job.preset:
+                overlays = (
+                    upstream["background"]["background"],
+                    upstream.get("captions", {}).get("captions"),
+                    self._slide_track(job.preset, job.inputs),
+                )
+            publish = partial(self._publish_segment, job, hls, overlays)
+            for clip in clips:
+                if clip not in todo:
+                    publish(clip)
+
+        coordinator = self._farm_coordinator(Path(self.config["output_dir"])) if todo else None
+        if coordinator is not None:
+            self._render_clips_on_farm(job, coordinator, todo, audio_features, publish)
+        else:
+            for clip in todo:
+                self._render_clip(job, clip, audio_features)
+                if publish is not None:
+                    publish(clip)
+
+        self._join_clips(job, clips, plan, hls)
+
+    def _plan_clips(
+        self, job: _RenderJob, max_clip_seconds: int, chunk_seconds: int
+    ) -> tuple[RenderPlan | None, list[Path], list[int]]:
+        # The clip audio files and their start frames on the full track; with silence detection
+        # also the plan that puts the voiced clips and the idle loop back together
+        from .audio_utils import split_audio
+        from .silence import RenderPlan, plan_segments, voiced_mask, write_segment_audio
+
+        chunk_dir = job.workspace.scratch_path("chunks")
+        fps = job.fps
+        if not job.silence_enabled:
+
+            def split():
+                chunks = split_audio(job.audio_path, chunk_dir, chunk_seconds)
+                return {f"chunk_{idx:03d}": p for idx, p in enumerate(chunks, start=1)}
+
+            split_hash = hash_inputs(job.audio_path, chunk_seconds)
+            chunk_audios = list(self._stage(job.manifest, job.progress, "split", split_hash, split).values())
+            return None, chunk_audios, [idx * chunk_seconds * fps for idx in range(len(chunk_audios))]
+
+        silence_cfg = self.config.get("silence", {})
+        blend_frames = int(round(float(silence_cfg.get("blend_seconds", 0.25)) * fps))
+        max_voiced = max_clip_seconds * fps if max_clip_seconds > 0 else None
+
+        def detect_silence():
+            mask = voiced_mask(
+                job.audio_path,
+                fps,
+                threshold_db=float(silence_cfg.get("threshold_db", -40.0)),
+                min_silence_seconds=float(silence_cfg.get("min_silence_seconds", 0.6)),
+                pad_seconds=float(silence_cfg.get("pad_seconds", 0.1)),
+            )
+            detected = plan_segments(mask, fps, blend_frames, max_voiced)
+            artifacts = {"plan": detected.save(job.workspace.path(f"plan_{job.workspace.job_id}.json"))}
+            for idx, segment in enumerate(detected.voiced, start=1):
+                artifacts[f"chunk_{idx:03d}"] = write_segment_audio(
+                    job.audio_path, segment, fps, chunk_dir / f"voiced_{idx:03d}.wav"
+                )
+            return artifacts
+
+        silence_hash = hash_inputs(job.audio_path, fps, silence_cfg, max_voiced)
+        detected = self._stage(job.manifest, job.progress, "silence", silence_hash, detect_silence)
+        plan = RenderPlan.load(detected.pop("plan"))
+        return plan, [detected[key] for key in sorted(detected)], [segment.start for segment in plan.voiced]
+
+    def _render_clip(self, job: _RenderJob, clip: _Clip, audio_features: Path | None) -> None:
+        from .echomimic import run_echomimic
+
+        def render_chunk():
+            pose_frames = self._pose_frames(job, f"{clip.idx:03d}", clip.audio, clip.offset / job.fps)
+
+            def render(seed):
+                run_echomimic(
+                    echomimic_dir=self.config["echo_mimic_dir"],
+                    weights_dir=self.config["echo_mimic_weights"],
+                    image_path=job.prepared_image,
+                    audio_path=clip.audio,
+                    out_path=clip.video,
+                    pose_frames=pose_frames,
+                    fps=job.fps,
+                    audio_features=audio_features,
+                    feature_offset=clip.offset,
+                    scratch_dir=job.workspace.scratch,
+                    lossless=job.lossless,
+                    ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
+                    seed=seed,
+                )
+
+            self._gated_render(clip.name, render, clip.video, clip.audio, job.fps, not job.lossless, job.progress)
+            return {"video": clip.video}
+
+        self._stage(job.manifest, job.progress, clip.name, clip.inputs_hash, render_chunk, frames=clip.frames)
+
+    def _render_clips_on_farm(
+        self,
+        job: _RenderJob,
+        coordinator: FarmCoordinator,
+        todo: list[_Clip],
+        audio_features: Path | None,
+        publish: Callable[[_Clip], None] | None,
+    ) -> None:
+        from .farm import FarmTask
+        from .quality import retry_seed
+
+        tasks = []
+        for clip in todo:
+            task_inputs = {"image": job.prepared_image, "audio": clip.audio}
+            if audio_features:
+                task_inputs["audio_features"] = audio_features
+            pose_frames = self._pose_frames(job, f"{clip.idx:03d}", clip.audio, clip.offset / job.fps)
+            if pose_frames:
+                task_inputs["pose_frames"] = pose_frames
+            tasks.append(
+                FarmTask(
+                    kind="render_chunk",
+                    inputs=task_inputs,
+                    outputs={"video": clip.video},
+                    params={"fps": job.fps, "feature_offset": clip.offset, "lossless": job.lossless},
+                )
+            )
+        for clip in todo:
+            job.progress.stage(clip.name, "started")
+        gate_cfg = self.config.get("quality_gate", {})
+        retries = int(gate_cfg.get("max_retries", 2))
+        pending = dict(zip(todo, tasks))
+        failed = {}
+
+        def finish_task(task: FarmTask, final: bool = False) -> None:
+            # Runs as each task lands, so progressive jobs publish while the farm renders.
+            # On the last attempt a failing chunk is kept (see _gate_exhausted).
+            clip = next(c for c, t in pending.items() if t is task)
+            check = self._check_render(clip.video, clip.audio, job.fps, not job.lossless)
+            if check is not None and not check.ok:
+                failed[clip] = check
+                if not final or gate_cfg.get("on_fail", "keep") == "error":
+                    return
+            job.manifest.complete(clip.name, clip.inputs_hash, {"video": clip.video})
+            job.progress.stage(clip.name, "done", frames=clip.frames)
+            if publish is not None:
+                publish(clip)
+
+        try:
+            for attempt in range(retries + 1):
+                failed.clear()
+                coordinator.run(list(pending.values()), on_done=partial(finish_task, final=attempt == retries))
+                # Chunks that fail the quality gate go back to the farm with a new seed
+                if not failed:
+                    break
+                if attempt == retries:
+                    self._gate_exhausted(gate_cfg, {clip.name: check for clip, check in failed.items()}, job.progress)
+                    break
+                for clip, check in failed.items():
+                    job.progress.stage(clip.name, "retry", error=check.summary())
+                pending = {
+                    clip: FarmTask(
+                        kind=pending[clip].kind,
+                        inputs=pending[clip].inputs,
+                        outputs=pending[clip].outputs,
+                        params={**pending[clip].params, "seed": retry_seed(gate_cfg, attempt + 1)},
+                    )
+                    for clip in failed
+                }
+        except Exception as exc:
+            job.progress.stage("render", "failed", error=str(exc))
+            raise
+        finally:
+            coordinator.stop()
+
+    def _publish_segment(
+        self, job: _RenderJob, hls: HlsPublisher, overlays: tuple, clip: _Clip
+    ) -> None:
+        # Progressive output: compose one rendered chunk into its HLS segment and list it.
+        # overlays is (background, captions, slides) for preset layouts.
+        import soundfile as sf
+
+        from .compositing import compose_video, encode_video, interpolate_video
+        from .frame_pipe import LOSSLESS_SUFFIX
+        from .image_utils import load_face_box
+        from .slides import build_slide_stream, track_digest
+
+        preset = job.preset
+        bg_path, subtitle_ass, slides = overlays
+        ffmpeg_path = self.config.get("ffmpeg_path", "ffmpeg")
+        composition_cfg = self.config.get("composition", {})
+        captions_cfg = self.config.get("captions", {})
+        start_seconds = clip.offset / job.fps
+        duration = float(sf.info(str(clip.audio)).duration)
+
+        def compose_segment():
+            source = clip.video
+            if job.fps != job.output_fps:
+                source = interpolate_video(
+                    source,
+                    job.workspace.scratch_path(f"interp_{clip.idx:03d}{LOSSLESS_SUFFIX}"),
+                    fps=job.output_fps,
+                    frame_count=int(duration * job.output_fps),
+                    method=job.interpolate_method,
+                    ffmpeg_path=ffmpeg_path,
+                )
+            # Composed next to the captions file, then moved in so players never see a partial segment
+            staged = job.workspace.path(f"segment_{job.workspace.job_id}_{clip.idx:03d}.mp4")
+            segment_args = dict(
+                out_path=staged,
+                ffmpeg_path=ffmpeg_path,
+                encoder=composition_cfg.get("encoder", "libx264"),
+                preset_speed=composition_cfg.get("preset", "veryfast"),
+                crf=int(composition_cfg.get("crf", 23)),
+                audio_path=clip.audio,
+                fragmented=True,
+            )
+            if preset:
+                segment_args.update(
+                    face_box=load_face_box(job.prepared_image),
+                    rate_control=composition_cfg.get("rate_control"),
+                    avatar_size=job.avatar_size,
+                )
+                content_track = None
+                if slides:
+                    content_track = build_slide_stream(
+                        slides,
+                        preset.content_box[2:],
+                        Path(self.config["output_dir"]) / "cache" / "slides",
+                        job.workspace.scratch_path(f"slides_{clip.idx:03d}.mkv"),
+                        duration_seconds=duration,
+                        start_seconds=start_seconds,
+                        ffmpeg_path=ffmpeg_path,
                     )
-                    chunk_videos.append(chunk_video)
+                compose_video(
+                    background_path=bg_path,
+                    avatar_video_path=source,
+                    preset=preset,
+                    duration_seconds=duration,
+                    subtitle_ass=subtitle_ass if captions_cfg.get("burn_in", True) else None,
+                    content_track=content_track,
+                    start_seconds=start_seconds,
+                    **segment_args,
+                )
+            else:
+                encode_video(source, **segment_args)
+            os.replace(staged, hls.segment_path(clip.idx))
+            return {"video": hls.segment_path(clip.idx)}
+
+        segment_hash = hash_inputs(
+            clip.video,
+            start_seconds,
+            preset.key if preset else None,
+            composition_cfg,
+            captions_cfg.get("burn_in", True),
+            track_digest(slides, preset.content_box[2:]) if preset and slides else None,
+            load_face_box(job.prepared_image)
+            if preset and (composition_cfg.get("rate_control") or {}).get("face_roi")
+            else None,
+        )
+        self._stage(job.manifest, job.progress, f"segment_{clip.idx:03d}", segment_hash, compose_segment)
+        hls.publish(clip.idx, duration)
+
+    def _join_clips(
+        self, job: _RenderJob, clips: list[_Clip], plan: RenderPlan | None, hls: HlsPublisher | None
+    ) -> None:
+        # Progressive jobs remux their published segments into the final MP4; otherwise the clips
+        # are concatenated, or with silence detection assembled around the idle loop
+        from .progressive import remux_segments
+        from .silence import assemble_segments
 
-                concat_list = output_dir / f"concat_{stamp}.txt"
+        ffmpeg_path = self.config.get("ffmpeg_path", "ffmpeg")
+        chunk_videos = [clip.video for clip in clips]
+
+        if hls is not None:
+
+            def finalize():
+                playlist = hls.finish()
+                remux_segments(hls.segment_paths(), job.final_video_path, ffmpeg_path=ffmpeg_path)
+                return {"video": job.final_video_path, "playlist": playlist}
+
+            self._stage(job.manifest, job.progress, "finalize", hash_inputs(*hls.segment_paths()), finalize)
+            job.published = True
+        elif plan is None:
+
+            def concat():
+                concat_list = job.workspace.scratch_path("concat.txt")
                 concat_list.write_text(
                     "\n".join([f"file '{p.resolve().as_posix()}'" for p in chunk_videos]),
                     encoding="utf-8",
                 )
-                ffmpeg_path = self.config.get("ffmpeg_path", "ffmpeg")
-                subprocess.run(
+                governor().run(
+                    "concat",
                     [
                         ffmpeg_path,
                         "-y",
@@ -131,68 +811,645 @@ class AvatarPipeline:
                         str(concat_list),
                         "-c",
                         "copy",
-                        str(raw_video_path),
+                        str(job.raw_video_path),
                     ],
                     check=True,
                 )
+                return {"video": job.raw_video_path}
+
+            self._stage(job.manifest, job.progress, "concat", hash_inputs(*chunk_videos), concat)
+        else:
+            idle_video = None
+            if any(segment.kind == "idle" for segment in plan.segments):
+                idle_seconds = float(self.config.get("silence", {}).get("idle_seconds", 4.0))
+                idle_video = self._idle_loop(
+                    job.prepared_image, job.fps, idle_seconds, job.workspace, job.manifest, job.progress
+                )
+
+            def assemble():
+                assemble_segments(
+                    plan,
+                    chunk_videos,
+                    idle_video,
+                    job.raw_video_path,
+                    width=job.avatar_size[0],
+                    height=job.avatar_size[1],
+                    ffmpeg_path=ffmpeg_path,
+                )
+                return {"video": job.raw_video_path}
+
+            assemble_hash = hash_inputs(*chunk_videos, idle_video, plan.blend_frames)
+            self._stage(job.manifest, job.progress, "assemble", assemble_hash, assemble)
+
+    def _interpolate(self, job: _RenderJob) -> None:
+        from .compositing import interpolate_video
+        from .frame_pipe import LOSSLESS_SUFFIX
+
+        rendered_path = job.raw_video_path
+        job.raw_video_path = job.workspace.path(f"interp_{job.workspace.job_id}{LOSSLESS_SUFFIX}")
+
+        def interpolate():
+            interpolate_video(
+                rendered_path,
+                job.raw_video_path,
+                fps=job.output_fps,
+                frame_count=int(job.total_seconds * job.output_fps),
+                method=job.interpolate_method,
+                ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
+            )
+            return {"video": job.raw_video_path}
+
+        interpolate_hash = hash_inputs(rendered_path, job.output_fps, job.interpolate_method)
+        self._stage(job.manifest, job.progress, "interpolate", interpolate_hash, interpolate)
+
+    def _output(self, job: _RenderJob, upstream: dict) -> Dict[str, Path]:
+        from .compositing import encode_video
+        from .speech_overlay import write_caption_sidecars
+
+        composition_cfg = self.config.get("composition", {})
+        sidecar_formats = list(self.config.get("captions", {}).get("sidecar") or [])
+        if job.published:
+            # Every segment was composed as it rendered; final_video_path is their remux
+            job.raw_video_path = None
+            job.composed_path = job.final_video_path
+            subtitle_ass = upstream.get("captions", {}).get("captions")
+            if subtitle_ass and sidecar_formats:
+                self._stage(
+                    job.manifest,
+                    job.progress,
+                    "subtitles",
+                    hash_inputs(subtitle_ass, sidecar_formats),
+                    lambda: write_caption_sidecars(subtitle_ass, job.final_video_path, sidecar_formats),
+                )
+        elif job.preset:
+            self._compose_output(job, upstream)
+        elif job.separate_audio:
+
+            def encode():
+                encode_video(
+                    job.raw_video_path,
+                    job.final_video_path,
+                    audio_path=job.audio_path,
+                    ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
+                    encoder=composition_cfg.get("encoder", "libx264"),
+                    preset_speed=composition_cfg.get("preset", "veryfast"),
+                    crf=int(composition_cfg.get("crf", 23)),
+                )
+                return {"video": job.final_video_path}
+
+            encode_hash = hash_inputs(job.raw_video_path, job.audio_path, composition_cfg)
+            self._stage(job.manifest, job.progress, "encode", encode_hash, encode)
+            job.composed_path = None
+        else:
+            job.final_video_path = job.raw_video_path
+            job.composed_path = None
+
+        return {"video": job.final_video_path}
+
+    def _compose_output(self, job: _RenderJob, upstream: dict) -> None:
+        # Preset layouts: the avatar over the background with slides and captions, on the farm or
+        # locally, then soft caption tracks and sidecars
+        import soundfile as sf
+
+        from .compositing import (
+            compose_video,
+            mux_subtitles,
+            plan_ladder,
+            rendition_manifest_path,
+            write_rendition_manifest,
+        )
+        from .farm import FarmTask
+        from .image_utils import load_face_box
+        from .slides import build_slide_stream, track_digest
+        from .speech_overlay import write_caption_sidecars
+
+        preset, workspace = job.preset, job.workspace
+        output_dir = Path(self.config["output_dir"])
+        ffmpeg_path = self.config.get("ffmpeg_path", "ffmpeg")
+        composition_cfg = self.config.get("composition", {})
+        captions_cfg = self.config.get("captions", {})
+        captions_language = captions_cfg.get("language", "eng")
+        sidecar_formats = list(captions_cfg.get("sidecar") or [])
+        raw_video_path, second_video_path = job.raw_video_path, job.second_video_path
+        final_video_path = job.final_video_path
+
+        bg_path = upstream["background"]["background"]
+        subtitle_ass = upstream.get("captions", {}).get("captions")
+        # Soft captions: compose the picture without them and mux them in as a track, so a
+        # caption change re-runs only the stream-copy remux
+        soft_track = bool(captions_cfg.get("soft_track", False)) and subtitle_ass is not None
+        burned_ass = subtitle_ass if captions_cfg.get("burn_in", True) else None
+        picture_path = workspace.path(f"picture_{workspace.job_id}.mp4") if soft_track else final_video_path
+        slides = self._slide_track(preset, job.inputs)
+        slides_digest = track_digest(slides, preset.content_box[2:]) if slides else None
+        duration_sec = None
+        try:
+            duration_sec = float(sf.info(str(job.audio_path)).duration)
+        except Exception:
+            duration_sec = None
+
+        encoder = composition_cfg.get("encoder", "libx264")
+        preset_speed = composition_cfg.get("preset", "veryfast")
+        crf = int(composition_cfg.get("crf", 23))
+        renditions = composition_cfg.get("renditions") or []
+        ladder = plan_ladder(renditions, picture_path, preset.resolution, encoder, preset_speed, crf)
+        rate_control = composition_cfg.get("rate_control") or {}
+        avatar_size = self._avatar_size(preset, square=job.inputs.reference_video is not None)
+        face_box = load_face_box(job.prepared_image)
+        second_face_box = None
+        if second_video_path:
+            second_face_box = load_face_box(workspace.path(f"avatar_b_{workspace.job_id}.png"))
+
+        def compose():
+            content_track = None
+            if slides:
+                content_track = build_slide_stream(
+                    slides,
+                    preset.content_box[2:],
+                    output_dir / "cache" / "slides",
+                    workspace.scratch_path("slides.mkv"),
+                    duration_seconds=float(sf.info(str(job.audio_path)).duration),
+                    ffmpeg_path=ffmpeg_path,
+                )
+            coordinator = self._farm_coordinator(output_dir)
+            if coordinator is not None:
+                task_inputs = {"background": bg_path, "avatar_video": raw_video_path}
+                if burned_ass:
+                    task_inputs["subtitle_ass"] = burned_ass
+                if content_track:
+                    task_inputs["content_track"] = content_track
+                if second_video_path:
+                    task_inputs["second_avatar_video"] = second_video_path
+                if job.separate_audio:
+                    task_inputs["audio"] = job.audio_path
+                task = FarmTask(
+                    kind="compose_segment",
+                    inputs=task_inputs,
+                    outputs={
+                        "video": picture_path,
+                        **{f"rendition_{rung['name']}": rung["path"] for rung in ladder},
+                    },
+                    params={
+                        "preset": preset.key,
+                        "duration_seconds": duration_sec,
+                        "encoder": encoder,
+                        "preset_speed": preset_speed,
+                        "crf": crf,
+                        "renditions": renditions,
+                        "face_box": face_box,
+                        "second_face_box": second_face_box,
+                        "rate_control": rate_control,
+                        "avatar_size": avatar_size,
+                    },
+                )
+                try:
+                    coordinator.run([task])
+                finally:
+                    coordinator.stop()
+                if ladder:
+                    write_rendition_manifest(picture_path, ladder, preset.resolution, encoder, crf, preset.fps)
             else:
+                compose_video(
+                    background_path=bg_path,
+                    avatar_video_path=raw_video_path,
+                    out_path=picture_path,
+                    preset=preset,
+                    ffmpeg_path=ffmpeg_path,
+                    duration_seconds=duration_sec,
+                    encoder=encoder,
+                    preset_speed=preset_speed,
+                    crf=crf,
+                    subtitle_ass=burned_ass,
+                    audio_path=job.audio_path if job.separate_audio else None,
+                    renditions=renditions,
+                    content_track=content_track,
+                    second_avatar_video_path=second_video_path,
+                    face_box=face_box,
+                    second_face_box=second_face_box,
+                    rate_control=rate_control,
+                    avatar_size=avatar_size,
+                )
+            artifacts = {"video": picture_path}
+            for rung in ladder:
+                artifacts[f"rendition_{rung['name']}"] = rung["path"]
+            if ladder:
+                artifacts["renditions"] = rendition_manifest_path(picture_path)
+            return artifacts
+
+        compose_hash = hash_inputs(
+            raw_video_path,
+            second_video_path,
+            bg_path,
+            burned_ass,
+            preset.key,
+            composition_cfg,
+            slides_digest,
+            face_box if rate_control.get("face_roi") else None,
+            second_face_box if rate_control.get("face_roi") else None,
+        )
+        self._stage(job.manifest, job.progress, "compose", compose_hash, compose)
+        job.composed_path = final_video_path
+
+        if soft_track or (subtitle_ass and sidecar_formats):
+
+            def subtitles():
+                artifacts = {}
+                if soft_track:
+                    final_ladder = plan_ladder(renditions, final_video_path, preset.resolution, encoder, preset_speed, crf)
+                    tracks = [(subtitle_ass, captions_language)]
+                    mux_subtitles(picture_path, final_video_path, tracks, ffmpeg_path=ffmpeg_path)
+                    artifacts["video"] = final_video_path
+                    for rung, final_rung in zip(ladder, final_ladder):
+                        mux_subtitles(rung["path"], final_rung["path"], tracks, ffmpeg_path=ffmpeg_path)
+                        artifacts[f"rendition_{rung['name']}"] = final_rung["path"]
+                    if ladder:
+                        artifacts["renditions"] = write_rendition_manifest(
+                            final_video_path, final_ladder, preset.resolution, encoder, crf, preset.fps
+                        )
+                artifacts.update(write_caption_sidecars(subtitle_ass, final_video_path, sidecar_formats))
+                return artifacts
+
+            subtitles_hash = hash_inputs(
+                picture_path if soft_track else None, subtitle_ass, captions_language, sidecar_formats
+            )
+            self._stage(job.manifest, job.progress, "subtitles", subtitles_hash, subtitles)
+
+    def _check_render(self, video_path: Path, audio_path: Path, fps: int, has_audio: bool):
+        # None when the quality gate is off
+        import soundfile as sf
+
+        from .echomimic import expected_frames
+        from .quality import check_chunk
+
+        gate_cfg = self.config.get("quality_gate", {})
+        if not gate_cfg.get("enabled", False):
+            return None
+        expected = expected_frames(audio_path, fps)
+        # EchoMimic's own MP4 carries the audio, trimmed to the frames it rendered
+        audio_seconds = min(float(sf.info(str(audio_path)).duration), expected / fps) if has_audio else None
+        return check_chunk(
+            video_path,
+            expected,
+            fps,
+            audio_seconds,
+            ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
+            gate_cfg=gate_cfg,
+        )
+
+    def _gated_render(
+        self,
+        name: str,
+        render: Callable[[int | None], None],
+        video_path: Path,
+        audio_path: Path,
+        fps: int,
+        has_audio: bool,
+        progress: JobProgress,
+    ) -> None:
+        # Checks a clip as soon as it is rendered and renders it again with a new seed while it
+        # comes back truncated, black or frozen, so a bad chunk never reaches concat
+        from .quality import retry_seed
+
+        gate_cfg = self.config.get("quality_gate", {})
+        retries = int(gate_cfg.get("max_retries", 2))
+        for attempt in range(retries + 1):
+            render(retry_seed(gate_cfg, attempt))
+            check = self._check_render(video_path, audio_path, fps, has_audio)
+            if check is None or check.ok:
+                return
+            if attempt < retries:
+                progress.stage(name, "retry", error=check.summary())
+        self._gate_exhausted(gate_cfg, {name: check}, progress)
+
+    def _gate_exhausted(self, gate_cfg: dict, failed: dict, progress: JobProgress) -> None:
+        # The checks are heuristics: by default the last attempt is kept and reported, and only
+        # quality_gate.on_fail = "error" fails the job
+        retries = int(gate_cfg.get("max_retries", 2))
+        summaries = "; ".join(check.summary() for check in failed.values())
+        if gate_cfg.get("on_fail", "keep") == "error":
+            raise RuntimeError(f"Quality gate failed after {retries + 1} attempts: {summaries}")
+        for name, check in failed.items():
+            progress.stage(name, "warning", error=f"kept after {retries + 1} attempts: {check.summary()}")
+
+    def _stage(
+        self,
+        manifest: JobManifest,
+        progress: JobProgress,
+        name: str,
+        inputs_hash: str,
+        fn: Callable[[], Dict[str, Path]],
+        frames: int = 0,
+    ) -> Dict[str, Path]:
+        # Skip stages whose inputs are unchanged and whose artifacts are still intact.
+        if manifest.is_complete(name, inputs_hash):
+            progress.stage(name, "skipped", frames=frames)
+            return {key: Path(a["path"]) for key, a in manifest.stages[name]["artifacts"].items()}
+        manifest.start(name, inputs_hash)
+        progress.stage(name, "started")
+        try:
+            artifacts = fn()
+        except Exception as exc:
+            manifest.fail(name, str(exc))
+            progress.stage(name, "failed", error=str(exc))
+            raise
+        manifest.complete(name, inputs_hash, artifacts)
+        progress.stage(name, "done", frames=frames)
+        return artifacts
+
+    def _overlay_stages(
+        self,
+        graph: StageGraph,
+        preset: Preset | None,
+        inputs: PipelineInputs,
+        audio_path: Path,
+        workspace: JobWorkspace,
+        audio_stage: str,
+        spans_path: Path | None = None,
+    ) -> tuple[str, ...]:
+        # The preset background needs nothing and starts with the first stages; the captions
+        # only wait for the audio, not for the render. Dialogue jobs pass their speaker spans so
+        # each caption line shows without its "Name:" tag, timed to when that line is spoken.
+        # Slides fill the content panel, so their captions move to the band below it.
+        if preset is None:
+            return ()
+        from .speech_overlay import build_karaoke_ass
+
+        background_override = inputs.background_image
+        if not background_override:
+            configured_bg = self.config.get("preset_background", "").strip()
+            if configured_bg:
+                background_override = Path(configured_bg)
+
+        def background(upstream):
+            presets_dir = Path(self.config["output_dir"]) / "presets"
+            return {"background": render_background(preset, presets_dir, background_override)}
+
+        graph.add("background", background, inputs=lambda up: (preset.key, preset.resolution, background_override))
+        if preset.content_box is None:
+            return ("background",)
+
+        def captions(upstream):
+            segments = None
+            if spans_path is not None:
+                from .dialogue import load_spans, parse_dialogue
+
+                _names, lines = parse_dialogue(inputs.script_text)
+                segments = [(span.start, span.end, line.text) for line, span in zip(lines, load_spans(spans_path))]
+            subtitle_ass = build_karaoke_ass(
+                script_text=inputs.script_text,
+                audio_path=audio_path,
+                preset=preset,
+                out_path=workspace.path(f"speech_{workspace.job_id}.ass"),
+                segments=segments,
+                below_content=bool(inputs.slides),
+            )
+            return {"captions": subtitle_ass}
+
+        graph.add(
+            "captions",
+            captions,
+            needs=(audio_stage,),
+            inputs=lambda up: (inputs.script_text, audio_path, preset.key, preset.content_box, spans_path, bool(inputs.slides)),
+        )
+        return ("background", "captions")
+
+    def phrase_cache(self) -> PhraseCache | None:
+        # The machine-wide TTS phrase cache, or None when tts.cache is off
+        from .tts_cache import phrase_cache
+
+        cache_cfg = self.config.get("tts", {}).get("cache", {})
+        if not cache_cfg.get("enabled", True):
+            return None
+        max_gb = cache_cfg.get("max_gb")
+        return phrase_cache(
+            Path(self.config["output_dir"]) / "cache" / "tts",
+            max_bytes=int(float(max_gb) * 1024**3) if max_gb else None,
+        )
+
+    def _synthesize(self, text: str, voice_sample: Path, out_wav: Path) -> TtsResult:
+        from .tts import generate_tts, get_backend
+        from .tts_cache import generate_tts_cached
+
+        tts_cfg = self.config.get("tts", {})
+        if not tts_cfg.get("enable", True):
+            raise RuntimeError("TTS is disabled in config.json")
+        backend = get_backend(tts_cfg)
+        cache_cfg = tts_cfg.get("cache", {})
+        cache = self.phrase_cache()
+        if cache is not None:
+            return generate_tts_cached(
+                text=text,
+                speaker_wav=voice_sample,
+                out_wav=out_wav,
+                model_name=backend.model_id,
+                language=tts_cfg.get("language", "en"),
+                cache=cache,
+                crossfade_ms=int(cache_cfg.get("crossfade_ms", 20)),
+                params=backend.synthesis_params,
+                backend=backend,
+            )
+        return generate_tts(
+            text=text,
+            speaker_wav=voice_sample,
+            out_wav=out_wav,
+            language=tts_cfg.get("language", "en"),
+            backend=backend,
+        )
+
+    def _idle_loop(
+        self,
+        image: Path,
+        fps: int,
+        idle_seconds: float,
+        workspace: JobWorkspace,
+        manifest: JobManifest,
+        progress: JobProgress,
+        stage_name: str = "idle",
+    ) -> Path:
+        from .echomimic import run_echomimic
+        from .frame_pipe import LOSSLESS_SUFFIX
+        from .silence import write_silence
+
+        idle_hash = hash_inputs(image, fps, idle_seconds)
+
+        def render_idle():
+            # Rendered once per avatar image and reused by every later job
+            cached = Path(self.config["output_dir"]) / "cache" / "idle" / f"{idle_hash[:32]}{LOSSLESS_SUFFIX}"
+            if not cached.exists():
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                silent = write_silence(workspace.scratch_path(f"{stage_name}_silence.wav"), idle_seconds)
+                tmp = cached.with_name(cached.stem + f".{os.getpid()}.tmp{LOSSLESS_SUFFIX}")
                 run_echomimic(
                     echomimic_dir=self.config["echo_mimic_dir"],
                     weights_dir=self.config["echo_mimic_weights"],
-                    image_path=prepared_image,
-                    audio_path=audio_path,
-                    out_path=raw_video_path,
-                    ref_video=inputs.reference_video,
-                )
-
-        preset_key = _resolve_preset_key(inputs.preset_name, self.config.get("preset"))
-        preset = get_preset(preset_key)
-        if preset:
-            background_override = inputs.background_image
-            if not background_override:
-                configured_bg = self.config.get("preset_background", "").strip()
-                if configured_bg:
-                    background_override = Path(configured_bg)
-            bg_path = render_background(preset, output_dir / "presets", background_override)
-            duration_sec = None
-            try:
-                duration_sec = float(sf.info(str(audio_path)).duration)
-            except Exception:
-                duration_sec = None
-
-            subtitle_ass = None
-            if preset.content_box is not None:
-                subtitle_ass = build_karaoke_ass(
-                    script_text=inputs.script_text,
-                    audio_path=audio_path,
-                    preset=preset,
-                    out_path=output_dir / f"speech_{stamp}.ass",
+                    image_path=image,
+                    audio_path=silent,
+                    out_path=tmp,
+                    fps=fps,
+                    scratch_dir=workspace.scratch,
+                    lossless=True,
+                    ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
                 )
-            compose_video(
-                background_path=bg_path,
-                avatar_video_path=raw_video_path,
-                out_path=final_video_path,
-                preset=preset,
-                ffmpeg_path=self.config.get("ffmpeg_path", "ffmpeg"),
-                duration_seconds=duration_sec,
-                encoder=self.config.get("composition", {}).get("encoder", "libx264"),
-                preset_speed=self.config.get("composition", {}).get("preset", "veryfast"),
-                crf=int(self.config.get("composition", {}).get("crf", 23)),
-                subtitle_ass=subtitle_ass,
+                os.replace(tmp, cached)
+            return {"video": cached}
+
+        return self._stage(manifest, progress, stage_name, idle_hash, render_idle)["video"]
+
+    def _render_dialogue(
+        self,
+        inputs: PipelineInputs,
+        workspace: JobWorkspace,
+        manifest: JobManifest,
+        progress: JobProgress,
+        preset: Preset,
+        prepared_image: Path,
+        audio_path: Path,
+    ) -> tuple[Path, Path]:
+        # Each presenter is diffused only over their own lines. While the other one talks they
+        # play their cached idle loop, so the timeline is rendered about once in total, not twice.
+        import soundfile as sf
+
+        from .dialogue import load_spans, mix_lines, parse_dialogue, save_spans, speaker_mask
+        from .echomimic import run_echomimic
+        from .frame_pipe import LOSSLESS_SUFFIX
+        from .image_utils import face_box_path
+        from .silence import assemble_segments, plan_segments, write_segment_audio
+        from .tts import get_backend
+
+        stamp = workspace.job_id
+        ffmpeg_path = self.config.get("ffmpeg_path", "ffmpeg")
+        dialogue_cfg = self.config.get("dialogue", {})
+        tts_cfg = self.config.get("tts", {})
+        fps = preset.fps
+        avatar_size = self._avatar_size(preset)
+        _names, lines = parse_dialogue(inputs.script_text)
+
+        images = [prepared_image, workspace.path(f"avatar_b_{stamp}.png")]
+        sources = [inputs.avatar_image, inputs.second_avatar_image]
+        voices = [inputs.voice_sample, inputs.second_voice_sample or inputs.voice_sample]
+        for tag, source, image in zip(("avatar", "avatar_b"), sources, images):
+
+            def prepare_image(source=source, image=image):
+                self._prepare_avatar(source, image, avatar_size, preset.crop_focus_y)
+                return {"image": image, "face": face_box_path(image)}
+
+            self._stage(
+                manifest, progress, tag, hash_inputs(source, avatar_size, preset.crop_focus_y), prepare_image
             )
-            composed_path = final_video_path
-        else:
-            if raw_video_path != final_video_path:
-                final_video_path = raw_video_path
-            composed_path = None
 
-        return PipelineOutputs(
-            audio_path=audio_path,
-            image_path=prepared_image,
-            video_path=final_video_path,
-            raw_video_path=raw_video_path,
-            composed_video_path=composed_path,
+        gap_seconds = float(dialogue_cfg.get("gap_seconds", 0.3))
+
+        def synthesize():
+            line_wavs = [
+                self._synthesize(line.text, voices[line.speaker], workspace.scratch_path(f"line_{i:03d}.wav")).path
+                for i, line in enumerate(lines)
+            ]
+            spans = mix_lines(lines, line_wavs, audio_path, gap_seconds)
+            return {"audio": audio_path, "spans": save_spans(spans, workspace.path(f"spans_{stamp}.json"))}
+
+        backend = get_backend(tts_cfg)
+        tts_hash = hash_inputs(
+            inputs.script_text,
+            *voices,
+            backend.model_id,
+            backend.synthesis_params,
+            tts_cfg.get("language", "en"),
+            gap_seconds,
         )
+        spans = load_spans(self._stage(manifest, progress, "tts", tts_hash, synthesize)["spans"])
+
+        total_frames = int(sf.info(str(audio_path)).duration * fps)
+        blend_frames = int(round(float(dialogue_cfg.get("blend_seconds", 0.25)) * fps))
+        idle_seconds = float(dialogue_cfg.get("idle_seconds", 4.0))
+        plans = [
+            plan_segments(speaker_mask(spans, speaker, fps, total_frames), fps, blend_frames) for speaker in (0, 1)
+        ]
+        progress.add_frames(sum(s.end - s.start for plan in plans for s in plan.voiced))
+
+        videos = []
+        for speaker, tag in enumerate(("a", "b")):
+            plan = plans[speaker]
+            clips = []
+            for idx, segment in enumerate(plan.voiced, start=1):
+                clip = workspace.path(f"voiced_{tag}_{stamp}_{idx:03d}{LOSSLESS_SUFFIX}")
+
+                def render_clip(segment=segment, clip=clip, speaker=speaker, name=f"{tag}_{idx:03d}"):
+                    clip_audio = write_segment_audio(
+                        audio_path, segment, fps, workspace.scratch_path(f"voiced_{name}.wav")
+                    )
+
+                    def render(seed):
+                        run_echomimic(
+                            echomimic_dir=self.config["echo_mimic_dir"],
+                            weights_dir=self.config["echo_mimic_weights"],
+                            image_path=images[speaker],
+                            audio_path=clip_audio,
+                            out_path=clip,
+                            fps=fps,
+                            scratch_dir=workspace.scratch,
+                            lossless=True,
+                            ffmpeg_path=ffmpeg_path,
+                            seed=seed,
+                        )
+
+                    self._gated_render(f"render_{name}", render, clip, clip_audio, fps, False, progress)
+                    return {"video": clip}
+
+                clip_hash = hash_inputs(images[speaker], audio_path, segment.start, segment.end, fps)
+                self._stage(
+                    manifest,
+                    progress,
+                    f"render_{tag}_{idx:03d}",
+                    clip_hash,
+                    render_clip,
+                    frames=segment.end - segment.start,
+                )
+                clips.append(clip)
+
+            idle_video = None
+            if any(segment.kind == "idle" for segment in plan.segments):
+                idle_video = self._idle_loop(
+                    images[speaker], fps, idle_seconds, workspace, manifest, progress, f"idle_{tag}"
+                )
+            raw_path = workspace.path(f"raw_{tag}_{stamp}{LOSSLESS_SUFFIX}")
+
+            def assemble(plan=plan, clips=clips, idle_video=idle_video, raw_path=raw_path):
+                assemble_segments(
+                    plan,
+                    clips,
+                    idle_video,
+                    raw_path,
+                    width=avatar_size[0],
+                    height=avatar_size[1],
+                    ffmpeg_path=ffmpeg_path,
+                )
+                return {"video": raw_path}
+
+            assemble_hash = hash_inputs(*clips, idle_video, plan.blend_frames, plan.total_frames)
+            videos.append(self._stage(manifest, progress, f"assemble_{tag}", assemble_hash, assemble)["video"])
+        return videos[0], videos[1]
+
+    def _slide_track(self, preset: Preset, inputs: PipelineInputs) -> list[Slide]:
+        # Slides are drawn into the preset's content panel; presets without one ignore the track
+        if not inputs.slides or preset.content_box is None:
+            return []
+        from .slides import load_slide_track
+
+        return load_slide_track(inputs.slides)
+
+    def _farm_coordinator(self, output_dir: Path) -> FarmCoordinator | None:
+        farm_cfg = self.config.get("farm", {})
+        if not farm_cfg.get("enabled", False):
+            return None
+        from .farm import FarmCoordinator
+
+        return FarmCoordinator(
+            worker_urls=list(farm_cfg.get("workers", [])),
+            store_dir=output_dir / "farm_store",
+            heartbeat_seconds=float(farm_cfg.get("heartbeat_seconds", 2.0)),
+            timeout_seconds=float(farm_cfg.get("timeout_seconds", 10.0)),
+            max_attempts=int(farm_cfg.get("max_attempts", 3)),
+        ).start()
 
 
 def _resolve_preset_key(input_value: str | None, default_value: str | None) -> str | None:
@@ -201,3 +1458,33 @@ def _resolve_preset_key(input_value: str | None, default_value: str | None) -> s
     if default_value and str(default_value).strip().lower() in {"none", "off", "raw"}:
         default_value = None
     return resolve_preset_key(input_value) or resolve_preset_key(default_value) or default_value
+
+
+def _dialogue_preset(preset: Preset | None) -> Preset:
+    # Dialogue needs a layout with a second presenter slot
+    if preset is not None and preset.second_avatar_pos is not None:
+        return preset
+    return get_preset("two_presenters")
+
+
+def _inputs_to_dict(inputs: PipelineInputs) -> dict:
+    return {key: str(value) if isinstance(value, Path) else value for key, value in asdict(inputs).items()}
+
+
+def _inputs_from_dict(data: dict) -> PipelineInputs:
+    path_fields = {
+        "avatar_image",
+        "voice_sample",
+        "reference_video",
+        "background_image",
+        "slides",
+        "second_avatar_image",
+        "second_voice_sample",
+    }
+    known = {f.name for f in fields(PipelineInputs)}
+    kwargs = {}
+    for key, value in data.items():
+        if key not in known:
+            continue
+        kwargs[key] = Path(value) if key in path_fields and value else value
+    return PipelineInputs(**kwargs)
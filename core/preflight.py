@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from .presets import get_preset
+
+# Everything EchoMimic's generated config points at (see echomimic._write_config)
+ECHOMIMIC_WEIGHTS = [
+    "sd-image-variations-diffusers",
+    "sd-vae-ft-mse",
+    "audio_processor/whisper_tiny.pt",
+    "denoising_unet.pth",
+    "reference_unet.pth",
+    "face_locator.pth",
+    "motion_module.pth",
+]
+ECHOMIMIC_FILES = ["configs/inference/inference_v2.yaml", "infer_audio2vid.py"]
+POSE_SCRIPT = "infer_audio2vid_pose.py"
+INPUT_FILES = (
+    "avatar_image",
+    "voice_sample",
+    "reference_video",
+    "background_image",
+    "slides",
+    "second_avatar_image",
+    "second_voice_sample",
+)
+
+# Rough sizes used to estimate a job's disk footprint
+LOSSLESS_BYTES_PER_SECOND = 10 * 1024**2
+LOSSY_BYTES_PER_SECOND = 1024**2
+
+
+@dataclass
+class PreflightReport:
+    errors: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+    capabilities: dict = field(default_factory=dict)
+    cached: bool = False
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def summary(self) -> str:
+        lines = [f"Preflight {'passed' if self.ok else 'FAILED'} in {self.seconds * 1000:.0f} ms"
+                 + (" (cached capabilities)" if self.cached else "")]
+        lines += [f"  error: {e}" for e in self.errors]
+        lines += [f"  warning: {w}" for w in self.warnings]
+        return "\n".join(lines)
+
+
+class PreflightError(RuntimeError):
+    def __init__(self, report: PreflightReport):
+        super().__init__("Preflight failed:\n" + "\n".join(f"- {e}" for e in report.errors))
+        self.report = report
+
+
+def run_preflight(
+    config: dict,
+    inputs=None,
+    preset_key: str | None = None,
+    dummy: bool | None = None,
+) -> PreflightReport:
+    # Input files and free disk are checked every time; tool and EchoMimic capabilities are cached
+    # under a key built only from stat() calls, so an unchanged machine answers in milliseconds.
+    started = time.perf_counter()
+    if dummy is None:
+        dummy = os.environ.get("CODEXOFFLINEVIDEO_DUMMY", "0") == "1"
+    report = PreflightReport()
+    requirements = _requirements(config, inputs, preset_key, dummy)
+
+    if inputs is not None:
+        # Dummy renders synthesise their own image and audio
+        for name in () if dummy else INPUT_FILES:
+            value = getattr(inputs, name, None)
+            if value and not Path(value).exists():
+                report.errors.append(f"{name} not found: {value}")
+        _check_slides(inputs, preset_key, report)
+        _check_dialogue(inputs, preset_key, report)
+        if not str(getattr(inputs, "script_text", "") or "").strip():
+            report.errors.append("Script is empty")
+
+    cache_path = Path(config["output_dir"]) / "cache" / "preflight.json"
+    key = _cache_key(requirements)
+    capabilities = _load_cached(cache_path, key)
+    if capabilities is None:
+        capabilities = _probe(requirements)
+        # A failed probe is re-run next time: the fix (a driver, a PATH entry, a pip install)
+        # need not touch anything the key stats
+        if not capabilities["errors"]:
+            _save_cached(cache_path, key, capabilities)
+    else:
+        report.cached = True
+    report.capabilities = capabilities
+    report.errors += capabilities["errors"]
+    report.warnings += capabilities["warnings"]
+
+    if not dummy:
+        _check_tts(config, report)
+        if getattr(inputs, "reference_video", None):
+            _check_motion(report)
+    if inputs is not None:
+        _check_disk(config, inputs, dummy, report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def estimate_job_bytes(config: dict, script_text: str) -> int:
+    # Narration runs at about 15 characters a second; intermediates are lossless when any of the
+    # frame-level modes are on, plus TTS audio and the final encodes.
+    seconds = max(3.0, len(script_text) / 15)
+    lossless = (
+        config.get("composition", {}).get("intermediate", "mp4") == "lossless"
+        or config.get("silence", {}).get("enabled", False)
+        or config.get("interpolation", {}).get("enabled", False)
+    )
+    per_second = LOSSLESS_BYTES_PER_SECOND if lossless else LOSSY_BYTES_PER_SECOND
+    renditions = len(config.get("composition", {}).get("renditions") or [])
+    return int(seconds * (2 * per_second + (1 + renditions) * LOSSY_BYTES_PER_SECOND))
+
+
+def _requirements(config: dict, inputs, preset_key: str | None, dummy: bool) -> dict:
+    composition_cfg = config.get("composition", {})
+    preset = get_preset(preset_key) if preset_key else None
+
+    encoder = composition_cfg.get("encoder", "libx264")
+    encoders = {"aac"}
+    filters = {"scale", "overlay", "format"}
+    if dummy:
+        # The placeholder clip is always written with libx264
+        encoders.add("libx264")
+    if preset is not None:
+        encoders.add(encoder)
+        if preset.content_box is not None:
+            captions_cfg = config.get("captions", {})
+            if captions_cfg.get("burn_in", True):
+                filters.add("subtitles")
+            if captions_cfg.get("soft_track", False):
+                encoders.add("mov_text")
+        if composition_cfg.get("renditions"):
+            filters.add("split")
+            encoders.update(r.get("encoder", encoder) for r in composition_cfg["renditions"])
+        if (composition_cfg.get("rate_control") or {}).get("face_roi"):
+            filters.add("addroi")
+    if not dummy:
+        separate = (
+            composition_cfg.get("intermediate", "mp4") == "lossless"
+            or config.get("silence", {}).get("enabled", False)
+            or config.get("interpolation", {}).get("enabled", False)
+        )
+        if separate:
+            encoders.update({"ffv1", encoder})
+        interp_cfg = config.get("interpolation", {})
+        if interp_cfg.get("enabled", False):
+            filters.add("minterpolate" if interp_cfg.get("method", "blend") == "mci" else "framerate")
+            filters.add("tpad")
+
+    echomimic_files = []
+    if not dummy:
+        echomimic_dir = Path(config["echo_mimic_dir"])
+        weights_dir = Path(config["echo_mimic_weights"])
+        echomimic_files = [str(echomimic_dir / name) for name in ECHOMIMIC_FILES]
+        if getattr(inputs, "reference_video", None):
+            echomimic_files.append(str(echomimic_dir / POSE_SCRIPT))
+        echomimic_files += [str(weights_dir / name) for name in ECHOMIMIC_WEIGHTS]
+
+    return {
+        "ffmpeg": config.get("ffmpeg_path", "ffmpeg"),
+        "ffprobe": "ffprobe",
+        "encoders": sorted(encoders),
+        "filters": sorted(filters),
+        "files": echomimic_files,
+    }
+
+
+def _cache_key(requirements: dict) -> str:
+    stats = {}
+    for tool in ("ffmpeg", "ffprobe"):
+        stats[tool] = _stat(shutil.which(requirements[tool]) or requirements[tool])
+    for path in requirements["files"]:
+        stats[path] = _stat(path)
+    payload = json.dumps({"requirements": requirements, "stats": stats}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _stat(path: str) -> list | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _load_cached(cache_path: Path, key: str) -> dict | None:
+    try:
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    capabilities = data.get(key)
+    # Entries written by older builds may hold errors; those are probed again
+    if not capabilities or capabilities.get("errors"):
+        return None
+    return capabilities
+
+
+def _save_cached(cache_path: Path, key: str, capabilities: dict) -> None:
+    try:
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        data = {}
+    data[key] = capabilities
+    # A handful of configurations per machine; drop the oldest beyond that
+    data = dict(list(data.items())[-16:])
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, cache_path)
+
+
+def _probe(requirements: dict) -> dict:
+    errors: list[str] = []
+    warnings: list[str] = []
+    capabilities = {"versions": {}, "encoders": {}, "filters": {}, "errors": errors, "warnings": warnings}
+
+    ffmpeg = requirements["ffmpeg"]
+    version = _tool_version(ffmpeg)
+    if version is None:
+        errors.append(f"ffmpeg not found or not runnable: {ffmpeg}")
+    else:
+        capabilities["versions"]["ffmpeg"] = version
+        available_encoders = _ffmpeg_list(ffmpeg, "-encoders")
+        available_filters = _ffmpeg_list(ffmpeg, "-filters")
+        for encoder in requirements["encoders"]:
+            usable = encoder in available_encoders and _encoder_works(ffmpeg, encoder)
+            capabilities["encoders"][encoder] = usable
+            if encoder not in available_encoders:
+                errors.append(f"ffmpeg has no '{encoder}' encoder")
+            elif not usable:
+                errors.append(f"ffmpeg encoder '{encoder}' is listed but failed a test encode (driver or GPU?)")
+        for name in requirements["filters"]:
+            capabilities["filters"][name] = name in available_filters
+            if name not in available_filters:
+                errors.append(f"ffmpeg has no '{name}' filter")
+
+    ffprobe = requirements["ffprobe"]
+    probe_version = _tool_version(ffprobe)
+    if probe_version is None:
+        # Only used to pick between EchoMimic's outputs; the newest file is taken without it
+        warnings.append(f"ffprobe not found: {ffprobe}")
+    else:
+        capabilities["versions"]["ffprobe"] = probe_version
+
+    for path in requirements["files"]:
+        if not Path(path).exists():
+            errors.append(f"EchoMimic file missing: {path}")
+    return capabilities
+
+
+def _tool_version(tool: str) -> str | None:
+    try:
+        out = subprocess.run([tool, "-version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    first = out.splitlines()[0] if out else ""
+    return first or None
+
+
+def _ffmpeg_list(ffmpeg: str, flag: str) -> set[str]:
+    out = subprocess.run([ffmpeg, "-hide_banner", flag], capture_output=True, text=True, timeout=10).stdout
+    names = set()
+    for line in out.splitlines():
+        parts = line.split()
+        # "-encoders": " V....D libx264  ..."; "-filters": " TSC subtitles  V->V ..."
+        if len(parts) >= 2 and not parts[0].startswith("="):
+            names.add(parts[1])
+    return names
+
+
+def _encoder_works(ffmpeg: str, encoder: str) -> bool:
+    # Hardware encoders are listed even when no usable device is present; one tiny encode settles it
+    if encoder == "mov_text":
+        # Subtitle text needs no device; being listed is enough
+        return True
+    if encoder == "aac":
+        source = ["-f", "lavfi", "-i", "anullsrc=r=48000:cl=mono", "-t", "0.1"]
+    else:
+        source = ["-f", "lavfi", "-i", "color=c=black:s=256x256:r=24", "-frames:v", "2"]
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", *source, "-c:" + ("a" if encoder == "aac" else "v"),
+           encoder, "-f", "null", "-"]
+    try:
+        return subprocess.run(cmd, capture_output=True, timeout=30).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def _check_slides(inputs, preset_key: str | None, report: PreflightReport) -> None:
+    slides_path = getattr(inputs, "slides", None)
+    if not slides_path or not Path(slides_path).exists():
+        return
+    preset = get_preset(preset_key) if preset_key else None
+    if preset is None or preset.content_box is None:
+        report.warnings.append("Slides are ignored: the preset has no content panel")
+        return
+    from .slides import load_slide_track
+
+    try:
+        slides = load_slide_track(slides_path)
+    except (ValueError, KeyError, TypeError) as exc:
+        report.errors.append(f"Slide track {slides_path} is invalid: {exc}")
+        return
+    for slide in slides:
+        if slide.image is not None and not slide.image.exists():
+            report.errors.append(f"Slide image not found: {slide.image}")
+
+
+def _check_dialogue(inputs, preset_key: str | None, report: PreflightReport) -> None:
+    if not getattr(inputs, "second_avatar_image", None):
+        return
+    from .dialogue import parse_dialogue
+
+    try:
+        names, _lines = parse_dialogue(str(inputs.script_text or ""))
+    except ValueError as exc:
+        report.errors.append(str(exc))
+        return
+    if len(names) < 2:
+        report.warnings.append("Dialogue script has a single speaker; the second presenter only idles")
+    preset = get_preset(preset_key) if preset_key else None
+    if preset is None or preset.second_avatar_pos is None:
+        report.warnings.append("Preset has no second presenter slot; the Two Presenters layout is used")
+
+
+def _check_tts(config: dict, report: PreflightReport) -> None:
+    import importlib.util
+
+    from .tts import PiperBackend, get_backend
+
+    tts_cfg = config.get("tts", {})
+    if not tts_cfg.get("enable", True):
+        return
+    try:
+        backend = get_backend(tts_cfg)
+    except ValueError as exc:
+        report.errors.append(str(exc))
+        return
+    package = {"xtts": "TTS", "piper": "piper"}.get(backend.name)
+    if package and importlib.util.find_spec(package) is None:
+        report.errors.append(f"TTS backend '{backend.name}' needs the '{package}' package")
+    if isinstance(backend, PiperBackend):
+        model = tts_cfg.get("piper", {}).get("model", "")
+        if not model or not Path(model).is_file():
+            report.errors.append(f"Piper voice not found: {model or '(tts.piper.model is empty)'}")
+
+
+def _check_motion(report: PreflightReport) -> None:
+    import importlib.util
+
+    # Poses come from MediaPipe face landmarks (core.motion); there is no landmark-free fallback
+    for package, pip_name in (("cv2", "opencv-python"), ("mediapipe", "mediapipe")):
+        if importlib.util.find_spec(package) is None:
+            report.errors.append(f"Motion cloning needs the '{pip_name}' package")
+
+
+def _check_disk(config: dict, inputs, dummy: bool, report: PreflightReport) -> None:
+    needed = estimate_job_bytes(config, str(getattr(inputs, "script_text", "") or ""))
+    roots = {Path(config["output_dir"])}
+    scratch = os.environ.get("CODEXOFFLINEVIDEO_SCRATCH_DIR", config.get("workspace", {}).get("scratch_dir", ""))
+    if scratch.strip():
+        roots.add(Path(scratch.strip()))
+    for root in roots:
+        probe = root
+        while not probe.exists() and probe.parent != probe:
+            probe = probe.parent
+        free = shutil.disk_usage(probe).free
+        report.capabilities.setdefault("disk", {})[str(root)] = free
+        if free < needed:
+            report.errors.append(
+                f"Not enough free disk under {root}: {free / 1024**3:.1f} GB free, about "
+                f"{needed / 1024**3:.1f} GB needed"
+            )
+
+
+def report_to_dict(report: PreflightReport) -> dict:
+    return {**asdict(report), "ok": report.ok}
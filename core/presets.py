@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import math
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable
+from typing import TYPE_CHECKING, Dict, Iterable
 
-from PIL import Image, ImageDraw
+if TYPE_CHECKING:
+    from PIL import Image, ImageDraw
 
 
 @dataclass(frozen=True)
@@ -18,6 +20,8 @@ class Preset:
     content_box: tuple[int, int, int, int] | None
     background_style: str
     crop_focus_y: float | None
+    # Dialogue presets place a second presenter, same box size as the first
+    second_avatar_pos: tuple[int, int] | None = None
 
 
 PRESETS: Dict[str, Preset] = {
@@ -87,6 +91,18 @@ PRESETS: Dict[str, Preset] = {
         background_style="keynote",
         crop_focus_y=0.55,
     ),
+    "two_presenters": Preset(
+        key="two_presenters",
+        label="Two Presenters",
+        resolution=(1280, 720),
+        fps=24,
+        avatar_box=(480, 600),
+        avatar_pos=(100, 60),
+        content_box=None,
+        background_style="podcast",
+        crop_focus_y=0.5,
+        second_avatar_pos=(700, 60),
+    ),
 }
 
 
@@ -112,6 +128,16 @@ def resolve_preset_key(label_or_key: str | None) -> str | None:
     return None
 
 
+def render_size(preset: Preset | None, pixel_budget: int, square: int = 512) -> tuple[int, int]:
+    # EchoMimic render size: the avatar box's aspect at no more than pixel_budget pixels and
+    # no more than the box shows. Each side is a multiple of 8 for the VAE's latent grid.
+    if preset is None:
+        return square, square
+    box_w, box_h = preset.avatar_box
+    scale = min(1.0, math.sqrt(pixel_budget / (box_w * box_h)))
+    return max(8, int(box_w * scale) // 8 * 8), max(8, int(box_h * scale) // 8 * 8)
+
+
 def render_background(preset: Preset, out_dir: Path, custom_path: Path | None = None) -> Path:
     if custom_path:
         return custom_path
@@ -121,6 +147,8 @@ def render_background(preset: Preset, out_dir: Path, custom_path: Path | None =
     if out_path.exists():
         return out_path
 
+    from PIL import ImageDraw
+
     width, height = preset.resolution
     if preset.background_style == "news":
         top = (8, 22, 45)
@@ -173,6 +201,8 @@ def render_background(preset: Preset, out_dir: Path, custom_path: Path | None =
 
 
 def _gradient(width: int, height: int, top: tuple[int, int, int], bottom: tuple[int, int, int]) -> Image.Image:
+    from PIL import Image, ImageDraw
+
     base = Image.new("RGB", (width, height), top)
     draw = ImageDraw.Draw(base)
     for y in range(height):
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from .pipeline import AvatarPipeline
+
+WEIGHT_SUFFIXES = {".pth", ".bin", ".safetensors", ".pt", ".ckpt"}
+# numpy, PIL, cv2, soundfile and pydub come in with these; the GUI defers them past startup
+FIRST_JOB_MODULES = (".image_utils", ".audio_utils", ".compositing", ".silence", ".speech_overlay")
+
+
+@dataclass(frozen=True)
+class Selection:
+    avatar_image: Path | None
+    voice_sample: Path | None
+    preset_name: str | None
+
+
+class Prewarmer:
+    # Speculative work while the operator is still choosing files and typing the script: load
+    # the TTS model, precompute the voice conditioning, crop the avatar and page in the
+    # EchoMimic weights, so a click on Generate goes straight to rendering. A new selection
+    # cancels whatever has not started yet and evicts what was prepared for the old one.
+    def __init__(self, pipeline: AvatarPipeline, log: Callable[[str], None] | None = None):
+        self.pipeline = pipeline
+        self.log = log or (lambda msg: None)
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prewarm")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._selection: Selection | None = None
+        self._crops: set[Path] = set()  # speculative crops this session wrote
+        self._warmed: set[str] = set()
+
+    def update(self, avatar_image: Path | None, voice_sample: Path | None, preset_name: str | None) -> None:
+        selection = Selection(
+            Path(avatar_image) if avatar_image and Path(avatar_image).is_file() else None,
+            Path(voice_sample) if voice_sample and Path(voice_sample).is_file() else None,
+            preset_name,
+        )
+        with self._lock:
+            if selection == self._selection:
+                return
+            previous = self._selection
+            self._selection = selection
+            self._generation += 1
+            generation = self._generation
+        self._pool.submit(self._warm, selection, previous, generation)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._generation += 1
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"warmed": sorted(self._warmed), "selection": self._selection}
+
+    def _cancelled(self, generation: int) -> bool:
+        return generation != self._generation
+
+    def _warm(self, selection: Selection, previous: Selection | None, generation: int) -> None:
+        try:
+            self._evict(selection, previous)
+            if selection.voice_sample is not None:
+                self._step(generation, "voice", lambda: self.pipeline.speculative_voice(selection.voice_sample))
+            if selection.avatar_image is not None:
+                self._step(
+                    generation,
+                    "avatar",
+                    lambda: self._crops.add(
+                        self.pipeline.speculative_avatar(selection.avatar_image, selection.preset_name)
+                    ),
+                )
+            if "renderer" not in self._warmed:
+                self._step(generation, "renderer", self._warm_renderer)
+        except Exception as exc:
+            # Speculative only: the job itself does the work and reports any real error
+            self.log(f"Pre-warm skipped: {exc}")
+
+    def _step(self, generation: int, name: str, fn: Callable[[], object]) -> None:
+        # A step already running finishes; nothing starts once a newer selection has come in
+        if self._cancelled(generation):
+            return
+        started = time.perf_counter()
+        fn()
+        with self._lock:
+            self._warmed.add(name)
+        self.log(f"Pre-warm: {name} ready ({time.perf_counter() - started:.1f}s)")
+
+    def _evict(self, selection: Selection, previous: Selection | None) -> None:
+        if previous is None:
+            return
+        if previous.voice_sample and previous.voice_sample != selection.voice_sample:
+            from .tts import get_backend
+
+            get_backend(self.pipeline.config.get("tts", {})).release_voice(previous.voice_sample)
+            with self._lock:
+                self._warmed.discard("voice")
+        if previous.avatar_image and (previous.avatar_image, previous.preset_name) != (
+            selection.avatar_image,
+            selection.preset_name,
+        ):
+            stale = self.pipeline.avatar_cache_path(previous.avatar_image, previous.preset_name)
+            if stale in self._crops:
+                from .image_utils import face_box_path
+
+                stale.unlink(missing_ok=True)
+                face_box_path(stale).unlink(missing_ok=True)
+                self._crops.discard(stale)
+            with self._lock:
+                self._warmed.discard("avatar")
+
+    def _warm_renderer(self) -> None:
+        # Heavy imports of the first job, the cached preflight probe, and EchoMimic's weights in
+        # the OS page cache: EchoMimic is a fresh subprocess per clip, so that is what stays warm.
+        for module in FIRST_JOB_MODULES:
+            importlib.import_module(module, __package__)
+        self.pipeline.preflight()
+        page_in(Path(self.pipeline.config["echo_mimic_weights"]))
+
+
+def page_in(root: Path) -> int:
+    total = 0
+    if not root.exists():
+        return total
+    for path in root.rglob("*"):
+        if path.suffix.lower() not in WEIGHT_SUFFIXES:
+            continue
+        with path.open("rb") as f:
+            while block := f.read(1 << 24):
+                total += len(block)
+    return total
+
+
+def prewarm_enabled(config: dict) -> bool:
+    return bool(config.get("prewarm", {}).get("enabled", True)) and os.environ.get("CODEXOFFLINEVIDEO_DUMMY", "0") != "1"
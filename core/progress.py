@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass
+class ProgressEvent:
+    job_id: str
+    stage: str
+    state: str  # "started", "done", "skipped", "failed", or "retry"/"warning" from the quality gate
+    frames_done: int = 0
+    frames_total: int = 0
+    fps: float | None = None
+    eta_seconds: float | None = None
+    error: str | None = None
+
+
+ProgressCallback = Callable[[ProgressEvent], None]
+
+
+class JobProgress:
+    # Turns stage transitions into events with render throughput and ETA.
+    # Frames from skipped (already complete) stages count as done but not towards fps.
+    def __init__(self, job_id: str, callback: ProgressCallback | None = None):
+        self.job_id = job_id
+        self.callback = callback
+        self.frames_total = 0
+        self.frames_done = 0
+        self._rendered_frames = 0
+        self._render_seconds = 0.0
+        self._started: dict[str, float] = {}
+        # Independent stages report from their own threads
+        self._lock = threading.Lock()
+
+    def add_frames(self, frames: int) -> None:
+        with self._lock:
+            self.frames_total += max(0, int(frames))
+
+    def fps(self) -> float | None:
+        if self._rendered_frames <= 0 or self._render_seconds <= 0:
+            return None
+        return self._rendered_frames / self._render_seconds
+
+    def eta_seconds(self) -> float | None:
+        fps = self.fps()
+        if not fps or not self.frames_total:
+            return None
+        return max(0, self.frames_total - self.frames_done) / fps
+
+    def stage(self, name: str, state: str, frames: int = 0, error: str | None = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if state == "started":
+                self._started[name] = now
+            elif state == "done" and frames:
+                self.frames_done += frames
+                self._rendered_frames += frames
+                self._render_seconds += now - self._started.pop(name, now)
+            elif state == "skipped" and frames:
+                self.frames_done += frames
+            event = ProgressEvent(
+                job_id=self.job_id,
+                stage=name,
+                state=state,
+                frames_done=self.frames_done,
+                frames_total=self.frames_total,
+                fps=self.fps(),
+                eta_seconds=self.eta_seconds(),
+                error=error,
+            )
+        if self.callback is not None:
+            self.callback(event)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import struct
+from pathlib import Path
+
+from .governor import governor
+
+PLAYLIST_NAME = "playlist.m3u8"
+FRAGMENTED_MP4_FLAGS = ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+
+
+class HlsPublisher:
+    # Keeps an EVENT playlist of fragmented-MP4 segments that players can open while the job
+    # renders. Each segment is a standalone fMP4 file; the playlist points at its init section
+    # (ftyp+moov) and its fragments by byte range. Every segment's timestamps start at zero, so
+    # each one after the first follows an EXT-X-DISCONTINUITY and players place it by the
+    # EXTINF durations before it. Segments may finish out of order (render farm), so only the
+    # contiguous prefix is listed.
+    def __init__(self, out_dir: str | Path, segment_count: int):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_count = segment_count
+        self.playlist_path = self.out_dir / PLAYLIST_NAME
+        self.state_path = self.out_dir / "segments.json"
+        self._segments: dict[int, dict] = {}
+        if self.state_path.exists():
+            # Resumed jobs keep the segments already published
+            saved = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self._segments = {int(k): v for k, v in saved.items() if self.segment_path(int(k)).exists()}
+
+    def segment_path(self, index: int) -> Path:
+        return self.out_dir / f"seg_{index:03d}.mp4"
+
+    def segment_paths(self) -> list[Path]:
+        return [self.segment_path(index) for index in range(1, self.segment_count + 1)]
+
+    def publish(self, index: int, duration: float) -> None:
+        path = self.segment_path(index)
+        self._segments[index] = {
+            "duration": float(duration),
+            "init_bytes": _init_size(path),
+            "bytes": path.stat().st_size,
+        }
+        _write_atomic(self.state_path, json.dumps(self._segments))
+        self._write_playlist(ended=False)
+
+    def finish(self) -> Path:
+        missing = [i for i in range(1, self.segment_count + 1) if i not in self._segments]
+        if missing:
+            raise RuntimeError(f"Segments never published: {missing}")
+        self._write_playlist(ended=True)
+        return self.playlist_path
+
+    def _write_playlist(self, ended: bool) -> None:
+        ready = []
+        for index in range(1, self.segment_count + 1):
+            if index not in self._segments:
+                break
+            ready.append(index)
+        target = max([math.ceil(self._segments[i]["duration"]) for i in ready] or [1])
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{target}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+        ]
+        for index in ready:
+            segment = self._segments[index]
+            name = self.segment_path(index).name
+            init = segment["init_bytes"]
+            if index > 1:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines += [
+                f'#EXT-X-MAP:URI="{name}",BYTERANGE="{init}@0"',
+                f"#EXTINF:{segment['duration']:.3f},",
+                f"#EXT-X-BYTERANGE:{segment['bytes'] - init}@{init}",
+                name,
+            ]
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        _write_atomic(self.playlist_path, "\n".join(lines) + "\n")
+
+
+def remux_segments(segment_paths: list[Path], out_path: str | Path, ffmpeg_path: str = "ffmpeg") -> Path:
+    # Stream copy only: the segments already hold the final encode
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    concat_list = out_path.with_name(out_path.stem + ".segments.txt")
+    concat_list.write_text(
+        "\n".join(f"file '{Path(p).resolve().as_posix()}'" for p in segment_paths), encoding="utf-8"
+    )
+    try:
+        governor().run(
+            "concat",
+            [
+                ffmpeg_path,
+                "-y",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                str(concat_list),
+                "-c",
+                "copy",
+                "-movflags",
+                "+faststart",
+                str(out_path),
+            ],
+            check=True,
+        )
+    finally:
+        concat_list.unlink(missing_ok=True)
+    return out_path
+
+
+def _init_size(path: Path) -> int:
+    # Bytes before the first movie fragment: the ftyp+moov boxes players need once per segment
+    offset = 0
+    with path.open("rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No movie fragment found in {path}")
+            size, box_type = struct.unpack(">I4s", header)
+            if box_type == b"moof":
+                return offset
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+                f.seek(size - 16, os.SEEK_CUR)
+            else:
+                f.seek(size - 8, os.SEEK_CUR)
+            offset += size
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from .governor import governor
+
+# Frames are counted from packets without decoding; black and frozen picture is judged from a few
+# small grey thumbnails per second, which takes seconds next to minutes of diffusion.
+THUMB_SIZE = 64
+SAMPLE_FPS = 4
+AUDIO_CHECK_RATE = 8000
+
+
+@dataclass
+class ChunkCheck:
+    path: Path
+    frames: int
+    expected_frames: int
+    audio_seconds: float | None = None
+    problems: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def summary(self) -> str:
+        return f"{self.path.name}: " + ("ok" if self.ok else "; ".join(self.problems))
+
+
+def check_chunk(
+    video_path: str | Path,
+    expected_frames: int,
+    fps: int,
+    expected_audio_seconds: float | None = None,
+    ffmpeg_path: str = "ffmpeg",
+    gate_cfg: dict | None = None,
+) -> ChunkCheck:
+    # expected_audio_seconds=None: the clip is video-only (lossless intermediates), skip audio
+    gate_cfg = gate_cfg or {}
+    video_path = Path(video_path)
+    sample_fps = min(float(gate_cfg.get("sample_fps", SAMPLE_FPS)), float(fps))
+    frame_count = _count_frames(video_path, ffmpeg_path)
+    samples = _decode_thumbnails(video_path, ffmpeg_path, sample_fps) if frame_count else None
+    if samples is None or not len(samples):
+        return ChunkCheck(video_path, 0, expected_frames, problems=["no decodable video frames"])
+    check = ChunkCheck(video_path, frame_count, expected_frames)
+
+    tolerance = int(gate_cfg.get("frame_tolerance", 2))
+    if abs(frame_count - expected_frames) > tolerance:
+        check.problems.append(f"{frame_count} frames, expected {expected_frames}")
+
+    # A run of n samples stands for about n / sample_fps seconds of picture
+    black = samples.mean(axis=(1, 2)) < float(gate_cfg.get("black_level", 10))
+    black_seconds = _longest_run(black) / sample_fps
+    if black_seconds > float(gate_cfg.get("max_black_seconds", 0.5)):
+        check.problems.append(f"black for {black_seconds:.1f}s, first at {int(np.argmax(black)) / sample_fps:.1f}s")
+
+    if len(samples) > 1:
+        # Mean absolute change between neighbouring thumbnails; a talking head never holds still this long
+        change = np.abs(np.diff(samples.astype(np.int16), axis=0)).mean(axis=(1, 2))
+        still = change < float(gate_cfg.get("frozen_threshold", 0.5))
+        frozen_seconds = (_longest_run(still) + 1) / sample_fps if still.any() else 0.0
+        if frozen_seconds > float(gate_cfg.get("max_frozen_seconds", 2.0)):
+            check.problems.append(f"frozen for {frozen_seconds:.1f}s")
+
+    if expected_audio_seconds is not None:
+        audio = _decode_audio(video_path, ffmpeg_path)
+        if audio is None or not len(audio):
+            check.problems.append("no audio track")
+        else:
+            check.audio_seconds = len(audio) / AUDIO_CHECK_RATE
+            if not np.abs(audio).max():
+                check.problems.append("audio track is silent")
+            audio_tolerance = float(gate_cfg.get("audio_tolerance_seconds", 0.25))
+            if abs(check.audio_seconds - expected_audio_seconds) > audio_tolerance:
+                check.problems.append(f"audio {check.audio_seconds:.2f}s, expected {expected_audio_seconds:.2f}s")
+    return check
+
+
+def retry_seed(gate_cfg: dict, attempt: int) -> int | None:
+    # The first attempt keeps EchoMimic's own default seed, so clean runs render as they always did
+    if attempt == 0:
+        return None
+    return int(gate_cfg.get("seed", 420)) + attempt
+
+
+def _count_frames(video_path: Path, ffmpeg_path: str) -> int:
+    # One framecrc line per packet of a stream copy: the frame count without decoding anything
+    cmd = [ffmpeg_path, "-v", "error", "-i", str(video_path), "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"]
+    proc = governor().run("quality", cmd, capture_output=True)
+    if proc.returncode:
+        return 0
+    return sum(1 for line in proc.stdout.splitlines() if line and not line.startswith(b"#"))
+
+
+def _decode_thumbnails(video_path: Path, ffmpeg_path: str, sample_fps: float) -> np.ndarray | None:
+    cmd = [
+        ffmpeg_path,
+        "-v",
+        "error",
+        "-i",
+        str(video_path),
+        "-map",
+        "0:v:0",
+        "-vf",
+        f"fps={sample_fps:g},scale={THUMB_SIZE}:{THUMB_SIZE}",
+        "-pix_fmt",
+        "gray",
+        "-f",
+        "rawvideo",
+        "-",
+    ]
+    proc = governor().run("quality", cmd, capture_output=True)
+    if proc.returncode:
+        return None
+    frame_bytes = THUMB_SIZE * THUMB_SIZE
+    count = len(proc.stdout) // frame_bytes
+    return np.frombuffer(proc.stdout[: count * frame_bytes], dtype=np.uint8).reshape(count, THUMB_SIZE, THUMB_SIZE)
+
+
+def _decode_audio(video_path: Path, ffmpeg_path: str) -> np.ndarray | None:
+    cmd = [
+        ffmpeg_path,
+        "-v",
+        "error",
+        "-i",
+        str(video_path),
+        "-map",
+        "0:a:0",
+        "-ac",
+        "1",
+        "-ar",
+        str(AUDIO_CHECK_RATE),
+        "-f",
+        "s16le",
+        "-",
+    ]
+    proc = governor().run("quality", cmd, capture_output=True)
+    if proc.returncode:
+        return None
+    return np.frombuffer(proc.stdout[: len(proc.stdout) // 2 * 2], dtype=np.int16)
+
+
+def _longest_run(mask: np.ndarray) -> int:
+    # Length of the longest stretch of True values
+    padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[::2]).max()) if len(edges) else 0
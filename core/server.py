@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+
+from .governor import governor
+from .pipeline import AvatarPipeline, PipelineInputs, _inputs_from_dict
+from .prewarm import page_in
+from .progress import ProgressEvent
+from .workspace import new_job_id
+
+# Local render server protocol (JSON over HTTP, bound to localhost by default):
+#   GET    /status                        -> {"queued", "running", "budget", "reserved", "warm", "tts_cache"}
+#   POST   /jobs                          <- {"avatar_image", "script_text", "voice_sample", ..., "priority"}
+#                                         -> {"job_id"} (202)
+#   GET    /jobs                          -> {"jobs": [...]}
+#   GET    /jobs/<job_id>                 -> {"state", "stage", "frames_done", "fps", "eta_seconds", "artifacts", "warnings", ...}
+#   GET    /jobs/<job_id>/artifacts/<name> -> artifact bytes ("video", "audio", "image", "raw_video")
+#   DELETE /jobs/<job_id>                 -> cancels a queued job (409 once it is running)
+
+
+@dataclass
+class ServerJob:
+    job_id: str
+    inputs: PipelineInputs
+    priority: int = 0
+    gpu_gb: float = 0.0
+    ram_gb: float = 0.0
+    state: str = "queued"  # "queued", "running", "done", "failed" or "cancelled"
+    submitted: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    progress: ProgressEvent | None = None
+    artifacts: Dict[str, Path] = field(default_factory=dict)
+    error: str | None = None
+    warnings: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        event = self.progress
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "priority": self.priority,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+            "stage": event.stage if event else None,
+            "stage_state": event.state if event else None,
+            "frames_done": event.frames_done if event else 0,
+            "frames_total": event.frames_total if event else 0,
+            "fps": event.fps if event else None,
+            "eta_seconds": event.eta_seconds if event else None,
+            "artifacts": sorted(self.artifacts),
+            "error": self.error,
+            "warnings": self.warnings,
+        }
+
+
+class RenderServer:
+    # One long-lived process shared by local tools. TTS models stay loaded between jobs, and
+    # jobs start in priority order only while their GPU/RAM reservations fit the budget.
+    def __init__(
+        self,
+        config_path: str | Path = "config.json",
+        host: str = "127.0.0.1",
+        port: int = 8780,
+    ):
+        self.pipeline = AvatarPipeline(config_path)
+        server_cfg = self.pipeline.config.get("server", {})
+        self.max_concurrent = max(1, int(server_cfg.get("max_concurrent", 1)))
+        self.gpu_budget_gb = float(server_cfg.get("gpu_budget_gb", 24))
+        self.ram_budget_gb = float(server_cfg.get("ram_budget_gb", 32))
+        self.job_gpu_gb = float(server_cfg.get("job_gpu_gb", 12))
+        self.job_ram_gb = float(server_cfg.get("job_ram_gb", 8))
+        self.keep_finished = int(server_cfg.get("keep_finished", 200))
+        self.jobs: Dict[str, ServerJob] = {}
+        self.warm: Dict[str, str] = {}
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = False
+        self.server = ThreadingHTTPServer((host, port), _make_server_handler(self))
+        self.server.daemon_threads = True
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self) -> None:
+        # The TTS model is kept in-process by core.tts. EchoMimic runs as a subprocess per chunk, so
+        # the nearest thing to keeping it warm is having its weights in the OS page cache.
+        if os.environ.get("CODEXOFFLINEVIDEO_DUMMY", "0") == "1":
+            self.warm["mode"] = "dummy"
+            return
+        server_cfg = self.pipeline.config.get("server", {})
+        tts_cfg = self.pipeline.config.get("tts", {})
+        if server_cfg.get("warm_tts", True) and tts_cfg.get("enable", True):
+            from .tts import get_backend
+
+            try:
+                backend = get_backend(tts_cfg)
+                backend.load()
+                self.warm["tts"] = backend.model_id
+            except Exception as exc:
+                self.warm["tts"] = f"failed: {exc}"
+        if server_cfg.get("warm_echomimic_weights", True):
+            read = page_in(Path(self.pipeline.config["echo_mimic_weights"]))
+            self.warm["echomimic_weights"] = f"{read / 1024**3:.1f} GB"
+
+    def submit(self, payload: dict) -> ServerJob:
+        payload = dict(payload)
+        priority = int(payload.pop("priority", 0))
+        inputs = _inputs_from_dict(payload)
+        missing = [
+            str(p)
+            for p in (
+                inputs.avatar_image,
+                inputs.voice_sample,
+                inputs.reference_video,
+                inputs.background_image,
+                inputs.slides,
+                inputs.second_avatar_image,
+                inputs.second_voice_sample,
+            )
+            if p is not None and not Path(p).exists()
+        ]
+        if not inputs.script_text or not str(inputs.script_text).strip():
+            raise ValueError("script_text is empty")
+        if missing:
+            raise ValueError(f"Input files not found: {missing}")
+        report = self.pipeline.preflight(inputs)
+        if not report.ok:
+            raise ValueError("; ".join(report.errors))
+
+        dummy = os.environ.get("CODEXOFFLINEVIDEO_DUMMY", "0") == "1"
+        job = ServerJob(
+            job_id=new_job_id(),
+            inputs=inputs,
+            priority=priority,
+            gpu_gb=0.0 if dummy else self.job_gpu_gb,
+            ram_gb=0.0 if dummy else self.job_ram_gb,
+        )
+        if job.gpu_gb > self.gpu_budget_gb or job.ram_gb > self.ram_budget_gb:
+            raise ValueError("Job needs more GPU/RAM than the server budget allows")
+        with self._cond:
+            self.jobs[job.job_id] = job
+            heapq.heappush(self._queue, (-priority, next(self._seq), job.job_id))
+            self._cond.notify_all()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job.state != "queued":
+                return False
+            job.state = "cancelled"
+            job.finished = time.time()
+            self._cond.notify_all()
+            return True
+
+    def status(self) -> dict:
+        cache = self.pipeline.phrase_cache()
+        with self._cond:
+            running = [j for j in self.jobs.values() if j.state == "running"]
+            return {
+                "queued": sum(1 for j in self.jobs.values() if j.state == "queued"),
+                "running": len(running),
+                "max_concurrent": self.max_concurrent,
+                "budget": {"gpu_gb": self.gpu_budget_gb, "ram_gb": self.ram_budget_gb},
+                "reserved": {
+                    "gpu_gb": sum(j.gpu_gb for j in running),
+                    "ram_gb": sum(j.ram_gb for j in running),
+                },
+                "warm": dict(self.warm),
+                "governor": governor().status(),
+                "tts_cache": cache.stats() if cache is not None else None,
+            }
+
+    def _fits(self, job: ServerJob, running: list[ServerJob]) -> bool:
+        if len(running) >= self.max_concurrent:
+            return False
+        if sum(j.gpu_gb for j in running) + job.gpu_gb > self.gpu_budget_gb:
+            return False
+        if sum(j.ram_gb for j in running) + job.ram_gb > self.ram_budget_gb:
+            return False
+        # Reservations only cover our own jobs; also respect what other processes leave free.
+        # GPU memory is only probed while idle, since running jobs' usage swings between stages.
+        available_ram = _available_ram_gb()
+        if available_ram is not None and job.ram_gb > available_ram:
+            return False
+        if not running and job.gpu_gb:
+            free_gpu = _free_gpu_gb()
+            if free_gpu is not None and job.gpu_gb > free_gpu:
+                return False
+        return True
+
+    def _schedule_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stop:
+                    # Drop cancelled entries, then admit strictly in priority order so a large
+                    # high-priority job is not starved by a stream of small ones.
+                    while self._queue and getattr(self.jobs.get(self._queue[0][2]), "state", None) != "queued":
+                        heapq.heappop(self._queue)
+                    if self._queue:
+                        head = self.jobs[self._queue[0][2]]
+                        running = [j for j in self.jobs.values() if j.state == "running"]
+                        if self._fits(head, running):
+                            break
+                    self._cond.wait(timeout=2.0)
+                if self._stop:
+                    return
+                heapq.heappop(self._queue)
+                head.state = "running"
+                head.started = time.time()
+            threading.Thread(target=self._run_job, args=(head,), daemon=True).start()
+
+    def _run_job(self, job: ServerJob) -> None:
+        def on_progress(event: ProgressEvent) -> None:
+            job.progress = event
+            if event.state == "warning":
+                job.warnings.append(f"{event.stage}: {event.error}")
+
+        try:
+            outputs = self.pipeline.run(job.inputs, progress=on_progress, job_id=job.job_id)
+            artifacts = {
+                "video": outputs.video_path,
+                "audio": outputs.audio_path,
+                "image": outputs.image_path,
+                "raw_video": outputs.raw_video_path,
+            }
+            job.artifacts = {name: Path(p) for name, p in artifacts.items() if p and Path(p).exists()}
+            state, error = "done", None
+        except Exception as exc:
+            traceback.print_exc()
+            state, error = "failed", str(exc)
+        with self._cond:
+            job.state = state
+            job.error = error
+            job.finished = time.time()
+            self._forget_old_jobs()
+            self._cond.notify_all()
+
+    def _forget_old_jobs(self) -> None:
+        finished = sorted(
+            (j for j in self.jobs.values() if j.state in {"done", "failed", "cancelled"}),
+            key=lambda j: j.finished or 0,
+        )
+        for job in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.job_id]
+
+    def start(self) -> "RenderServer":
+        threading.Thread(target=self._schedule_loop, daemon=True).start()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self) -> None:
+        threading.Thread(target=self._schedule_loop, daemon=True).start()
+        self.server.serve_forever()
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _make_server_handler(server: RenderServer):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, job_id: str) -> ServerJob | None:
+            with server._cond:
+                job = server.jobs.get(job_id)
+            if job is None:
+                self._send_json(404, {"error": "unknown job"})
+            return job
+
+        def do_GET(self):
+            parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+            if parts == ["status"]:
+                self._send_json(200, server.status())
+            elif parts == ["jobs"]:
+                with server._cond:
+                    jobs = [j.to_dict() for j in server.jobs.values()]
+                self._send_json(200, {"jobs": jobs})
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = self._job(parts[1])
+                if job is not None:
+                    self._send_json(200, job.to_dict())
+            elif len(parts) == 4 and parts[0] == "jobs" and parts[2] == "artifacts":
+                job = self._job(parts[1])
+                if job is None:
+                    return
+                path = job.artifacts.get(parts[3])
+                if path is None or not path.exists():
+                    self._send_json(404, {"error": "no such artifact"})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(path.stat().st_size))
+                self.send_header("Content-Disposition", f'attachment; filename="{path.name}"')
+                self.end_headers()
+                with path.open("rb") as f:
+                    shutil.copyfileobj(f, self.wfile, 1 << 20)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self._send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                job = server.submit(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, TypeError) as exc:
+                self._send_json(400, {"error": str(exc)})
+                return
+            self._send_json(202, {"job_id": job.job_id})
+
+        def do_DELETE(self):
+            parts = [p for p in self.path.split("/") if p]
+            if len(parts) != 2 or parts[0] != "jobs":
+                self._send_json(404, {"error": "not found"})
+                return
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if server.cancel(job.job_id):
+                self._send_json(200, {"cancelled": True})
+            else:
+                self._send_json(409, {"error": f"job is {job.state}"})
+
+    return Handler
+
+
+def _available_ram_gb() -> float | None:
+    try:
+        import psutil
+    except Exception:  # pragma: no cover
+        return None
+    return psutil.virtual_memory().available / 1024**3
+
+
+def _free_gpu_gb() -> float | None:
+    nvidia_smi = shutil.which("nvidia-smi")
+    if nvidia_smi is None:
+        return None
+    try:
+        out = subprocess.run(
+            [nvidia_smi, "--query-gpu=memory.free", "--format=csv,noheader,nounits"],
+            capture_output=True,
+            text=True,
+            timeout=5,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    free = [float(line) for line in out.split() if line.strip()]
+    return max(free) / 1024 if free else None
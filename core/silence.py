@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from .frame_pipe import FrameWriter, read_frames
+
+
+@dataclass
+class Segment:
+    kind: str  # "voiced" (rendered by EchoMimic) or "idle" (taken from the avatar's idle loop)
+    start: int  # first frame, including the blend overlap with the previous segment
+    end: int  # one past the last frame, including the overlap with the next segment
+
+
+@dataclass
+class RenderPlan:
+    fps: int
+    total_frames: int
+    blend_frames: int
+    segments: list[Segment]
+
+    @property
+    def voiced(self) -> list[Segment]:
+        return [s for s in self.segments if s.kind == "voiced"]
+
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        data = asdict(self)
+        path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RenderPlan":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        data["segments"] = [Segment(**s) for s in data["segments"]]
+        return cls(**data)
+
+
+def voiced_mask(
+    audio_path: str | Path,
+    fps: int,
+    threshold_db: float = -40.0,
+    min_silence_seconds: float = 0.6,
+    pad_seconds: float = 0.1,
+) -> np.ndarray:
+    # One boolean per video frame. Energy is measured per frame window from a cumulative
+    # sum of squares, so the whole track is a handful of array ops.
+    data, sample_rate = sf.read(str(audio_path), dtype="float32", always_2d=True)
+    mono = data.mean(axis=1).astype(np.float64)
+    total_frames = int(len(mono) / sample_rate * fps)
+    if total_frames == 0:
+        return np.zeros(0, dtype=bool)
+
+    edges = np.round(np.arange(total_frames + 1) * (sample_rate / fps)).astype(np.int64)
+    energy_sum = np.concatenate([[0.0], np.cumsum(mono**2)])
+    energy = (energy_sum[edges[1:]] - energy_sum[edges[:-1]]) / np.maximum(np.diff(edges), 1)
+    level_db = 10 * np.log10(energy + 1e-12)
+    voiced = level_db > level_db.max() + threshold_db
+
+    pad = int(round(pad_seconds * fps))
+    if pad:
+        voiced = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+
+    # Pauses too short to be worth a cut stay with the speech around them
+    min_silence = int(round(min_silence_seconds * fps))
+    for start, end, value in _runs(voiced):
+        if not value and end - start < min_silence:
+            voiced[start:end] = True
+    return voiced
+
+
+def plan_segments(
+    voiced: np.ndarray,
+    fps: int,
+    blend_frames: int = 6,
+    max_voiced_frames: int | None = None,
+) -> RenderPlan:
+    total_frames = len(voiced)
+    spans = []
+    for start, end, value in _runs(voiced):
+        kind = "voiced" if value else "idle"
+        if kind == "voiced" and max_voiced_frames:
+            for piece in range(start, end, max_voiced_frames):
+                spans.append((kind, piece, min(end, piece + max_voiced_frames)))
+        else:
+            spans.append((kind, start, end))
+
+    # Neighbouring segments overlap by blend_frames around each cut, half on either side
+    if spans:
+        blend_frames = max(0, min([blend_frames] + [end - start for _kind, start, end in spans]))
+    half = blend_frames // 2
+    segments = []
+    for i, (kind, start, end) in enumerate(spans):
+        if i > 0:
+            start -= half
+        if i < len(spans) - 1:
+            end += blend_frames - half
+        segments.append(Segment(kind=kind, start=start, end=end))
+    return RenderPlan(fps=fps, total_frames=total_frames, blend_frames=blend_frames, segments=segments)
+
+
+def write_segment_audio(audio_path: str | Path, segment: Segment, fps: int, out_path: str | Path) -> Path:
+    info = sf.info(str(audio_path))
+    start = int(round(segment.start * info.samplerate / fps))
+    stop = int(round(segment.end * info.samplerate / fps))
+    data, sample_rate = sf.read(str(audio_path), start=start, stop=stop, dtype="float32", always_2d=True)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(str(out_path), data, sample_rate)
+    return out_path
+
+
+def write_silence(out_path: str | Path, seconds: float, sample_rate: int = 16000) -> Path:
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(str(out_path), np.zeros(int(seconds * sample_rate), dtype=np.float32), sample_rate)
+    return out_path
+
+
+def assemble_segments(
+    plan: RenderPlan,
+    voiced_videos: list[Path],
+    idle_video: Path | None,
+    out_path: str | Path,
+    width: int,
+    height: int,
+    ffmpeg_path: str = "ffmpeg",
+) -> Path:
+    # Streams every segment once into a lossless intermediate, cross-fading across each
+    # overlap. Only blend_frames frames are held back at a time.
+    idle_frames = None
+    if idle_video is not None and any(s.kind == "idle" for s in plan.segments):
+        idle_frames = np.stack(list(read_frames(idle_video, width, height, ffmpeg_path)))
+        # Play the loop forwards then backwards so it never jumps at the wrap
+        if len(idle_frames) > 2:
+            idle_frames = np.concatenate([idle_frames, idle_frames[-2:0:-1]])
+
+    blend = plan.blend_frames
+    weights = (np.arange(1, blend + 1, dtype=np.float32) / (blend + 1))[:, None, None, None]
+    held: list[np.ndarray] = []
+    voiced_iter = iter(voiced_videos)
+    with FrameWriter(out_path, width, height, plan.fps, ffmpeg_path=ffmpeg_path) as writer:
+        for i, segment in enumerate(plan.segments):
+            length = segment.end - segment.start
+            if segment.kind == "voiced":
+                frames = _exact_length(read_frames(next(voiced_iter), width, height, ffmpeg_path), length)
+            else:
+                if idle_frames is None:
+                    raise ValueError("Render plan has idle segments but no idle loop was given")
+                # Index by timeline position so the loop's phase is continuous across segments
+                frames = (idle_frames[(segment.start + j) % len(idle_frames)] for j in range(length))
+            # The last blend frames overlap the next segment and are written once blended with it
+            tail_start = length if i == len(plan.segments) - 1 else length - blend
+            incoming, held = held, []
+            for j, frame in enumerate(frames):
+                if j < len(incoming):
+                    frame = (incoming[j] * (1 - weights[j]) + frame * weights[j]).astype(np.uint8)
+                if j >= tail_start:
+                    held.append(frame)
+                else:
+                    writer.write(frame)
+    return Path(out_path)
+
+
+def _exact_length(frames, length: int):
+    # EchoMimic rounds clip lengths; pad with the last frame or drop extras to stay on the timeline
+    last = None
+    count = 0
+    for frame in frames:
+        if count == length:
+            return
+        last = frame
+        count += 1
+        yield frame
+    if last is None:
+        raise ValueError("Voiced segment video has no frames")
+    for _ in range(length - count):
+        yield last
+
+
+def _runs(mask: np.ndarray) -> list[tuple[int, int, bool]]:
+    if len(mask) == 0:
+        return []
+    changes = np.flatnonzero(np.diff(mask.astype(np.int8))) + 1
+    starts = np.concatenate([[0], changes])
+    ends = np.concatenate([changes, [len(mask)]])
+    return [(int(s), int(e), bool(mask[s])) for s, e in zip(starts, ends)]
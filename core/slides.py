@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import textwrap
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .artifacts import file_digest
+from .governor import governor
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Bumped whenever rasterization changes, so cached slides from older builds are not reused
+RASTER_VERSION = 1
+PANEL_FILL = (12, 16, 24, 225)
+TEXT_FILL = (240, 242, 246, 255)
+
+
+@dataclass(frozen=True)
+class Slide:
+    start: float
+    end: float | None = None  # None: until the next slide starts, or the end of the video
+    image: Path | None = None
+    text: str | None = None
+
+
+def load_slide_track(path: str | Path) -> list[Slide]:
+    # {"slides": [{"start": 0, "end": 4.5, "image": "intro.png"}, {"start": 6, "text": "Agenda\n..."}]}
+    # or just the list. Image paths are relative to the track file.
+    path = Path(path)
+    data = json.loads(path.read_text(encoding="utf-8-sig"))
+    entries = data.get("slides", []) if isinstance(data, dict) else data
+    slides = []
+    for entry in entries:
+        image = entry.get("image")
+        text = entry.get("text")
+        if bool(image) == bool(text):
+            raise ValueError(f"Each slide needs exactly one of 'image' or 'text': {entry}")
+        if image:
+            image = Path(image)
+            if not image.is_absolute():
+                image = path.parent / image
+        end = entry.get("end")
+        slides.append(
+            Slide(
+                start=float(entry.get("start", 0.0)),
+                end=float(end) if end is not None else None,
+                image=image,
+                text=text,
+            )
+        )
+    return sorted(slides, key=lambda s: s.start)
+
+
+def slide_key(slide: Slide | None, size: tuple[int, int]) -> str:
+    # Content address of the rasterized PNG; None is the transparent gap frame
+    if slide is None:
+        source = "blank"
+    elif slide.image is not None:
+        source = "image:" + file_digest(slide.image)
+    else:
+        source = "text:" + slide.text
+    payload = json.dumps([RASTER_VERSION, source, list(size)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def track_digest(slides: list[Slide], size: tuple[int, int]) -> str:
+    # Stable across rebuilds, unlike the muxed stream itself
+    payload = json.dumps([[s.start, s.end, slide_key(s, size)] for s in slides] + [list(size)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def rasterize_slide(slide: Slide | None, size: tuple[int, int], cache_dir: str | Path) -> Path:
+    cache_dir = Path(cache_dir)
+    out_path = cache_dir / f"{slide_key(slide, size)[:32]}.png"
+    if out_path.exists():
+        return out_path
+
+    from PIL import Image
+
+    width, height = size
+    if slide is None:
+        canvas = Image.new("RGBA", size, (0, 0, 0, 0))
+    elif slide.image is not None:
+        # Letterboxed into the panel on a transparent canvas, keeping the image's aspect
+        with Image.open(slide.image) as source:
+            source = source.convert("RGBA")
+            scale = min(width / source.width, height / source.height)
+            fitted = source.resize(
+                (max(1, round(source.width * scale)), max(1, round(source.height * scale))), Image.LANCZOS
+            )
+        canvas = Image.new("RGBA", size, (0, 0, 0, 0))
+        canvas.paste(fitted, ((width - fitted.width) // 2, (height - fitted.height) // 2), fitted)
+    else:
+        canvas = _render_text_slide(slide.text, size)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + f".{os.getpid()}.tmp.png")
+    canvas.save(tmp)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def build_slide_stream(
+    slides: list[Slide],
+    size: tuple[int, int],
+    cache_dir: str | Path,
+    out_path: str | Path,
+    duration_seconds: float,
+    start_seconds: float = 0.0,
+    ffmpeg_path: str = "ffmpeg",
+) -> Path:
+    # One sparse video stream for the whole track: a frame only where the panel changes, each
+    # held until the next. compose_video overlays it once, so compose cost doesn't grow with the
+    # number of slides. start_seconds/duration_seconds cut a window for segment composes.
+    end_seconds = start_seconds + duration_seconds
+    timeline: list[tuple[Path, float]] = []
+    cursor = start_seconds
+    for i, slide in enumerate(slides):
+        next_start = slides[i + 1].start if i + 1 < len(slides) else end_seconds
+        slide_end = min(slide.end if slide.end is not None else next_start, next_start, end_seconds)
+        slide_start = max(slide.start, start_seconds)
+        if slide_end <= slide_start:
+            continue
+        if slide_start > cursor:
+            timeline.append((rasterize_slide(None, size, cache_dir), slide_start - cursor))
+        timeline.append((rasterize_slide(slide, size, cache_dir), slide_end - slide_start))
+        cursor = slide_end
+    if cursor < end_seconds or not timeline:
+        timeline.append((rasterize_slide(None, size, cache_dir), max(end_seconds - cursor, 0.001)))
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    concat_list = out_path.with_name(out_path.stem + ".slides.txt")
+    lines = ["ffconcat version 1.0"]
+    for png, seconds in timeline:
+        lines += [f"file '{png.resolve().as_posix()}'", f"duration {seconds:.3f}"]
+    # The concat demuxer only honours the last duration when the final file is listed again
+    lines.append(f"file '{timeline[-1][0].resolve().as_posix()}'")
+    concat_list.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    try:
+        # PNG packets are copied as-is: each distinct slide was rasterized once and is never re-encoded
+        governor().run(
+            "concat",
+            [
+                ffmpeg_path,
+                "-y",
+                "-loglevel",
+                "error",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                str(concat_list),
+                "-c:v",
+                "copy",
+                str(out_path),
+            ],
+            check=True,
+        )
+    finally:
+        concat_list.unlink(missing_ok=True)
+    return out_path
+
+
+def _render_text_slide(text: str, size: tuple[int, int]) -> Image.Image:
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    canvas = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(canvas)
+    draw.rounded_rectangle((0, 0, width - 1, height - 1), radius=14, fill=PANEL_FILL)
+
+    # First line is the title, the rest body text
+    title, _, body = text.strip().partition("\n")
+    margin = max(12, width // 20)
+    title_font = _font(max(16, height // 8))
+    body_font = _font(max(12, height // 14))
+    y = margin
+    for line in _wrap(draw, title, title_font, width - 2 * margin):
+        draw.text((margin, y), line, font=title_font, fill=TEXT_FILL)
+        y += int(title_font.size * 1.25)
+    y += margin // 2
+    for paragraph in body.splitlines():
+        for line in _wrap(draw, paragraph, body_font, width - 2 * margin):
+            if y + body_font.size > height - margin:
+                return canvas
+            draw.text((margin, y), line, font=body_font, fill=TEXT_FILL)
+            y += int(body_font.size * 1.3)
+    return canvas
+
+
+def _font(size: int):
+    from PIL import ImageFont
+
+    for name in ("arial.ttf", "DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def _wrap(draw, text: str, font, max_width: int) -> list[str]:
+    if not text.strip():
+        return [""]
+    # Widest wrap that fits, measured with the actual font
+    for chars in range(max(8, min(len(text), 120)), 7, -1):
+        lines = textwrap.wrap(text, chars)
+        if all(draw.textlength(line, font=font) <= max_width for line in lines):
+            return lines
+    return textwrap.wrap(text, 8)
@@ -2,56 +2,76 @@ from __future__ import annotations
 
 from pathlib import Path
 import re
+import shutil
 
 import soundfile as sf
 
 from .presets import Preset
 
+CAPTION_MARGIN = 20
+# Speech style: 40px font plus outline, shadow and line spacing
+CAPTION_LINE_HEIGHT = 52
+
 
 def build_karaoke_ass(
     script_text: str,
     audio_path: str | Path,
     preset: Preset,
     out_path: str | Path,
+    segments: list[tuple[float, float, str]] | None = None,
+    below_content: bool = False,
 ) -> Path | None:
+    # segments: (start, end, text) spans with known timing, e.g. dialogue lines on the mixed
+    # track; each one's words are spread over its own span. Without them the whole script is
+    # spread over the whole audio. below_content moves the captions out of the content panel
+    # into the band under it, for jobs whose slides fill the panel.
     if not script_text.strip() or preset.content_box is None:
         return None
 
-    words = _tokenize(script_text)
-    if not words:
-        return None
-
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     duration = float(sf.info(str(audio_path)).duration)
     if duration <= 0:
         return None
+    if segments is None:
+        segments = [(0.0, duration, script_text)]
 
     x, y, w, _h = preset.content_box
     video_w, video_h = preset.resolution
     margin_l = max(20, x + 20)
     margin_r = max(20, video_w - (x + w) + 20)
     margin_v = max(20, y + 20)
-
-    weights = [_weight_word(word) for word in words]
-    total_weight = max(1e-6, sum(weights))
-    durations = [duration * (w_i / total_weight) for w_i in weights]
+    alignment = 7  # top left, inside the panel
 
     lines_per_event = 3
+    if below_content:
+        alignment = 2  # bottom centre, anchored to the frame edge
+        margin_v = CAPTION_MARGIN
+        lines_per_event = caption_band_lines(preset)
     words_per_line = 7
     words_per_event = lines_per_event * words_per_line
 
     events = []
-    t = 0.0
-    for idx in range(0, len(words), words_per_event):
-        chunk_words = words[idx : idx + words_per_event]
-        chunk_durations = durations[idx : idx + words_per_event]
-        start = t
-        end = t + sum(chunk_durations)
-        t = end
-        text = _build_karaoke_chunk(chunk_words, chunk_durations, words_per_line=words_per_line)
-        events.append((start, end, text))
+    for seg_start, seg_end, seg_text in segments:
+        words = _tokenize(seg_text)
+        if not words:
+            continue
+        weights = [_weight_word(word) for word in words]
+        total_weight = max(1e-6, sum(weights))
+        durations = [(seg_end - seg_start) * (w_i / total_weight) for w_i in weights]
+
+        t = seg_start
+        for idx in range(0, len(words), words_per_event):
+            chunk_words = words[idx : idx + words_per_event]
+            chunk_durations = durations[idx : idx + words_per_event]
+            start = t
+            end = t + sum(chunk_durations)
+            t = end
+            text = _build_karaoke_chunk(chunk_words, chunk_durations, words_per_line=words_per_line)
+            events.append((start, end, text))
+    if not events:
+        return None
 
     ass = _render_ass(
         events=events,
@@ -60,11 +80,60 @@ def build_karaoke_ass(
         margin_l=margin_l,
         margin_r=margin_r,
         margin_v=margin_v,
+        alignment=alignment,
     )
     out_path.write_text(ass, encoding="utf-8")
     return out_path
 
 
+def caption_band_lines(preset: Preset) -> int:
+    # Caption lines that fit between the bottom of the content panel and the frame edge
+    _x, y, _w, h = preset.content_box
+    band = preset.resolution[1] - (y + h) - 2 * CAPTION_MARGIN
+    return max(1, min(3, band // CAPTION_LINE_HEIGHT))
+
+
+def ass_to_webvtt(ass_path: str | Path, out_path: str | Path) -> Path:
+    # Same cues as the burned-in captions; each karaoke \kf step becomes a WebVTT cue
+    # timestamp, so players that style :past/:future highlight words as they are spoken
+    ass_path = Path(ass_path)
+    out_path = Path(out_path)
+    cues = ["WEBVTT", ""]
+    for line in ass_path.read_text(encoding="utf-8").splitlines():
+        if not line.startswith("Dialogue:"):
+            continue
+        fields = line[len("Dialogue:") :].split(",", 9)
+        start, end, text = _parse_time(fields[1]), _parse_time(fields[2]), fields[9]
+        t = start
+        parts = []
+        for centis, word in re.findall(r"\{\\kf(\d+)\}([^{]*)", text):
+            if t > start:
+                parts.append(f"<{_fmt_vtt_time(t)}>")
+            parts.append(word.replace("&", "&amp;").replace("<", "&lt;").replace(r"\N", "\n"))
+            t += int(centis) / 100
+        cues += [f"{_fmt_vtt_time(start)} --> {_fmt_vtt_time(end)}", "".join(parts).strip(), ""]
+    out_path.write_text("\n".join(cues), encoding="utf-8")
+    return out_path
+
+
+def write_caption_sidecars(ass_path: str | Path, video_path: str | Path, formats: list[str]) -> dict[str, Path]:
+    # Caption files next to the video ("talk.mp4" -> "talk.vtt", "talk.ass") for players and
+    # platforms that load captions separately
+    video_path = Path(video_path)
+    sidecars = {}
+    for fmt in formats:
+        fmt = fmt.lower().lstrip(".")
+        out = video_path.with_suffix(f".{fmt}")
+        if fmt == "vtt":
+            ass_to_webvtt(ass_path, out)
+        elif fmt == "ass":
+            shutil.copyfile(ass_path, out)
+        else:
+            raise ValueError(f"Unknown caption sidecar format: {fmt}")
+        sidecars[f"sidecar_{fmt}"] = out
+    return sidecars
+
+
 def _tokenize(text: str) -> list[str]:
     text = text.replace("\n", " ")
     tokens = [tok for tok in re.split(r"\s+", text) if tok]
@@ -103,6 +172,16 @@ def _fmt_time(seconds: float) -> str:
     return f"{h}:{m:02d}:{s:05.2f}"
 
 
+def _parse_time(value: str) -> float:
+    h, m, s = value.strip().split(":")
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def _fmt_vtt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    return f"{millis // 3600000:02d}:{millis // 60000 % 60:02d}:{millis // 1000 % 60:02d}.{millis % 1000:03d}"
+
+
 def _render_ass(
     events: list[tuple[float, float, str]],
     width: int,
@@ -110,6 +189,7 @@ def _render_ass(
     margin_l: int,
     margin_r: int,
     margin_v: int,
+    alignment: int = 7,
 ) -> str:
     lines = []
     lines.append("[Script Info]")
@@ -127,7 +207,7 @@ def _render_ass(
     )
     lines.append(
         f"Style: Speech,Segoe UI,40,&H00FFFFFF,&H0010B8FF,&H00202020,&H64000000,"
-        f"0,0,0,0,100,100,0,0,1,2,1,7,{margin_l},{margin_r},{margin_v},1"
+        f"0,0,0,0,100,100,0,0,1,2,1,{alignment},{margin_l},{margin_r},{margin_v},1"
     )
     lines.append("")
     lines.append("[Events]")
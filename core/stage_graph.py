@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict
+
+from .manifest import hash_inputs
+
+Artifacts = Dict[str, Path]
+Upstream = Dict[str, Artifacts]
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: Callable[[Upstream], Artifacts]  # receives the artifacts of the stages it needs
+    needs: tuple[str, ...] = ()
+    # Cached stages list what their output depends on and are skipped make-style when the hash
+    # matches the manifest. None marks a composite stage that records its own sub-stages.
+    inputs: Callable[[Upstream], tuple] | None = None
+
+    @property
+    def cached(self) -> bool:
+        return self.inputs is not None
+
+
+class StageGraph:
+    # Stages are added after the stages they need, so the graph is acyclic by construction and
+    # insertion order is a valid sequential order.
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self.trace: Dict[str, dict] = {}
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[Upstream], Artifacts],
+        needs: tuple[str, ...] = (),
+        inputs: Callable[[Upstream], tuple] | None = None,
+    ) -> Stage:
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        missing = [dep for dep in needs if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} needs stages that were not added first: {missing}")
+        stage = Stage(name, fn, tuple(needs), inputs)
+        self.stages[name] = stage
+        self.trace[name] = {"state": "pending"}
+        return stage
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": [
+                {"name": s.name, "needs": list(s.needs), "cached": s.cached, **self.trace.get(s.name, {})}
+                for s in self.stages.values()
+            ]
+        }
+
+    def to_dot(self) -> str:
+        lines = ["digraph pipeline {", "  rankdir=LR;"]
+        for stage in self.stages.values():
+            shape = "box" if stage.cached else "box3d"
+            state = self.trace.get(stage.name, {}).get("state", "pending")
+            lines.append(f'  "{stage.name}" [shape={shape}, label="{stage.name}\\n{state}"];')
+            for dep in stage.needs:
+                lines.append(f'  "{dep}" -> "{stage.name}";')
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str), encoding="utf-8")
+        return path
+
+
+class GraphExecutor:
+    # Runs each stage as soon as everything it needs is done, at most max_workers at a time.
+    # Cached stages go through run_cached(name, inputs_hash, fn), i.e. AvatarPipeline._stage.
+    # max_workers=1 runs the stages one by one in the order they were added.
+    def __init__(
+        self,
+        run_cached: Callable[[str, str, Callable[[], Artifacts]], Artifacts],
+        max_workers: int = 3,
+    ):
+        self.run_cached = run_cached
+        self.max_workers = max(1, int(max_workers))
+        self._lock = threading.Lock()
+
+    def run(self, graph: StageGraph) -> Upstream:
+        results: Upstream = {}
+        pending = dict(graph.stages)
+        running = {}
+        origin = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+            try:
+                while pending or running:
+                    for name, stage in list(pending.items()):
+                        if len(running) >= self.max_workers:
+                            break
+                        if all(dep in results for dep in stage.needs):
+                            del pending[name]
+                            upstream = {dep: results[dep] for dep in stage.needs}
+                            running[pool.submit(self._run_stage, graph, stage, upstream, origin)] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        results[name] = future.result()
+            except BaseException:
+                # Stages already running finish (threads can't be interrupted); nothing new starts
+                for future in running:
+                    future.cancel()
+                for name in pending:
+                    graph.trace[name] = {"state": "cancelled"}
+                raise
+        return results
+
+    def _run_stage(self, graph: StageGraph, stage: Stage, upstream: Upstream, origin: float) -> Artifacts:
+        record = {"state": "running", "start": round(time.monotonic() - origin, 3)}
+        with self._lock:
+            graph.trace[stage.name] = record
+        ran = []
+
+        def build() -> Artifacts:
+            ran.append(True)
+            return stage.fn(upstream)
+
+        try:
+            if stage.cached:
+                inputs_hash = hash_inputs(*stage.inputs(upstream))
+                record["inputs_hash"] = inputs_hash
+                artifacts = self.run_cached(stage.name, inputs_hash, build)
+            else:
+                artifacts = stage.fn(upstream)
+        except BaseException as exc:
+            record.update(state="failed", error=str(exc))
+            raise
+        finally:
+            record["end"] = round(time.monotonic() - origin, 3)
+        record["state"] = "done" if ran or not stage.cached else "skipped"
+        return artifacts or {}
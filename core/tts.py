@@ -1,9 +1,222 @@
 ﻿from __future__ import annotations
 
+import threading
+import wave
+from dataclasses import dataclass
 from pathlib import Path
 
+_MODELS: dict = {}
+_MODELS_LOCK = threading.Lock()
+# Voice conditioning (speaker latents) per model and voice sample; the GUI fills it ahead of time
+_VOICES: dict = {}
+MAX_VOICES = 8
+# Silence TTS.api's Synthesizer puts after each XTTS sentence
+XTTS_SENTENCE_GAP = 10000
 
-def generate_tts(text: str, speaker_wav: str | Path, out_wav: str | Path, model_name: str, language: str = "en") -> Path:
+
+@dataclass(frozen=True)
+class TtsResult:
+    path: Path
+    sample_rate: int
+    duration: float  # seconds, as synthesized; callers don't need to re-read the WAV
+
+
+class TtsBackend:
+    # One speech engine, selected by tts.backend. Backends are cheap to build; the models they
+    # load stay in _MODELS for the life of the process.
+    name = ""
+    clones_voice = True  # False: speaker_wav is ignored and the engine's own voice is used
+
+    def __init__(self, tts_cfg: dict):
+        self.tts_cfg = tts_cfg
+
+    @property
+    def model_id(self) -> str:
+        # Goes into phrase-cache keys and stage hashes, so audio from different engines never mixes
+        return self.name
+
+    @property
+    def synthesis_params(self) -> dict:
+        # Settings besides the model that change the audio; they go into phrase-cache keys and
+        # stage hashes next to model_id
+        return {}
+
+    def load(self) -> None:
+        pass
+
+    def prepare_voice(self, speaker_wav: str | Path):
+        # Precompute whatever the engine derives from the voice sample; no-op for fixed voices
+        return None
+
+    def release_voice(self, speaker_wav: str | Path) -> None:
+        pass
+
+    def synthesize(self, text: str, speaker_wav: str | Path, out_wav: Path, language: str = "en") -> TtsResult:
+        raise NotImplementedError
+
+
+class XttsBackend(TtsBackend):
+    # Coqui XTTS v2: clones the voice sample; a GPU is strongly recommended
+    name = "xtts"
+
+    @property
+    def model_id(self) -> str:
+        return self.tts_cfg.get("model_name") or "tts_models/multilingual/multi-dataset/xtts_v2"
+
+    @property
+    def synthesis_params(self) -> dict:
+        return {"sentence_gap": XTTS_SENTENCE_GAP}
+
+    def load(self):
+        return load_tts_model(self.model_id, gpu=self.tts_cfg.get("gpu", "auto"))
+
+    def prepare_voice(self, speaker_wav):
+        key = self._voice_key(speaker_wav)
+        with _MODELS_LOCK:
+            latents = _VOICES.get(key)
+        if latents is not None:
+            return latents
+        model = self.load().synthesizer.tts_model
+        config = model.config
+        # Same settings TTS.api uses, so cached conditioning sounds identical to the uncached path
+        latents = model.get_conditioning_latents(
+            audio_path=[str(speaker_wav)],
+            gpt_cond_len=config.gpt_cond_len,
+            gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+            max_ref_length=config.max_ref_len,
+            sound_norm_refs=config.sound_norm_refs,
+        )
+        with _MODELS_LOCK:
+            _VOICES[key] = latents
+            while len(_VOICES) > MAX_VOICES:
+                _VOICES.pop(next(iter(_VOICES)))
+        return latents
+
+    def release_voice(self, speaker_wav):
+        with _MODELS_LOCK:
+            _VOICES.pop(self._voice_key(speaker_wav), None)
+
+    def synthesize(self, text, speaker_wav, out_wav, language="en"):
+        import numpy as np
+        import soundfile as sf
+
+        from .tts_cache import split_phrases
+
+        from .governor import governor
+
+        model = self.load().synthesizer.tts_model
+        settings = {
+            name: getattr(model.config, name)
+            for name in ("temperature", "length_penalty", "repetition_penalty", "top_k", "top_p")
+        }
+        on_gpu = next(model.parameters()).is_cuda
+        pieces = []
+        with governor().lease("tts" if on_gpu else "tts_cpu"):
+            gpt_cond_latent, speaker_embedding = self.prepare_voice(speaker_wav)
+            for sentence in split_phrases(text):
+                out = model.inference(sentence, language, gpt_cond_latent, speaker_embedding, **settings)
+                pieces += [np.asarray(out["wav"], dtype=np.float32), np.zeros(XTTS_SENTENCE_GAP, dtype=np.float32)]
+        samples = np.concatenate(pieces)
+        sample_rate = int(model.config.audio.output_sample_rate)
+        sf.write(str(out_wav), samples, sample_rate)
+        return TtsResult(Path(out_wav), sample_rate, len(samples) / sample_rate)
+
+    def _voice_key(self, speaker_wav) -> tuple:
+        from .artifacts import file_digest
+
+        return (self.model_id, file_digest(speaker_wav))
+
+
+class PiperBackend(TtsBackend):
+    # Piper (ONNX, offline): a fixed voice per model file, many times faster than real time on
+    # one CPU core. Meant for drafts and CPU-only render nodes.
+    name = "piper"
+    clones_voice = False
+
+    @property
+    def model_path(self) -> Path:
+        model = self.tts_cfg.get("piper", {}).get("model", "")
+        if not model:
+            raise RuntimeError("tts.piper.model must point to a Piper voice (.onnx)")
+        return Path(model)
+
+    @property
+    def model_id(self) -> str:
+        return f"piper:{self.model_path.name}"
+
+    def load(self):
+        try:
+            from piper import PiperVoice
+        except Exception as exc:  # pragma: no cover
+            raise RuntimeError("Piper is not installed. Install with: pip install piper-tts") from exc
+
+        key = ("piper", str(self.model_path))
+        with _MODELS_LOCK:
+            if key not in _MODELS:
+                use_cuda = bool(self.tts_cfg.get("piper", {}).get("use_cuda", False))
+                _MODELS[key] = PiperVoice.load(str(self.model_path), use_cuda=use_cuda)
+            return _MODELS[key]
+
+    def synthesize(self, text, speaker_wav, out_wav, language="en"):
+        voice = self.load()
+        with wave.open(str(out_wav), "wb") as wav_file:
+            # piper-tts >= 1.3 renamed the WAV writer; both set the format from the voice config
+            if hasattr(voice, "synthesize_wav"):
+                voice.synthesize_wav(text, wav_file)
+            else:
+                voice.synthesize(text, wav_file)
+            sample_rate = wav_file.getframerate()
+            frames = wav_file.getnframes()
+        return TtsResult(Path(out_wav), sample_rate, frames / sample_rate)
+
+
+class StubBackend(TtsBackend):
+    # Deterministic tone bursts paced like speech, for tests and pipeline dry runs. Needs
+    # neither a model nor a GPU.
+    name = "stub"
+    clones_voice = False
+
+    @property
+    def synthesis_params(self) -> dict:
+        stub_cfg = self.tts_cfg.get("stub", {})
+        return {
+            "sample_rate": int(stub_cfg.get("sample_rate", 16000)),
+            "words_per_second": float(stub_cfg.get("words_per_second", 2.5)),
+        }
+
+    def synthesize(self, text, speaker_wav, out_wav, language="en"):
+        import numpy as np
+        import soundfile as sf
+
+        params = self.synthesis_params
+        sample_rate = params["sample_rate"]
+        words_per_second = params["words_per_second"]
+        words = text.split()
+        word_len = int(sample_rate / words_per_second)
+        t = np.arange(int(word_len * 0.8)) / sample_rate
+        pieces = []
+        for word in words:
+            # A short tone per word with a gap after it, so silence detection has pauses to find
+            tone = 0.3 * np.sin(2 * np.pi * (180 + 20 * (len(word) % 5)) * t) * np.hanning(len(t))
+            pieces += [tone, np.zeros(word_len - len(t))]
+        samples = np.concatenate(pieces).astype(np.float32)
+        sf.write(str(out_wav), samples, sample_rate)
+        return TtsResult(Path(out_wav), sample_rate, len(samples) / sample_rate)
+
+
+BACKENDS = {backend.name: backend for backend in (XttsBackend, PiperBackend, StubBackend)}
+
+
+def get_backend(tts_cfg: dict | None = None) -> TtsBackend:
+    tts_cfg = tts_cfg or {}
+    name = str(tts_cfg.get("backend", "xtts")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{name}'; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](tts_cfg)
+
+
+def load_tts_model(model_name: str, gpu: bool | str = True):
+    # Keep loaded models for the life of the process; phrase-level synthesis calls this often.
     try:
         from TTS.api import TTS
     except Exception as exc:  # pragma: no cover
@@ -11,13 +224,30 @@ def generate_tts(text: str, speaker_wav: str | Path, out_wav: str | Path, model_
             "Coqui TTS is not installed. Install with: pip install TTS"
         ) from exc
 
+    with _MODELS_LOCK:
+        if model_name not in _MODELS:
+            if gpu == "auto":
+                import torch
+
+                gpu = torch.cuda.is_available()
+            _MODELS[model_name] = TTS(model_name=model_name, progress_bar=False, gpu=bool(gpu))
+        return _MODELS[model_name]
+
+
+def generate_tts(
+    text: str,
+    speaker_wav: str | Path,
+    out_wav: str | Path,
+    model_name: str | None = None,
+    language: str = "en",
+    backend: TtsBackend | None = None,
+) -> TtsResult:
     if not text.strip():
         raise ValueError("Text is empty")
 
-    speaker_wav = str(speaker_wav)
     out_wav = Path(out_wav)
     out_wav.parent.mkdir(parents=True, exist_ok=True)
 
-    tts = TTS(model_name=model_name, progress_bar=False, gpu=True)
-    tts.tts_to_file(text=text, speaker_wav=speaker_wav, language=language, file_path=str(out_wav))
-    return out_wav
+    if backend is None:
+        backend = get_backend({"backend": "xtts", "model_name": model_name})
+    return backend.synthesize(text, speaker_wav, out_wav, language=language)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import unicodedata
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .artifacts import file_digest
+
+if TYPE_CHECKING:
+    from .tts import TtsBackend, TtsResult
+
+_PHRASE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text)
+    text = text.replace("’", "'").replace("“", '"').replace("”", '"')
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def split_phrases(text: str) -> list[str]:
+    return [p.strip() for p in _PHRASE_END.split(normalize_text(text)) if p.strip()]
+
+
+def phrase_key(phrase: str, voice_hash: str, model_name: str, language: str, params: dict | None = None) -> str:
+    payload = json.dumps(
+        {"text": phrase, "voice": voice_hash, "model": model_name, "language": language, "params": params or {}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PhraseCache:
+    # On-disk WAV cache shared by every job on the machine. The files are the index: a WAV's
+    # size is its cost and its mtime its last use (touched on every hit), so concurrent jobs
+    # and processes never rewrite shared metadata and LRU eviction always sees the disk as it is.
+    def __init__(self, root: str | Path, max_bytes: int | None = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Hit/miss counts are kept per process
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str) -> Path | None:
+        path = self.root / f"{key}.wav"
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return path
+
+    def put(self, key: str, wav_path: str | Path) -> Path:
+        target = self.root / f"{key}.wav"
+        tmp = target.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+        shutil.copyfile(wav_path, tmp)
+        os.replace(tmp, target)
+        self._evict()
+        return target
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob("*.wav"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue  # evicted by another job meanwhile
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _mtime, size, _path in entries)
+            for _mtime, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            hits, misses = self._hits, self._misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _mtime, size, _path in entries),
+        }
+
+
+_CACHES: dict[Path, PhraseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def phrase_cache(root: str | Path, max_bytes: int | None = None) -> PhraseCache:
+    # One instance per cache root and process, so concurrent jobs share counters and locks
+    root = Path(root).resolve()
+    with _CACHES_LOCK:
+        cache = _CACHES.get(root)
+        if cache is None:
+            cache = _CACHES[root] = PhraseCache(root, max_bytes)
+        cache.max_bytes = max_bytes
+        return cache
+
+
+def generate_tts_cached(
+    text: str,
+    speaker_wav: str | Path,
+    out_wav: str | Path,
+    model_name: str,
+    language: str,
+    cache: PhraseCache,
+    crossfade_ms: int = 20,
+    params: dict | None = None,
+    backend: TtsBackend | None = None,
+) -> TtsResult:
+    from pydub import AudioSegment
+
+    from .tts import TtsResult, generate_tts, get_backend
+
+    phrases = split_phrases(text)
+    if not phrases:
+        raise ValueError("Text is empty")
+
+    out_wav = Path(out_wav)
+    out_wav.parent.mkdir(parents=True, exist_ok=True)
+    if backend is None:
+        backend = get_backend({"backend": "xtts", "model_name": model_name})
+    # Engines with a fixed voice share their phrases across every voice sample
+    voice_hash = file_digest(speaker_wav) if backend.clones_voice else ""
+    if params is None:
+        params = backend.synthesis_params
+
+    segments = []
+    for i, phrase in enumerate(phrases):
+        key = phrase_key(phrase, voice_hash, backend.model_id, language, params)
+        cached = cache.get(key)
+        if cached is None:
+            # Only phrases never heard with this voice/model/language/settings are synthesized
+            tmp_wav = out_wav.with_name(f"{out_wav.stem}.phrase{i:03d}.wav")
+            generate_tts(phrase, speaker_wav, tmp_wav, language=language, backend=backend)
+            cached = cache.put(key, tmp_wav)
+            tmp_wav.unlink(missing_ok=True)
+        segments.append(AudioSegment.from_wav(cached))
+
+    audio = segments[0]
+    for segment in segments[1:]:
+        fade = min(crossfade_ms, len(audio), len(segment))
+        audio = audio.append(segment, crossfade=fade)
+    audio.export(out_wav, format="wav")
+    return TtsResult(out_wav, audio.frame_rate, audio.frame_count() / audio.frame_rate)
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import os
+import shutil
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Iterable, List
+
+
+def new_job_id() -> str:
+    # Timestamp keeps ids sortable and readable; the suffix keeps same-second jobs apart.
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+@dataclass
+class JobWorkspace:
+    job_id: str
+    root: Path
+    scratch: Path
+
+    @classmethod
+    def create(cls, output_dir: str | Path, job_id: str, scratch_root: str | Path | None = None) -> "JobWorkspace":
+        root = Path(output_dir) / "jobs" / job_id
+        scratch = Path(scratch_root) / job_id if scratch_root else root / "scratch"
+        root.mkdir(parents=True, exist_ok=True)
+        scratch.mkdir(parents=True, exist_ok=True)
+        return cls(job_id=job_id, root=root, scratch=scratch)
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    def scratch_path(self, name: str) -> Path:
+        return self.scratch / name
+
+    def cleanup_scratch(self) -> None:
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+
+def workspace_from_config(config: dict, job_id: str) -> JobWorkspace:
+    ws_cfg = config.get("workspace", {})
+    scratch_root = os.environ.get("CODEXOFFLINEVIDEO_SCRATCH_DIR", ws_cfg.get("scratch_dir", "")).strip()
+    return JobWorkspace.create(config["output_dir"], job_id, scratch_root or None)
+
+
+# What a finished job delivers: the video with its renditions and caption sidecars, the HLS
+# playlist and the manifests describing them. GC only removes these with workspace.delete_finals.
+FINAL_PATTERNS = ("generated_*", "hls", "job.json", "graph.json")
+
+
+def _last_used(job_dir: Path) -> float:
+    # job.json is rewritten on every stage transition; the directory's own mtime would also
+    # move whenever GC removes intermediates from it
+    manifest = job_dir / "job.json"
+    return (manifest if manifest.exists() else job_dir).stat().st_mtime
+
+
+def _is_finished(job_dir: Path, idle_seconds: float, stale_seconds: float | None) -> bool:
+    # A missing or unreadable manifest is a job that is still being set up (or being written).
+    # A "running" job counts as finished once its owner process is gone, or, when that can't be
+    # told (another host, manifests from older builds), once it has been idle for stale_seconds.
+    from .manifest import TERMINAL_STATUSES, JobManifest
+
+    try:
+        manifest = JobManifest.load(job_dir / "job.json")
+    except (OSError, ValueError, KeyError):
+        return False
+    if not manifest.status and bool(manifest.stages) and manifest.first_incomplete() is None:
+        # Manifests written before job statuses existed: finished when every stage is done
+        return True
+    if manifest.status in TERMINAL_STATUSES:
+        return True
+    alive = _owner_alive(manifest.owner)
+    if alive is not None:
+        return not alive
+    return stale_seconds is not None and idle_seconds > stale_seconds
+
+
+def _owner_alive(owner: dict | None) -> bool | None:
+    # None when the owner can't be checked from here
+    if not owner or owner.get("host") != socket.gethostname():
+        return None
+    pid = int(owner.get("pid", 0))
+    if pid <= 0:
+        return None
+    if os.name == "nt":
+        # os.kill on Windows terminates the process, so ask for its exit code instead
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # access denied: it exists
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for p in path.rglob("*"):
+        try:
+            if p.is_file():
+                total += p.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def collect_garbage(
+    output_dir: str | Path,
+    max_total_bytes: int | None = None,
+    max_age_seconds: float | None = None,
+    keep: Iterable[str] = (),
+    min_idle_seconds: float = 3600,
+    delete_finals: bool = False,
+    scratch_root: str | Path | None = None,
+    stale_seconds: float | None = None,
+) -> List[Path]:
+    # Only finished jobs (job.json "done" or "failed", or "running" with a dead owner, see
+    # _is_finished) that have sat idle for min_idle_seconds are candidates, so a job rendering in
+    # another process or server slot is never touched. By default only their intermediates and
+    # scratch go; deliverables stay (FINAL_PATTERNS).
+    jobs_dir = Path(output_dir) / "jobs"
+    if not jobs_dir.exists():
+        return []
+    keep = set(keep)
+    now = time.time()
+
+    total = 0
+    entries = []
+    for job_dir in jobs_dir.iterdir():
+        if not job_dir.is_dir():
+            continue
+        total += _size(job_dir)
+        if job_dir.name in keep:
+            continue
+        mtime = _last_used(job_dir)
+        if now - mtime < min_idle_seconds or not _is_finished(job_dir, now - mtime, stale_seconds):
+            continue
+        entries.append((mtime, job_dir))
+    entries.sort()
+
+    removed = []
+    for mtime, job_dir in entries:
+        too_old = max_age_seconds is not None and now - mtime > max_age_seconds
+        too_big = max_total_bytes is not None and total > max_total_bytes
+        if not (too_old or too_big):
+            continue
+        if scratch_root:
+            _remove(Path(scratch_root) / job_dir.name)
+        if delete_finals:
+            total -= _size(job_dir)
+            _remove(job_dir)
+            removed.append(job_dir)
+            continue
+        for path in job_dir.iterdir():
+            if any(fnmatch(path.name, pattern) for pattern in FINAL_PATTERNS):
+                continue
+            total -= _size(path)
+            _remove(path)
+            removed.append(path)
+    return removed
+
+
+def live_jobs(output_dir: str | Path, stale_seconds: float | None = None, keep: Iterable[str] = ()) -> List[str]:
+    jobs_dir = Path(output_dir) / "jobs"
+    if not jobs_dir.exists():
+        return []
+    keep = set(keep)
+    now = time.time()
+    return [
+        job_dir.name
+        for job_dir in jobs_dir.iterdir()
+        if job_dir.is_dir()
+        and job_dir.name not in keep
+        and not _is_finished(job_dir, now - _last_used(job_dir), stale_seconds)
+    ]
+
+
+def _store_files(root: Path) -> Iterable[Path]:
+    # Caches are flat ("<root>/<key>.png"), artifact stores one level deep ("<root>/<xx>/<id>");
+    # farm task dirs ("<root>/work/<task>/...") are deeper and cleaned by their worker
+    for pattern in ("*", "*/*"):
+        for path in root.glob(pattern):
+            if path.is_file():
+                yield path
+
+
+def trim_stores(
+    roots: Iterable[str | Path],
+    max_total_bytes: int | None = None,
+    max_age_seconds: float | None = None,
+    min_idle_seconds: float = 3600,
+) -> List[Path]:
+    # Caches and artifact stores are content-addressed, so anything removed is rebuilt on the
+    # next miss. Least recently used go first; a file's last use is its newest of mtime (writes,
+    # touched hits) and atime (reads).
+    now = time.time()
+    total = 0
+    entries = []
+    for root in roots:
+        root = Path(root)
+        if not root.exists():
+            continue
+        for path in _store_files(root):
+            try:
+                st = path.stat()
+            except OSError:
+                continue  # removed by another process meanwhile
+            total += st.st_size
+            entries.append((max(st.st_mtime, st.st_atime), st.st_size, path))
+    entries.sort()
+
+    removed = []
+    for used, size, path in entries:
+        if now - used < min_idle_seconds:
+            break
+        too_old = max_age_seconds is not None and now - used > max_age_seconds
+        too_big = max_total_bytes is not None and total > max_total_bytes
+        if not (too_old or too_big):
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        removed.append(path)
+    return removed
+
+
+def store_roots(output_dir: str | Path) -> List[Path]:
+    # Every machine-wide cache under outputs/cache (avatars, motion, slides, idle loops, TTS
+    # phrases) and the farm coordinator's artifact store; the preflight cache keeps itself to a
+    # handful of entries
+    output_dir = Path(output_dir)
+    cache_dir = output_dir / "cache"
+    roots = [p for p in cache_dir.iterdir() if p.is_dir()] if cache_dir.exists() else []
+    return roots + [output_dir / "farm_store"]
+
+
+def collect_garbage_from_config(config: dict, keep: Iterable[str] = ()) -> List[Path]:
+    ws_cfg = config.get("workspace", {})
+    max_total_gb = ws_cfg.get("max_total_gb")
+    max_age_days = ws_cfg.get("max_age_days")
+    scratch_root = os.environ.get("CODEXOFFLINEVIDEO_SCRATCH_DIR", ws_cfg.get("scratch_dir", "")).strip()
+    stale_hours = ws_cfg.get("stale_running_hours", 24)
+    stale_seconds = float(stale_hours) * 3600 if stale_hours else None
+    min_idle_seconds = float(ws_cfg.get("min_idle_minutes", 60)) * 60
+    removed = collect_garbage(
+        config["output_dir"],
+        max_total_bytes=int(float(max_total_gb) * 1024**3) if max_total_gb else None,
+        max_age_seconds=float(max_age_days) * 86400 if max_age_days else None,
+        keep=keep,
+        min_idle_seconds=min_idle_seconds,
+        delete_finals=bool(ws_cfg.get("delete_finals", False)),
+        scratch_root=scratch_root or None,
+        stale_seconds=stale_seconds,
+    )
+    # Another live job may be about to reuse a cached file, so the stores are only trimmed
+    # when the kept jobs are the only ones running
+    if not live_jobs(config["output_dir"], stale_seconds, keep):
+        cache_max_gb = ws_cfg.get("cache_max_gb")
+        cache_max_age_days = ws_cfg.get("cache_max_age_days")
+        removed += trim_stores(
+            store_roots(config["output_dir"]),
+            max_total_bytes=int(float(cache_max_gb) * 1024**3) if cache_max_gb else None,
+            max_age_seconds=float(cache_max_age_days) * 86400 if cache_max_age_days else None,
+            min_idle_seconds=min_idle_seconds,
+        )
+    return removed
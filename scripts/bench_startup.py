@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ("numpy", "PIL", "cv2", "soundfile", "pydub", "TTS", "torch")
+
+
+def import_breakdown(module: str, top: int) -> list[tuple[int, int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(ROOT),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def window_ready_seconds() -> tuple[float, float, list[str]]:
+    env = os.environ.copy()
+    env["CODEXOFFLINEVIDEO_STARTUP_BENCH"] = "1"
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, str(ROOT / "avatar_app_ultimate.py")],
+        cwd=str(ROOT),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - started
+    for line in result.stdout.splitlines():
+        if line.startswith("WINDOW_READY"):
+            parts = line.split()
+            heavy = parts[2].split(",") if len(parts) > 2 and parts[2] else []
+            return wall, float(parts[1]), heavy
+    raise RuntimeError(f"App did not report window-ready:\n{result.stdout}\n{result.stderr}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure GUI cold start and import-time breakdown.")
+    parser.add_argument("--budget-seconds", type=float, default=1.5, help="Max process-start-to-window-ready time")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--imports-only", action="store_true", help="Skip the window benchmark (no display)")
+    args = parser.parse_args()
+
+    print("Import-time breakdown for avatar_app_ultimate (cumulative ms / self ms):")
+    for cumulative_us, self_us, name in import_breakdown("avatar_app_ultimate", args.top):
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+
+    failures = []
+    loaded = [name.strip() for _c, _s, name in import_breakdown("avatar_app_ultimate", 10_000)]
+    eager = sorted({m for m in HEAVY_MODULES if m in loaded})
+    if eager:
+        failures.append(f"heavy modules imported at startup: {', '.join(eager)}")
+
+    if not args.imports_only:
+        samples = [window_ready_seconds() for _ in range(max(1, args.runs))]
+        best_wall = min(s[0] for s in samples)
+        best_ready = min(s[1] for s in samples)
+        heavy_at_ready = sorted({m for s in samples for m in s[2]})
+        print(f"Window ready: {best_wall:.3f}s from process start ({best_ready:.3f}s inside the app)")
+        if heavy_at_ready:
+            print(f"Heavy modules loaded by window-ready: {', '.join(heavy_at_ready)}")
+        if best_wall > args.budget_seconds:
+            failures.append(f"window-ready {best_wall:.3f}s exceeds budget {args.budget_seconds:.3f}s")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("Startup benchmark passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from core.config import load_config
+from core.tts import BACKENDS, get_backend
+
+SENTENCES = (
+    "Welcome back to the quarterly review.",
+    "Revenue grew faster than we planned, mostly on the enterprise side.",
+    "Next, we look at where render time actually goes, and what we cut first.",
+    "Thanks for watching, and see you next week.",
+)
+
+
+def bench_backend(tts_cfg: dict, name: str, voice: Path, runs: int) -> dict:
+    backend = get_backend({**tts_cfg, "backend": name})
+    started = time.perf_counter()
+    backend.load()
+    load_seconds = time.perf_counter() - started
+
+    audio_seconds = 0.0
+    synth_seconds = 0.0
+    chars = 0
+    sample_rate = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(runs):
+            for i, sentence in enumerate(SENTENCES):
+                started = time.perf_counter()
+                result = backend.synthesize(sentence, voice, Path(tmp) / f"{run}_{i}.wav", tts_cfg.get("language", "en"))
+                synth_seconds += time.perf_counter() - started
+                # Taken from the backend's own report, not by re-reading the WAV
+                audio_seconds += result.duration
+                sample_rate = result.sample_rate
+                chars += len(sentence)
+    return {
+        "backend": name,
+        "model": backend.model_id,
+        "sample_rate": sample_rate,
+        "load_seconds": load_seconds,
+        "audio_seconds": audio_seconds,
+        "synth_seconds": synth_seconds,
+        "realtime_factor": audio_seconds / synth_seconds if synth_seconds else float("inf"),
+        "chars_per_second": chars / synth_seconds if synth_seconds else float("inf"),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure TTS throughput for each configured backend.")
+    parser.add_argument("--config", default=str(ROOT / "config.json"))
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="Repeat to pick several (default: all)")
+    parser.add_argument("--voice", help="Voice sample for cloning backends (default: a generated tone)")
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args()
+
+    tts_cfg = load_config(args.config).get("tts", {})
+    names = args.backend or list(BACKENDS)
+    with tempfile.TemporaryDirectory() as tmp:
+        voice = Path(args.voice) if args.voice else get_backend({"backend": "stub"}).synthesize(
+            " ".join(SENTENCES), None, Path(tmp) / "voice.wav"
+        ).path
+
+        print(f"{'backend':8} {'model':48} {'rate':>6} {'load s':>7} {'audio s':>8} {'synth s':>8} {'x RT':>7} {'chars/s':>8}")
+        for name in names:
+            try:
+                row = bench_backend(tts_cfg, name, voice, max(1, args.runs))
+            except Exception as exc:
+                print(f"{name:8} unavailable: {exc}")
+                continue
+            print(
+                f"{row['backend']:8} {row['model'][-48:]:48} {row['sample_rate']:>6} {row['load_seconds']:7.2f} "
+                f"{row['audio_seconds']:8.2f} {row['synth_seconds']:8.2f} {row['realtime_factor']:7.1f} "
+                f"{row['chars_per_second']:8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
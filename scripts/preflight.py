@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from core.pipeline import AvatarPipeline, PipelineInputs
+from core.preflight import report_to_dict
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check tools, encoders, EchoMimic weights and disk before a render.")
+    parser.add_argument("--config", default=str(ROOT / "config.json"))
+    parser.add_argument("--avatar", help="Avatar image to check along with the environment")
+    parser.add_argument("--voice", help="Voice sample to check")
+    parser.add_argument("--script", default="", help="Script text (used for the disk estimate)")
+    parser.add_argument("--preset", default=None)
+    parser.add_argument("--json", action="store_true", help="Print the full capability report as JSON")
+    args = parser.parse_args()
+
+    inputs = None
+    if args.avatar or args.voice:
+        inputs = PipelineInputs(
+            avatar_image=Path(args.avatar or ""),
+            script_text=args.script or "preflight",
+            voice_sample=Path(args.voice or ""),
+            preset_name=args.preset,
+        )
+    report = AvatarPipeline(args.config).preflight(inputs)
+    print(json.dumps(report_to_dict(report), indent=2) if args.json else report.summary())
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
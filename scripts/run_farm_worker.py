@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from core.config import load_config
+from core.farm import FarmWorker
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a render farm worker node.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--capacity", type=int, default=1)
+    parser.add_argument("--store", default=str(ROOT / "outputs" / "farm_worker"))
+    parser.add_argument("--config", default=str(ROOT / "config.json"))
+    args = parser.parse_args()
+
+    worker = FarmWorker(
+        store_dir=Path(args.store),
+        config=load_config(args.config),
+        capacity=args.capacity,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Farm worker listening on {worker.address} (capacity {worker.capacity})", flush=True)
+    worker.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from core.server import RenderServer
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the local render server (HTTP API on localhost).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--config", default=str(ROOT / "config.json"))
+    parser.add_argument("--no-warm", action="store_true", help="Skip loading TTS and paging in EchoMimic weights")
+    args = parser.parse_args()
+
+    server = RenderServer(config_path=args.config, host=args.host, port=args.port)
+    if not args.no_warm:
+        print("Warming models...", flush=True)
+        server.warm_up()
+    print(f"Render server listening on {server.address} (warm: {server.warm or 'none'})", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from core.dummy_renderer import generate_dummy_audio, generate_dummy_image
+from core.farm import FarmCoordinator, FarmTask
+
+PORTS = [8771, 8772, 8773]
+
+
+def start_workers(out_dir: Path) -> list[subprocess.Popen]:
+    env = os.environ.copy()
+    env["CODEXOFFLINEVIDEO_DUMMY"] = "1"
+    procs = []
+    for port in PORTS:
+        procs.append(
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    str(ROOT / "scripts" / "run_farm_worker.py"),
+                    "--port",
+                    str(port),
+                    "--store",
+                    str(out_dir / f"worker_{port}"),
+                ],
+                env=env,
+            )
+        )
+    time.sleep(2.0)
+    return procs
+
+
+def main() -> None:
+    out_dir = ROOT / "outputs" / "farm_test"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    image = generate_dummy_image(out_dir / "avatar.png")
+    audios = [generate_dummy_audio(out_dir / f"chunk_{i:03d}.wav", duration_seconds=2.0) for i in range(1, 7)]
+
+    procs = start_workers(out_dir)
+    try:
+        coordinator = FarmCoordinator(
+            worker_urls=[f"http://127.0.0.1:{port}" for port in PORTS],
+            store_dir=out_dir / "coordinator_store",
+            heartbeat_seconds=0.5,
+            timeout_seconds=3.0,
+        ).start()
+        tasks = [
+            FarmTask(
+                kind="render_chunk",
+                inputs={"image": image, "audio": audio},
+                outputs={"video": out_dir / f"chunk_{i:03d}.mp4"},
+            )
+            for i, audio in enumerate(audios, start=1)
+        ]
+
+        # Kill one worker shortly after dispatch so its tasks have to be re-dispatched.
+        def kill_first_worker() -> None:
+            time.sleep(0.3)
+            procs[0].kill()
+
+        threading.Thread(target=kill_first_worker, daemon=True).start()
+        coordinator.run(tasks)
+        coordinator.stop()
+    finally:
+        for proc in procs:
+            proc.kill()
+
+    for task in tasks:
+        video = task.outputs["video"]
+        assert video.exists() and video.stat().st_size > 0, f"missing output {video}"
+        print(f"{video.name}: worker={task.worker} attempts={task.attempts}")
+    print("Farm test complete.")
+
+
+if __name__ == "__main__":
+    main()
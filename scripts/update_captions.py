@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from core.compositing import mux_subtitles
+from core.config import load_config
+from core.speech_overlay import write_caption_sidecars
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replace the soft caption tracks and sidecars of a finished video without re-encoding it."
+    )
+    parser.add_argument("video", help="Video to update (picture and sound are stream-copied)")
+    parser.add_argument(
+        "--captions",
+        action="append",
+        required=True,
+        metavar="FILE[:LANG]",
+        help="Caption file (.ass/.srt/.vtt) with an ISO 639-2 language, e.g. speech_de.ass:deu; repeat for more tracks",
+    )
+    parser.add_argument("--out", help="Output path (default: update the video in place)")
+    parser.add_argument("--sidecar", action="append", choices=["vtt", "ass"], help="Also write sidecars of the first track")
+    parser.add_argument("--config", default=str(ROOT / "config.json"))
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    default_language = config.get("captions", {}).get("language", "eng")
+    tracks = []
+    for item in args.captions:
+        path, _, language = item.rpartition(":")
+        # Only a trailing language code splits, so drive letters ("C:\\captions.ass") stay intact
+        if not (language.isalpha() and len(language) <= 3):
+            path, language = item, ""
+        tracks.append((Path(path), language or default_language))
+
+    out = Path(args.out or args.video)
+    mux_subtitles(args.video, out, tracks, ffmpeg_path=config.get("ffmpeg_path", "ffmpeg"))
+    print(f"Muxed {len(tracks)} caption track(s) into {out}")
+    if args.sidecar:
+        if tracks[0][0].suffix.lower() != ".ass":
+            sys.exit("Sidecars are written from an .ass caption file")
+        for path in write_caption_sidecars(tracks[0][0], out, args.sidecar).values():
+            print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()